@@ -1,7 +1,14 @@
 # accounts/admin.py
-from django.contrib import admin
+import io
+import os
+from django.conf import settings
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
-from accounts.models import User, Student, Instructor
+from django.shortcuts import render
+from django.urls import path
+from accounts.forms import PeopleImportForm
+from accounts.importer import COLUMNS, Checkpoint, import_people, read_rows
+from accounts.models import User, Student, Instructor, HourTransaction
 
 class CustomUserAdmin(UserAdmin):
     fieldsets = UserAdmin.fieldsets + (
@@ -10,9 +17,49 @@ class CustomUserAdmin(UserAdmin):
     list_display = ('username', 'email', 'first_name', 'last_name', 'user_type', 'is_active')
     list_filter = ('user_type', 'is_active', 'is_staff')
     search_fields = ('username', 'email', 'first_name', 'last_name', 'phone_number')
+    change_list_template = 'admin/accounts/user/change_list.html'
+    
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='accounts_user_import'),
+        ] + super().get_urls()
+    
+    def import_view(self, request):
+        """Import CSV d'élèves et d'instructeurs, avec rapport d'erreurs par ligne."""
+        if not self.has_add_permission(request):
+            messages.error(request, "Vous n'avez pas l'autorisation d'importer des comptes.")
+            return render(request, 'admin/accounts/user/import_people.html', self.admin_site.each_context(request))
+        
+        report = None
+        form = PeopleImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            content = form.cleaned_data['file'].read()
+            # Un même fichier soumis à nouveau reprend après le dernier lot importé
+            checkpoint = Checkpoint.for_file(os.path.join(settings.MEDIA_ROOT, 'imports'), content)
+            try:
+                text = io.StringIO(content.decode('utf-8-sig'), newline='')
+            except UnicodeDecodeError:
+                form.add_error('file', "Le fichier doit être encodé en UTF-8.")
+            else:
+                # Dans le processus du serveur web : pas de pool de processus
+                # de hachage, les gros fichiers passent par `import_people`
+                report = import_people(
+                    read_rows(text), workers=1, checkpoint=checkpoint, dry_run=form.cleaned_data['dry_run'],
+                )
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'title': "Importer des élèves et instructeurs",
+            'opts': self.model._meta,
+            'form': form,
+            'report': report,
+            'columns': COLUMNS,
+        }
+        return render(request, 'admin/accounts/user/import_people.html', context)
 
 class StudentAdmin(admin.ModelAdmin):
     list_display = ('get_full_name', 'remaining_hours', 'get_email')
+    readonly_fields = ('remaining_hours',)
     search_fields = ('user__first_name', 'user__last_name', 'user__email')
     
     def get_full_name(self, obj):
@@ -35,6 +82,23 @@ class InstructorAdmin(admin.ModelAdmin):
         return obj.user.email
     get_email.short_description = 'Email'
 
+class HourTransactionAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'student', 'hours', 'reason', 'description')
+    list_filter = ('reason', 'created_at')
+    search_fields = ('student__user__first_name', 'student__user__last_name', 'description')
+    date_hierarchy = 'created_at'
+    
+    # Journal en ajout seul : aucune modification depuis l'administration
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 admin.site.register(User, CustomUserAdmin)
 admin.site.register(Student, StudentAdmin)
-admin.site.register(Instructor, InstructorAdmin)
\ No newline at end of file
+admin.site.register(Instructor, InstructorAdmin)
+admin.site.register(HourTransaction, HourTransactionAdmin)
\ No newline at end of file
@@ -0,0 +1,167 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from accounts.models import User, Student
+from courses.models import Purchase
+from scheduling.models import Appointment
+from my_driving_school.cache_versions import bump, abump
+
+# Chaque entrée du cache garde la version avec laquelle elle a été calculée.
+# Une écriture incrémente la version concernée : les anciennes entrées ne
+# correspondent plus et sont recalculées à la lecture suivante, même si un
+# calcul concurrent les a réécrites entre-temps.
+STAFF_VERSION_KEY = 'dashboard:version:staff'
+STAFF_STATS_KEY = 'dashboard:stats:staff'
+
+
+def _cache():
+    return caches[settings.DASHBOARD_CACHE_ALIAS]
+
+
+def _user_version_key(user_id):
+    return f'dashboard:version:user:{user_id}'
+
+
+def _user_stats_key(user_id):
+    return f'dashboard:stats:user:{user_id}'
+
+
+def _appointments(user):
+    if user.user_type == 'student':
+        return Appointment.objects.filter(student__user=user)
+    if user.user_type == 'instructor':
+        return Appointment.objects.filter(instructor__user=user)
+    return Appointment.objects.all()
+
+
+def _next_appointment(user, today):
+    return _appointments(user).filter(date__gte=today).order_by('date', 'start_time')
+
+
+def _active_students(user, today):
+    return Student.objects.filter(
+        appointments__instructor__user=user,
+        appointments__date__gte=today
+    ).distinct()
+
+
+async def _compute_stats(user, today):
+    if user.user_type == 'student':
+        total_lessons = await _appointments(user).acount()
+        return {
+            'next_appointment': await _next_appointment(user, today).afirst(),
+            'total_lessons': total_lessons,
+            'progress': min(total_lessons * 5, 100),  # 5% par leçon, max 100%
+        }
+
+    if user.user_type == 'instructor':
+        return {
+            'next_appointment': await _next_appointment(user, today).afirst(),
+            'active_students': await _active_students(user, today).acount(),
+            'total_teaching_hours': await _appointments(user).acount() * 2,  # Hypothèse: 2h par cours
+        }
+
+    # secretary or admin : mêmes chiffres pour tout le personnel
+    return {
+        'next_appointment': await _next_appointment(user, today).afirst(),
+        'active_users': await User.objects.filter(is_active=True).acount(),
+    }
+
+
+def _keys(user):
+    if user.user_type in ('student', 'instructor'):
+        return _user_stats_key(user.pk), _user_version_key(user.pk)
+    return STAFF_STATS_KEY, STAFF_VERSION_KEY
+
+
+async def get_dashboard_stats(user):
+    """
+    Retourne les compteurs de la page d'accueil de `user`, en une seule
+    lecture du cache tant qu'aucune donnée concernée n'a changé. Coroutine :
+    le cache et les requêtes passent par leurs API asynchrones.
+    """
+    cache = _cache()
+    today = timezone.localdate()
+    stats_key, version_key = _keys(user)
+
+    cached = await cache.aget_many([stats_key, version_key])
+    version = cached.get(version_key)
+    entry = cached.get(stats_key)
+    # Le jour fait partie de la version : « prochain rendez-vous » et élèves
+    # actifs dépendent de la date.
+    if entry and version is not None and entry['version'] == (version, today):
+        return entry['stats']
+
+    if version is None:
+        await abump(cache, version_key)
+        version = await cache.aget(version_key)
+
+    stats = await _compute_stats(user, today)
+    await cache.aset(stats_key, {'version': (version, today), 'stats': stats}, settings.DASHBOARD_CACHE_TIMEOUT)
+    return stats
+
+
+def invalidate_dashboards(user_ids=(), staff=False):
+    """Périme après le commit les compteurs des utilisateurs donnés (et du personnel)."""
+    keys = [_user_version_key(user_id) for user_id in user_ids]
+    if staff:
+        keys.append(STAFF_VERSION_KEY)
+    if keys:
+        transaction.on_commit(lambda: bump(_cache(), keys))
+
+
+def _profile_user_ids(student_ids=(), instructor_ids=()):
+    return list(User.objects.filter(
+        Q(student_profile__id__in=student_ids) | Q(instructor_profile__id__in=instructor_ids)
+    ).values_list('pk', flat=True))
+
+
+def _related_user_ids(instance, fields):
+    """
+    Utilisateurs des profils `fields` ('student', 'instructor') de `instance`
+    et, après une modification qui les a changés, des profils précédents. Un
+    profil déjà chargé sur l'instance (formulaire de réservation ou d'achat)
+    donne son user_id sans requête ; les autres sont lus en une requête.
+    """
+    user_ids = set()
+    missing = {'student': set(), 'instructor': set()}
+    loaded = getattr(instance, '_loaded_values', {})
+    for name in fields:
+        field = instance._meta.get_field(name)
+        profile_id = getattr(instance, field.attname)
+        if field.is_cached(instance) and getattr(instance, name).pk == profile_id:
+            user_ids.add(getattr(instance, name).user_id)
+        else:
+            missing[name].add(profile_id)
+        # Lors d'une modification, l'ancien profil perd le rendez-vous ou l'achat
+        previous_id = loaded.get(field.attname, profile_id)
+        if previous_id != profile_id:
+            missing[name].add(previous_id)
+    if missing['student'] or missing['instructor']:
+        user_ids.update(_profile_user_ids(missing['student'], missing['instructor']))
+    return user_ids
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def _appointment_changed(sender, instance, **kwargs):
+    invalidate_dashboards(_related_user_ids(instance, ('student', 'instructor')), staff=True)
+
+
+@receiver(post_save, sender=Purchase)
+@receiver(post_delete, sender=Purchase)
+def _purchase_changed(sender, instance, **kwargs):
+    invalidate_dashboards(_related_user_ids(instance, ('student',)))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _user_changed(sender, instance, update_fields=None, **kwargs):
+    # La mise à jour de last_login à chaque connexion ne change aucun compteur
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    invalidate_dashboards([instance.pk], staff=True)
@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
 from accounts.models import User, Instructor, Student
+from accounts import ledger
 
 class InstructorForm(forms.ModelForm):
     first_name = forms.CharField(max_length=30, required=True, label="Prénom")
@@ -100,6 +101,7 @@ class StudentForm(forms.ModelForm):
     
     def save(self, commit=True):
         student = super().save(commit=False)
+        requested_hours = self.cleaned_data.get('remaining_hours') or 0
         
         if not student.pk:
             # Création d'un nouvel élève
@@ -128,6 +130,17 @@ class StudentForm(forms.ModelForm):
             user.save()
         
         if commit:
-            student.save()
-        
-        return student
\ No newline at end of file
+            # Le solde n'est modifié que par le journal d'heures
+            is_new = not student.pk
+            if is_new:
+                student.remaining_hours = 0
+                student.save()
+            if is_new or 'remaining_hours' in self.changed_data:
+                ledger.set_balance(student.pk, requested_hours, "Saisie du solde par le secrétariat")
+            student.refresh_from_db(fields=['remaining_hours'])
+        return student
+
+
+class PeopleImportForm(forms.Form):
+    file = forms.FileField(label="Fichier CSV", help_text="Encodé en UTF-8, séparateur « ; » ou « , »")
+    dry_run = forms.BooleanField(required=False, label="Valider uniquement (ne rien créer)")
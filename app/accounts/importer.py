@@ -0,0 +1,230 @@
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from accounts.dashboard import invalidate_dashboards
+from accounts.models import User, Student, Instructor, HourTransaction
+
+# Colonnes du fichier CSV ; password, remaining_hours et specialization sont facultatives
+COLUMNS = ['user_type', 'username', 'email', 'first_name', 'last_name', 'phone_number', 'address',
+           'password', 'remaining_hours', 'specialization']
+REQUIRED = ['user_type', 'username', 'email', 'first_name', 'last_name']
+USER_TYPES = ('student', 'instructor')
+
+
+class ImportReport:
+    """Bilan d'un import : comptes créés, lignes déjà traitées et erreurs par ligne."""
+
+    def __init__(self):
+        self.students = 0
+        self.instructors = 0
+        self.skipped = 0
+        self.errors = []
+
+    def add_error(self, line, username, message):
+        self.errors.append((line, username, message))
+
+
+class Checkpoint:
+    """
+    Dernière ligne importée, enregistrée après chaque lot validé : relancer
+    l'import du même fichier reprend après cette ligne.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @classmethod
+    def for_file(cls, directory, content):
+        """
+        Point de reprise propre au contenu du fichier, quel que soit son nom :
+        un fichier corrigé repart du début. `content` : octets du fichier ou
+        fichier ouvert en binaire.
+        """
+        if isinstance(content, bytes):
+            digest = hashlib.sha256(content)
+        else:
+            digest = hashlib.sha256()
+            for block in iter(lambda: content.read(1 << 20), b''):
+                digest.update(block)
+        return cls(os.path.join(directory, f"{digest.hexdigest()}.checkpoint"))
+
+    def load(self):
+        try:
+            with open(self.path) as checkpoint_file:
+                return json.load(checkpoint_file)['line']
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    def save(self, line):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'w') as checkpoint_file:
+            json.dump({'line': line}, checkpoint_file)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def read_rows(text_file):
+    """
+    Lignes du CSV (séparateur « ; » ou « , ») avec leur numéro de ligne dans
+    le fichier, l'en-tête étant la ligne 1.
+    """
+    header = text_file.readline().lstrip('\ufeff')
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    fieldnames = [name.strip() for name in next(csv.reader([header], delimiter=delimiter))]
+    reader = csv.DictReader(text_file, fieldnames=fieldnames, delimiter=delimiter)
+    for row in reader:
+        yield reader.line_num + 1, {key: (value or '').strip() for key, value in row.items() if key}
+
+
+def _validate(row, seen_usernames):
+    missing = [column for column in REQUIRED if not row.get(column)]
+    if missing:
+        return f"Colonnes obligatoires manquantes : {', '.join(missing)}."
+    if row['user_type'] not in USER_TYPES:
+        return f"Type inconnu « {row['user_type']} » (student ou instructor)."
+    if len(row['username']) > 150:
+        return "Nom d'utilisateur trop long (150 caractères maximum)."
+    if row['username'] in seen_usernames:
+        return f"Nom d'utilisateur « {row['username']} » en double dans le fichier."
+    try:
+        validate_email(row['email'])
+    except ValidationError:
+        return f"Adresse email invalide « {row['email']} »."
+    if len(row.get('phone_number', '')) > 15:
+        return "Numéro de téléphone trop long (15 caractères maximum)."
+    hours = row.get('remaining_hours') or '0'
+    if not hours.isdigit():
+        return f"Nombre d'heures invalide « {hours} »."
+    return None
+
+
+def validate_batch(rows, seen_usernames, report):
+    """
+    Valide un lot de lignes : contrôles de format ligne par ligne, puis une
+    seule requête pour les noms d'utilisateur déjà pris.
+    """
+    candidates = []
+    for line, row in rows:
+        error = _validate(row, seen_usernames)
+        if error:
+            report.add_error(line, row.get('username', ''), error)
+            continue
+        seen_usernames.add(row['username'])
+        candidates.append((line, row))
+
+    taken = set(User.objects.filter(
+        username__in=[row['username'] for _, row in candidates]
+    ).values_list('username', flat=True))
+
+    valid = []
+    for line, row in candidates:
+        if row['username'] in taken:
+            report.add_error(line, row['username'], f"Le nom d'utilisateur « {row['username']} » existe déjà.")
+        else:
+            valid.append((line, row))
+    return valid
+
+
+def _hash_passwords(rows, executor):
+    # Sans mot de passe, le compte reçoit un mot de passe inutilisable (pas de hachage)
+    to_hash = [row['password'] for _, row in rows if row.get('password')]
+    hashed = iter(executor.map(make_password, to_hash, chunksize=16) if executor else map(make_password, to_hash))
+    return [next(hashed) if row.get('password') else make_password(None) for _, row in rows]
+
+
+def _insert_batch(rows, passwords, report):
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(
+                username=row['username'],
+                password=password,
+                email=row['email'],
+                first_name=row['first_name'],
+                last_name=row['last_name'],
+                user_type=row['user_type'],
+                phone_number=row.get('phone_number', ''),
+                address=row.get('address', ''),
+            )
+            for (_, row), password in zip(rows, passwords)
+        ])
+
+        students = Student.objects.bulk_create([
+            Student(user=user, remaining_hours=int(row.get('remaining_hours') or 0))
+            for user, (_, row) in zip(users, rows) if row['user_type'] == 'student'
+        ])
+        # Le solde initial passe par le journal d'heures, comme une saisie manuelle
+        HourTransaction.objects.bulk_create([
+            HourTransaction(student=student, hours=student.remaining_hours, reason='adjustment',
+                            description="Solde initial (import)")
+            for student in students if student.remaining_hours
+        ])
+        instructors = Instructor.objects.bulk_create([
+            Instructor(user=user, specialization=row.get('specialization', ''))
+            for user, (_, row) in zip(users, rows) if row['user_type'] == 'instructor'
+        ])
+
+    report.students += len(students)
+    report.instructors += len(instructors)
+
+
+def import_people(rows, chunk_size=500, workers=None, checkpoint=None, dry_run=False):
+    """
+    Importe des élèves et instructeurs par lots de `chunk_size` lignes.
+
+    Chaque lot est validé en bloc, ses mots de passe sont hachés en parallèle
+    sur `workers` processus, puis utilisateurs et profils sont insérés par
+    bulk_create dans une transaction. Le point de reprise est mis à jour après
+    chaque lot : une interruption ne fait perdre que le lot en cours.
+    """
+    report = ImportReport()
+    resume_after = checkpoint.load() if checkpoint else 0
+    seen_usernames = set()
+    workers = workers if workers is not None else os.cpu_count() or 1
+    executor = None
+    if workers > 1 and not dry_run:
+        # « spawn » plutôt que fork : pas de copie des connexions à la base
+        # ni des threads du processus appelant. Django doit alors y être
+        # initialisé pour lire PASSWORD_HASHERS ; l'initialiseur ne doit pas
+        # venir d'un module qui importe des modèles (comme celui-ci)
+        executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup,
+        )
+
+    try:
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, chunk_size))
+            if not batch:
+                break
+            last_line = batch[-1][0]
+            if last_line <= resume_after:
+                report.skipped += len(batch)
+                continue
+            report.skipped += sum(1 for line, _ in batch if line <= resume_after)
+            batch = [(line, row) for line, row in batch if line > resume_after]
+
+            valid = validate_batch(batch, seen_usernames, report)
+            if valid and not dry_run:
+                _insert_batch(valid, _hash_passwords(valid, executor), report)
+            if checkpoint and not dry_run:
+                checkpoint.save(last_line)
+    finally:
+        if executor:
+            executor.shutdown()
+
+    report.errors.sort()
+    if report.students or report.instructors:
+        # bulk_create n'envoie pas post_save : compteurs du personnel à recalculer
+        invalidate_dashboards(staff=True)
+    return report
@@ -0,0 +1,53 @@
+from django.db import transaction
+from django.db.models import F
+from accounts.models import Student, HourTransaction
+
+
+class InsufficientHours(Exception):
+    """Le solde de l'élève ne couvre pas le débit demandé."""
+
+
+# Les mouvements s'inscrivent dans la transaction de l'opération qui les
+# cause (réservation, achat) sans point de sauvegarde, qui coûterait deux
+# allers-retours de plus : un échec l'annule en entier.
+
+
+def credit(student_id, hours, reason, description=''):
+    """Ajoute des heures au solde de l'élève et journalise le mouvement."""
+    with transaction.atomic(savepoint=False):
+        Student.objects.filter(pk=student_id).update(remaining_hours=F('remaining_hours') + hours)
+        HourTransaction.objects.create(student_id=student_id, hours=hours, reason=reason, description=description)
+
+
+def debit(student_id, hours, reason, description=''):
+    """
+    Retire des heures du solde de l'élève.
+
+    La vérification du solde et le débit sont faits dans une seule requête
+    UPDATE gardée, sans lecture préalable : deux workers ne peuvent pas
+    consommer les mêmes heures. Lève InsufficientHours si le solde est trop bas.
+    """
+    with transaction.atomic(savepoint=False):
+        updated = Student.objects.filter(pk=student_id, remaining_hours__gte=hours).update(
+            remaining_hours=F('remaining_hours') - hours
+        )
+        if updated:
+            HourTransaction.objects.create(student_id=student_id, hours=-hours, reason=reason, description=description)
+    # Hors du bloc : rien n'a été écrit, la transaction englobante reste utilisable
+    if not updated:
+        raise InsufficientHours()
+
+
+def adjust(student_id, hours, reason, description=''):
+    """Applique une variation signée du solde (crédit si positive, débit si négative)."""
+    if hours > 0:
+        credit(student_id, hours, reason, description)
+    elif hours < 0:
+        debit(student_id, -hours, reason, description)
+
+
+def set_balance(student_id, hours, description=''):
+    """Fixe le solde de l'élève à une valeur donnée en journalisant l'écart."""
+    with transaction.atomic():
+        current = Student.objects.select_for_update().values_list('remaining_hours', flat=True).get(pk=student_id)
+        adjust(student_id, hours - current, 'adjustment', description)
@@ -0,0 +1,68 @@
+import csv
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from accounts.importer import COLUMNS, Checkpoint, import_people, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe des élèves et instructeurs depuis un fichier CSV. Colonnes : "
+        + ", ".join(COLUMNS)
+        + " (password, remaining_hours et specialization facultatives)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help="Fichier CSV encodé en UTF-8, séparateur « ; » ou « , »")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Lignes validées et insérées par transaction")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Processus de hachage des mots de passe (défaut : nombre de CPU)")
+        parser.add_argument('--checkpoint', default=None,
+                            help="Fichier de reprise (défaut : <empreinte du contenu>.checkpoint, à côté du fichier)")
+        parser.add_argument('--restart', action='store_true', help="Ignorer le point de reprise existant")
+        parser.add_argument('--errors', default=None, help="Écrire le rapport d'erreurs dans ce fichier CSV")
+        parser.add_argument('--dry-run', action='store_true', help="Valider le fichier sans rien créer")
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['file']):
+            raise CommandError(f"Fichier introuvable : {options['file']}")
+
+        if options['checkpoint']:
+            checkpoint = Checkpoint(options['checkpoint'])
+        else:
+            # Comme depuis l'admin : un fichier corrigé ne reprend pas le point
+            # de reprise de sa version précédente
+            with open(options['file'], 'rb') as csv_file:
+                checkpoint = Checkpoint.for_file(os.path.dirname(os.path.abspath(options['file'])), csv_file)
+        if options['restart']:
+            checkpoint.clear()
+
+        start = time.perf_counter()
+        with open(options['file'], encoding='utf-8', newline='') as csv_file:
+            report = import_people(
+                read_rows(csv_file),
+                chunk_size=options['chunk_size'],
+                workers=options['workers'],
+                checkpoint=checkpoint,
+                dry_run=options['dry_run'],
+            )
+        elapsed = time.perf_counter() - start
+
+        if options['errors']:
+            with open(options['errors'], 'w', encoding='utf-8', newline='') as errors_file:
+                writer = csv.writer(errors_file, delimiter=';')
+                writer.writerow(['ligne', 'username', 'erreur'])
+                writer.writerows(report.errors)
+        else:
+            for line, username, message in report.errors:
+                self.stderr.write(f"Ligne {line} ({username or '?'}) : {message}")
+
+        if report.skipped:
+            self.stdout.write(f"{report.skipped} lignes déjà importées ignorées (reprise).")
+        summary = (
+            f"{report.students} élèves et {report.instructors} instructeurs créés, "
+            f"{len(report.errors)} lignes en erreur, en {elapsed:.1f} s."
+        )
+        if options['dry_run']:
+            summary = f"Validation seule : {len(report.errors)} lignes en erreur."
+        self.stdout.write(self.style.SUCCESS(summary) if not report.errors else self.style.WARNING(summary))
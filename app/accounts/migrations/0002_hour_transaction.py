@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='is_active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.CreateModel(
+            name='HourTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hours', models.IntegerField(help_text='Heures ajoutées (positif) ou retirées (négatif)')),
+                ('reason', models.CharField(choices=[('purchase', 'Achat de forfait'), ('booking', 'Réservation'), ('booking_change', 'Modification de réservation'), ('cancellation', 'Annulation'), ('adjustment', 'Ajustement manuel')], max_length=20)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hour_transactions', to='accounts.student')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:20
+
+import accounts.models
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def populate_tokens(apps, schema_editor):
+    # Un jeton distinct par profil existant (un default appelable n'est évalué
+    # qu'une fois par AddField)
+    for model_name in ('Student', 'Instructor'):
+        model = apps.get_model('accounts', model_name)
+        for profile in model.objects.all():
+            profile.calendar_token = accounts.models.generate_calendar_token()
+            profile.save(update_fields=['calendar_token'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_hour_transaction'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instructor',
+            name='calendar_token',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='instructor',
+            name='schedule_updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='calendar_token',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='schedule_updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.RunPython(populate_tokens, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='instructor',
+            name='calendar_token',
+            field=models.CharField(default=accounts.models.generate_calendar_token, editable=False, max_length=64, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='student',
+            name='calendar_token',
+            field=models.CharField(default=accounts.models.generate_calendar_token, editable=False, max_length=64, unique=True),
+        ),
+    ]
@@ -0,0 +1,78 @@
+from django.db import migrations
+
+# Copies figées de accounts.search au moment de cette migration : la modifier
+# là-bas demande une nouvelle migration, pas de changer l'historique
+FTS_TABLE = 'accounts_user_search'
+SEARCH_EXPRESSION = (
+    "lower(first_name || ' ' || last_name || ' ' || username || ' ' || email || ' ' || "
+    "coalesce(regexp_replace(phone_number, '[^0-9]', '', 'g'), ''))"
+)
+
+FTS_COLUMNS = 'kind, first_name, last_name, username, email, phone'
+# kind : type de l'utilisateur, vide s'il est archivé (plus proposé). Le
+# téléphone est indexé sans espaces, points ni tirets
+# (« 06 12 34 56 78 » -> « 0612345678 »).
+FTS_VALUES = (
+    "CASE WHEN {row}.is_active THEN {row}.user_type ELSE '' END, "
+    "{row}.first_name, {row}.last_name, {row}.username, {row}.email, "
+    "replace(replace(replace(coalesce({row}.phone_number, ''), ' ', ''), '.', ''), '-', '')"
+)
+
+SQLITE_FORWARD = [
+    # Table sans contenu (content='') : seul l'index est stocké, les résultats
+    # sont relus dans accounts_user par rowid
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        {FTS_COLUMNS}, content='', prefix='2 3', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON accounts_user BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {FTS_COLUMNS}) VALUES (new.id, {FTS_VALUES.format(row='new')});
+    END""",
+    # Une table sans contenu ne se met à jour qu'avec la commande 'delete',
+    # qui reçoit les anciennes valeurs indexées
+    f"""CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON accounts_user BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {FTS_COLUMNS}) VALUES ('delete', old.id, {FTS_VALUES.format(row='old')});
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE OF user_type, is_active, first_name, last_name, username, email, phone_number ON accounts_user BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {FTS_COLUMNS}) VALUES ('delete', old.id, {FTS_VALUES.format(row='old')});
+        INSERT INTO {FTS_TABLE}(rowid, {FTS_COLUMNS}) VALUES (new.id, {FTS_VALUES.format(row='new')});
+    END""",
+    f"INSERT INTO {FTS_TABLE}(rowid, {FTS_COLUMNS}) SELECT id, {FTS_VALUES.format(row='accounts_user')} FROM accounts_user",
+]
+
+SQLITE_BACKWARD = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX accounts_user_search_trgm ON accounts_user USING gin (({SEARCH_EXPRESSION}) gin_trgm_ops)",
+]
+
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS accounts_user_search_trgm",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement, params=None)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_calendar_feed'),
+    ]
+
+    operations = [
+        # Index de recherche propre au moteur de base de données (voir accounts.search)
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            _run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,53 @@
+from django.db import migrations
+
+# Copies figées de accounts.search au moment de cette migration : la modifier
+# là-bas demande une nouvelle migration, pas de changer l'historique
+PREVIOUS_EXPRESSION = (
+    "lower(first_name || ' ' || last_name || ' ' || username || ' ' || email || ' ' || "
+    "coalesce(regexp_replace(phone_number, '[^0-9]', '', 'g'), ''))"
+)
+# Comme l'index FTS5 de SQLite : sans accents, téléphone sans espaces,
+# points ni tirets
+SEARCH_EXPRESSION = (
+    "accounts_unaccent(lower(first_name || ' ' || last_name || ' ' || username || ' ' || email || ' ' || "
+    "translate(coalesce(phone_number, ''), ' .-', '')))"
+)
+
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # unaccent() n'est pas IMMUTABLE (son dictionnaire par défaut dépend de la
+    # session) : une expression d'index doit passer par un dictionnaire fixé
+    """CREATE OR REPLACE FUNCTION accounts_unaccent(text) RETURNS text
+        AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT""",
+    "DROP INDEX IF EXISTS accounts_user_search_trgm",
+    f"CREATE INDEX accounts_user_search_trgm ON accounts_user USING gin (({SEARCH_EXPRESSION}) gin_trgm_ops)",
+]
+
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS accounts_user_search_trgm",
+    f"CREATE INDEX accounts_user_search_trgm ON accounts_user USING gin (({PREVIOUS_EXPRESSION}) gin_trgm_ops)",
+    "DROP FUNCTION IF EXISTS accounts_unaccent(text)",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement, params=None)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_search'),
+    ]
+
+    operations = [
+        # L'index FTS5 de SQLite est inchangé
+        migrations.RunPython(
+            _run({'postgresql': POSTGRESQL_FORWARD}),
+            _run({'postgresql': POSTGRESQL_BACKWARD}),
+        ),
+    ]
@@ -1,6 +1,12 @@
+import secrets
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.urls import reverse
+from django.utils import timezone
+
+
+def generate_calendar_token():
+    return secrets.token_urlsafe(32)
 
 class User(AbstractUser):
     USER_TYPE_CHOICES = (
@@ -17,6 +23,10 @@ class User(AbstractUser):
 class Student(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='student_profile')
     remaining_hours = models.PositiveIntegerField(default=0)
+    # Flux iCalendar : jeton secret de l'URL d'abonnement et date du dernier
+    # changement de planning (ETag/Last-Modified sans lire les rendez-vous)
+    calendar_token = models.CharField(max_length=64, unique=True, default=generate_calendar_token, editable=False)
+    schedule_updated_at = models.DateTimeField(default=timezone.now, editable=False)
     
     def get_absolute_url(self):
         return reverse('student_detail', args=[str(self.id)])
@@ -27,9 +37,34 @@ class Student(models.Model):
 class Instructor(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='instructor_profile')
     specialization = models.CharField(max_length=100, blank=True, null=True)
+    # Flux iCalendar : jeton secret de l'URL d'abonnement et date du dernier
+    # changement de planning (ETag/Last-Modified sans lire les rendez-vous)
+    calendar_token = models.CharField(max_length=64, unique=True, default=generate_calendar_token, editable=False)
+    schedule_updated_at = models.DateTimeField(default=timezone.now, editable=False)
     
     def get_absolute_url(self):
         return reverse('instructor_detail', args=[str(self.id)])
     
     def __str__(self):
-        return f"{self.user.first_name} {self.user.last_name}"
\ No newline at end of file
+        return f"{self.user.first_name} {self.user.last_name}"
+
+class HourTransaction(models.Model):
+    """Mouvement d'heures sur le solde d'un élève (journal en ajout seul)."""
+    REASON_CHOICES = (
+        ('purchase', 'Achat de forfait'),
+        ('booking', 'Réservation'),
+        ('booking_change', 'Modification de réservation'),
+        ('cancellation', 'Annulation'),
+        ('adjustment', 'Ajustement manuel'),
+    )
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='hour_transactions')
+    hours = models.IntegerField(help_text="Heures ajoutées (positif) ou retirées (négatif)")
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    description = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.student} : {self.hours:+d}h ({self.get_reason_display()})"
@@ -0,0 +1,110 @@
+import asyncio
+from dataclasses import dataclass
+from functools import wraps
+from typing import Optional
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import ObjectDoesNotExist
+from django.shortcuts import redirect
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+from accounts.models import User, Student, Instructor
+
+# Types d'utilisateurs du secrétariat, qui voient toute l'auto-école
+OFFICE_TYPES = ('secretary', 'admin')
+
+PAGE_DENIED = "Vous n'avez pas l'autorisation de voir cette page."
+ACTION_DENIED = "Vous n'avez pas l'autorisation d'effectuer cette action."
+
+
+@dataclass(frozen=True)
+class Role:
+    """Type de l'utilisateur connecté et son profil d'élève ou d'instructeur."""
+    user: User
+    user_type: str
+    student: Optional[Student] = None
+    instructor: Optional[Instructor] = None
+
+    @property
+    def profile(self):
+        return self.student or self.instructor
+
+    @property
+    def is_student(self):
+        return self.user_type == 'student'
+
+    @property
+    def is_instructor(self):
+        return self.user_type == 'instructor'
+
+    @property
+    def is_office(self):
+        return self.user_type in OFFICE_TYPES
+
+
+def _profile(user, name):
+    try:
+        return getattr(user, name)
+    except ObjectDoesNotExist:
+        return None
+
+
+def get_role(user):
+    """
+    Rôle de `user`. Sans requête si l'utilisateur a été chargé par
+    ProfileBackend (profils déjà joints) ; un visiteur anonyme n'a pas de type.
+    """
+    if not user.is_authenticated:
+        return Role(user, '')
+    return Role(
+        user, user.user_type,
+        student=_profile(user, 'student_profile') if user.user_type == 'student' else None,
+        instructor=_profile(user, 'instructor_profile') if user.user_type == 'instructor' else None,
+    )
+
+
+class RoleMiddleware(MiddlewareMixin):
+    """
+    Ajoute request.role, calculé à la première lecture depuis request.user.
+    À placer après AuthenticationMiddleware. Les vues async passent par
+    aget_user, qui le calcule hors de la boucle d'événements.
+    """
+
+    def process_request(self, request):
+        request.role = SimpleLazyObject(lambda: get_role(request.user))
+
+
+def role_required(*user_types, message=PAGE_DENIED, redirect_to='profile'):
+    """
+    Réserve une vue (sync ou async) aux utilisateurs connectés dont le type
+    est dans `user_types` ; les autres sont renvoyés vers `redirect_to` avec
+    `message`. Remplace login_required / async_login_required.
+    """
+
+    def refuse(request):
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        if request.role.user_type not in user_types:
+            messages.error(request, message)
+            return redirect(redirect_to)
+        return None
+
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            # Import local : async_auth importe ce module
+            from my_driving_school.async_auth import aget_user
+
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                await aget_user(request)
+                return refuse(request) or await view(request, *args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return refuse(request) or view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,43 @@
+from django.db.models import Count, Exists, Max, Min, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from accounts.models import Student
+from scheduling.models import Appointment
+
+# Élèves suivis par un instructeur : ceux qui ont au moins un rendez-vous
+# avec lui, passé ou à venir. Les annotations sont calculées dans la même
+# requête que la liste, sans requête par élève.
+
+
+def instructor_students(instructor):
+    """Élèves de `instructor` (semi-jointure EXISTS, sans doublons)."""
+    return Student.objects.filter(
+        Exists(Appointment.objects.filter(instructor=instructor, student=OuterRef('pk')))
+    )
+
+
+def instructor_roster(instructor, today=None):
+    """
+    Élèves de `instructor` avec, pour leurs rendez-vous avec lui :
+    - lesson_count : nombre de leçons, passées et à venir ;
+    - hours_consumed : heures des leçons déjà passées ;
+    - last_lesson_date, last_lesson_start, last_lesson_end : dernière leçon
+      passée (None s'il n'y en a pas) ;
+    - next_lesson_date : prochaine leçon, aujourd'hui compris.
+    Une seule requête, triée par nom.
+    """
+    today = today or timezone.localdate()
+    past = Q(appointments__date__lt=today)
+    upcoming = Q(appointments__date__gte=today)
+    last_lesson = Appointment.objects.filter(
+        instructor=instructor, student=OuterRef('pk'), date__lt=today
+    ).order_by('-date', '-start_time')
+
+    return Student.objects.filter(appointments__instructor=instructor).annotate(
+        lesson_count=Count('appointments'),
+        hours_consumed=Coalesce(Sum('appointments__duration', filter=past), 0),
+        last_lesson_date=Max('appointments__date', filter=past),
+        next_lesson_date=Min('appointments__date', filter=upcoming),
+        last_lesson_start=Subquery(last_lesson.values('start_time')[:1]),
+        last_lesson_end=Subquery(last_lesson.values('end_time')[:1]),
+    ).select_related('user').order_by('user__last_name', 'user__first_name', 'pk')
@@ -0,0 +1,165 @@
+import re
+import unicodedata
+from django.db import connection
+from django.db.models import Q
+from accounts.models import User, Student, Instructor
+
+# Recherche d'élèves et d'instructeurs par nom, e-mail, téléphone et
+# identifiant, pour les champs de saisie avec suggestions.
+# - SQLite : table FTS5 accounts_user_search, index de préfixes tenu à jour
+#   par des triggers sur accounts_user (migration 0004) ;
+# - PostgreSQL : index trigramme (pg_trgm) sur l'expression SEARCH_EXPRESSION,
+#   interrogé avec la même règle que FTS5 (chaque mot commence un mot indexé) ;
+# - autres bases : filtres istartswith, sans index dédié.
+MAX_LIMIT = 20
+# Correspondances examinées au plus pour classer les résultats (SQLite)
+MAX_CANDIDATES = 500
+# Les mots plus courts correspondent à trop de personnes pour être utiles
+MIN_TOKEN_LENGTH = 2
+
+# Profil de chaque type et colonne du profil renvoyée avec les résultats
+PROFILES = {
+    'student': (Student, 'remaining_hours'),
+    'instructor': (Instructor, 'specialization'),
+}
+
+# Table créée par la migration 0004_user_search et expression de la migration
+# 0005_user_search_words, qui en gardent leur propre copie : toute
+# modification passe par une nouvelle migration
+FTS_TABLE = 'accounts_user_search'
+# Champs indexés en trigrammes (PostgreSQL), en minuscules et sans accents ;
+# le téléphone est indexé sans espaces, points ni tirets, comme dans FTS_TABLE
+# (« 06 12 34 56 78 » -> « 0612345678 »)
+SEARCH_EXPRESSION = (
+    "accounts_unaccent(lower(first_name || ' ' || last_name || ' ' || username || ' ' || email || ' ' || "
+    "translate(coalesce(phone_number, ''), ' .-', '')))"
+)
+NAME_EXPRESSION = "accounts_unaccent(lower(first_name || ' ' || last_name))"
+# Début d'un mot, au sens du tokenizer unicode61 de FTS5
+WORD_START = '(^|[^[:alnum:]])'
+# Séparateurs entre les groupes de chiffres d'un numéro saisi
+# (« 06 12 », « 06.12 », « 06-12 »), absents du téléphone indexé
+DIGIT_SEPARATORS = re.compile(r'(?<=\d)[ .-]+(?=\d)')
+
+
+def tokenize(query):
+    """
+    Mots de la recherche, en minuscules, découpés comme par l'index FTS5. Les
+    groupes de chiffres d'un numéro ne forment qu'un mot, comme le téléphone
+    indexé : « 06 12 » cherche « 0612 ».
+    """
+    query = DIGIT_SEPARATORS.sub('', query.lower())
+    return [token for token in re.split(r'[\W_]+', query) if token]
+
+
+def search_people(query, user_type, limit=10):
+    """
+    Profils actifs de type `user_type` dont les champs commencent par chacun
+    des mots de `query` (nom, e-mail, téléphone, identifiant). Les personnes
+    trouvées par leur prénom ou leur nom viennent en premier.
+    Retourne des dictionnaires (id du profil, prénom, nom, e-mail, téléphone
+    et la colonne du profil indiquée dans PROFILES).
+    """
+    tokens = tokenize(query)
+    if not tokens or max(len(token) for token in tokens) < MIN_TOKEN_LENGTH:
+        return []
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    if connection.vendor == 'sqlite':
+        return _search_sqlite(tokens, user_type, limit)
+    if connection.vendor == 'postgresql':
+        return _search_postgresql(tokens, user_type, limit)
+    return _search_fallback(tokens, user_type, limit)
+
+
+def find_profile(user_type, pk):
+    """
+    Profil déjà choisi dans un champ de recherche (formulaire renvoyé avec des
+    erreurs, lien pré-rempli), ou None si l'id est absent ou invalide.
+    """
+    if not str(pk or '').isdigit():
+        return None
+    model, _ = PROFILES[user_type]
+    return model.objects.select_related('user').filter(pk=pk).first()
+
+
+def _select(user_type, source):
+    # Colonnes renvoyées, depuis `source` (où accounts_user est nommée u)
+    model, column = PROFILES[user_type]
+    return (
+        f"SELECT p.id, u.first_name, u.last_name, u.email, u.phone_number, p.{column} "
+        f"FROM {source} JOIN {model._meta.db_table} p ON p.user_id = u.id"
+    )
+
+
+def _rows(cursor):
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _search_sqlite(tokens, user_type, limit):
+    # Chaque mot est un préfixe entre guillemets : aucun opérateur FTS5 possible
+    words = ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+    kind = f'kind : "{user_type}"'
+    # Les correspondances sur le prénom et le nom passent avant celles sur
+    # l'e-mail, l'identifiant ou le téléphone. Le nombre de candidats est borné :
+    # une recherche très large (« 06 ») ne trie pas toute la table.
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            WITH candidates (rowid, by_name) AS (
+                SELECT * FROM (SELECT rowid, 1 FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT %s)
+                UNION ALL
+                SELECT * FROM (SELECT rowid, 0 FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT %s)
+            )
+            {_select(user_type, 'candidates c JOIN accounts_user u ON u.id = c.rowid')}
+            GROUP BY p.id
+            ORDER BY max(c.by_name) DESC, u.last_name, u.first_name, p.id
+            LIMIT %s
+        """, [
+            f'{kind} AND {{first_name last_name}} : ({words})', MAX_CANDIDATES,
+            f'{kind} AND {{first_name last_name username email phone}} : ({words})', MAX_CANDIDATES,
+            limit,
+        ])
+        return _rows(cursor)
+
+
+def _unaccent(token):
+    # remove_diacritics de FTS5, unaccent de PostgreSQL : « é » -> « e »
+    return ''.join(
+        char for char in unicodedata.normalize('NFKD', token) if not unicodedata.combining(char)
+    )
+
+
+def _search_postgresql(tokens, user_type, limit):
+    # Chaque mot commence un mot de l'expression indexée, comme les préfixes
+    # FTS5 de SQLite ; les expressions régulières sont servies par l'index
+    # trigramme. Les mots ne contiennent que des lettres et des chiffres.
+    patterns = [WORD_START + _unaccent(token) for token in tokens]
+    conditions = ' AND '.join(f"{SEARCH_EXPRESSION} ~ %s" for _ in tokens)
+    by_name = ' AND '.join(f"{NAME_EXPRESSION} ~ %s" for _ in tokens)
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            {_select(user_type, 'accounts_user u')}
+            WHERE {conditions} AND u.user_type = %s AND u.is_active
+            ORDER BY ({by_name}) DESC, u.last_name, u.first_name, p.id
+            LIMIT %s
+        """, [*patterns, user_type, *patterns, limit])
+        return _rows(cursor)
+
+
+def _search_fallback(tokens, user_type, limit):
+    users = User.objects.filter(user_type=user_type, is_active=True)
+    for token in tokens:
+        users = users.filter(
+            Q(first_name__istartswith=token) | Q(last_name__istartswith=token) | Q(username__istartswith=token)
+            | Q(email__istartswith=token) | Q(phone_number__contains=token)
+        )
+    _, column = PROFILES[user_type]
+    profile = f'{user_type}_profile'
+    return [
+        {'id': row[profile], 'first_name': row['first_name'], 'last_name': row['last_name'],
+         'email': row['email'], 'phone_number': row['phone_number'], column: row[f'{profile}__{column}']}
+        for row in users.exclude(**{profile: None}).order_by('last_name', 'first_name').values(
+            profile, 'first_name', 'last_name', 'email', 'phone_number', f'{profile}__{column}'
+        )[:limit]
+    ]
@@ -0,0 +1,310 @@
+import io
+import os
+import tempfile
+from datetime import date, time, timedelta
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from accounts import ledger
+from accounts.backends import ProfileBackend
+from accounts.dashboard import _related_user_ids, get_dashboard_stats
+from accounts.importer import Checkpoint, import_people, read_rows
+from accounts.models import User, Student, Instructor, HourTransaction
+from accounts.roster import instructor_roster, instructor_students
+from accounts.roles import ACTION_DENIED, PAGE_DENIED, get_role
+from accounts.search import search_people, tokenize
+from my_driving_school.testing import TEST_STORAGES
+from scheduling.models import Appointment
+
+
+class LedgerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = Student.objects.create(user=User.objects.create_user('eleve', user_type='student'), remaining_hours=3)
+
+    def balance(self):
+        return Student.objects.values_list('remaining_hours', flat=True).get(pk=self.student.pk)
+
+    def test_debit_is_one_guarded_update_and_its_journal_line(self):
+        # Pas de lecture du solde avant l'écriture
+        with self.assertNumQueries(2):
+            ledger.debit(self.student.pk, 2, 'booking')
+        self.assertEqual(self.balance(), 1)
+        self.assertEqual(list(HourTransaction.objects.values_list('hours', 'reason')), [(-2, 'booking')])
+
+    def test_insufficient_balance(self):
+        with self.assertRaises(ledger.InsufficientHours):
+            ledger.debit(self.student.pk, 4, 'booking')
+        # Rien n'est écrit et la transaction en cours reste utilisable
+        self.assertEqual(self.balance(), 3)
+        self.assertFalse(HourTransaction.objects.exists())
+
+    def test_concurrent_debits_cannot_overdraw(self):
+        # Deux workers ont lu le même solde de 3 heures : chacun le croit
+        # suffisant pour 2 heures, seule la garde de l'UPDATE les départage
+        first, second = Student.objects.get(pk=self.student.pk), Student.objects.get(pk=self.student.pk)
+        self.assertTrue(first.remaining_hours >= 2 and second.remaining_hours >= 2)
+        ledger.debit(first.pk, 2, 'booking')
+        with self.assertRaises(ledger.InsufficientHours):
+            ledger.debit(second.pk, 2, 'booking')
+        self.assertEqual(self.balance(), 1)
+        self.assertEqual(HourTransaction.objects.count(), 1)
+
+    def test_set_balance_journals_the_difference(self):
+        ledger.set_balance(self.student.pk, 8)
+        ledger.set_balance(self.student.pk, 5)
+        self.assertEqual(self.balance(), 5)
+        self.assertEqual(list(HourTransaction.objects.order_by('pk').values_list('hours', flat=True)), [5, -3])
+
+
+class ImportCheckpointTests(TestCase):
+    CSV = "user_type;username;email;first_name;last_name\n" + "".join(
+        f"student;eleve{index};eleve{index}@example.com;Élève;{index}\n" for index in range(4)
+    )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def run_import(self, text):
+        checkpoint = Checkpoint.for_file(self.directory, text.encode())
+        return import_people(read_rows(io.StringIO(text, newline='')), chunk_size=2, workers=1, checkpoint=checkpoint)
+
+    def test_checkpoint_follows_content_not_name(self):
+        content = self.CSV.encode()
+        self.assertEqual(Checkpoint.for_file(self.directory, content).path, Checkpoint.for_file(self.directory, io.BytesIO(content)).path)
+        self.assertNotEqual(
+            Checkpoint.for_file(self.directory, content).path,
+            Checkpoint.for_file(self.directory, content.replace(b'eleve3', b'eleve9')).path,
+        )
+        self.assertTrue(Checkpoint.for_file(self.directory, content).path.startswith(self.directory + os.sep))
+
+    def test_same_file_resumes_and_corrected_file_starts_over(self):
+        self.assertEqual(self.run_import(self.CSV).students, 4)
+        self.assertEqual(self.run_import(self.CSV).skipped, 4)
+        # Fichier corrigé : toutes ses lignes sont relues
+        report = self.run_import(self.CSV.replace('eleve3', 'eleve9'))
+        self.assertEqual((report.skipped, report.students, len(report.errors)), (0, 1, 3))
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        def student(username, first_name, last_name, **fields):
+            user = User.objects.create_user(
+                username, first_name=first_name, last_name=last_name, user_type='student', **fields
+            )
+            return Student.objects.create(user=user)
+
+        cls.martin = student('lmartin', 'Léa', 'Martin', phone_number='06 12 34 56 78')
+        # Trouvé par son e-mail seulement
+        cls.durand = student('pdurand', 'Paul', 'Durand', email='martine.lopez@example.com')
+        cls.archived = student('amartin', 'Alain', 'Martin', is_active=False)
+        Instructor.objects.create(user=User.objects.create_user(
+            'jmartin', first_name='Jean', last_name='Martin', user_type='instructor',
+        ))
+
+    def found(self, query, user_type='student'):
+        return [row['id'] for row in search_people(query, user_type)]
+
+    def test_tokenize_joins_phone_digit_groups(self):
+        self.assertEqual(tokenize('06 12.34-56'), ['06123456'])
+        self.assertEqual(tokenize('Martin 06 12'), ['martin', '0612'])
+        self.assertEqual(tokenize('jean-paul_2'), ['jean', 'paul', '2'])
+
+    def test_phone_typed_in_groups(self):
+        for query in ('06 12', '06.12.34', '0612345678', '06-12 34'):
+            self.assertEqual(self.found(query), [self.martin.pk], query)
+        # Le numéro se cherche par son début, pas au milieu
+        self.assertEqual(self.found('34 56'), [])
+
+    def test_words_are_prefixes(self):
+        self.assertEqual(self.found('lea mar'), [self.martin.pk])
+        self.assertEqual(self.found('artin'), [])
+        self.assertEqual(self.found('m'), [])
+
+    def test_name_matches_come_first(self):
+        self.assertEqual(self.found('mart'), [self.martin.pk, self.durand.pk])
+
+    def test_filters_type_and_inactive_users(self):
+        self.assertNotIn(self.archived.pk, self.found('alain'))
+        self.assertEqual(len(self.found('martin', 'instructor')), 1)
+
+    def test_index_follows_renames(self):
+        user = self.martin.user
+        user.last_name = 'Bernard'
+        user.phone_number = '07 00 00 00 00'
+        user.save()
+        self.assertEqual(self.found('bernard'), [self.martin.pk])
+        self.assertEqual(self.found('0612'), [])
+        self.assertEqual(self.found('mart'), [self.durand.pk])
+
+    def test_index_follows_deactivation_and_reactivation(self):
+        User.objects.filter(pk=self.martin.user_id).update(is_active=False)
+        self.assertEqual(self.found('lea'), [])
+        User.objects.filter(pk=self.martin.user_id).update(is_active=True)
+        self.assertEqual(self.found('lea'), [self.martin.pk])
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class RoleRequiredTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = Student.objects.create(user=User.objects.create_user('eleve', password='x', user_type='student'))
+        cls.instructor = Instructor.objects.create(
+            user=User.objects.create_user('moniteur', password='x', user_type='instructor'),
+        )
+        User.objects.create_user('secretaire', password='x', user_type='secretary')
+
+    def assertDenied(self, response, redirect_to, message):
+        self.assertRedirects(response, reverse(redirect_to), fetch_redirect_response=False)
+        self.assertEqual([str(entry) for entry in get_messages(response.wsgi_request)], [message])
+
+    def test_anonymous_goes_to_login(self):
+        # purchase_history est une vue async
+        for name in ('instructor_list', 'purchase_history'):
+            response = self.client.get(reverse(name))
+            self.assertRedirects(response, f"{reverse('login')}?next={reverse(name)}", fetch_redirect_response=False)
+
+    def test_sync_view(self):
+        self.client.login(username='eleve', password='x')
+        self.assertDenied(self.client.get(reverse('instructor_list')), 'profile', PAGE_DENIED)
+        self.client.login(username='secretaire', password='x')
+        self.assertEqual(self.client.get(reverse('instructor_list')).status_code, 200)
+
+    def test_sync_view_with_its_own_message_and_redirect(self):
+        self.client.login(username='moniteur', password='x')
+        self.assertDenied(self.client.get(reverse('student_create')), 'student_list', ACTION_DENIED)
+
+    def test_async_view(self):
+        self.client.login(username='moniteur', password='x')
+        self.assertDenied(self.client.get(reverse('purchase_history')), 'profile', PAGE_DENIED)
+        self.client.login(username='eleve', password='x')
+        self.assertEqual(self.client.get(reverse('purchase_history')).status_code, 200)
+
+
+class ProfileBackendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = Student.objects.create(user=User.objects.create_user('eleve', user_type='student'))
+        cls.instructor = Instructor.objects.create(user=User.objects.create_user('moniteur', user_type='instructor'))
+        cls.secretary = User.objects.create_user('secretaire', user_type='secretary')
+
+    def test_profile_loaded_with_the_user(self):
+        for user_id, profile in (
+            (self.student.user_id, self.student), (self.instructor.user_id, self.instructor), (self.secretary.pk, None),
+        ):
+            with self.assertNumQueries(1):
+                role = get_role(ProfileBackend().get_user(user_id))
+                self.assertEqual(role.profile, profile)
+
+    def test_inactive_user_is_not_loaded(self):
+        User.objects.filter(pk=self.student.user_id).update(is_active=False)
+        self.assertIsNone(ProfileBackend().get_user(self.student.user_id))
+
+
+class RosterTests(TestCase):
+    TODAY = date(2030, 4, 10)
+
+    @classmethod
+    def setUpTestData(cls):
+        def profile(model, username, last_name, user_type):
+            return model.objects.create(user=User.objects.create_user(username, last_name=last_name, user_type=user_type))
+
+        cls.instructor = profile(Instructor, 'moniteur', 'Moniteur', 'instructor')
+        other = profile(Instructor, 'autre', 'Autre', 'instructor')
+        cls.martin = profile(Student, 'martin', 'Martin', 'student')
+        cls.bernard = profile(Student, 'bernard', 'Bernard', 'student')
+        profile(Student, 'durand', 'Durand', 'student')
+
+        def lesson(student, days, start, duration, instructor=cls.instructor):
+            return Appointment(
+                student=student, instructor=instructor, date=cls.TODAY + timedelta(days=days),
+                start_time=time(start), end_time=time(start + duration), duration=duration, location='Centre',
+            )
+
+        # bulk_create : ni solde d'heures ni occupation, inutiles ici
+        Appointment.objects.bulk_create([
+            lesson(cls.martin, -7, 9, 2),
+            lesson(cls.martin, -3, 14, 1),
+            lesson(cls.martin, -3, 9, 1),
+            lesson(cls.martin, 0, 10, 1),
+            lesson(cls.martin, 2, 10, 1),
+            # Avec un autre instructeur : hors des chiffres
+            lesson(cls.martin, -1, 9, 3, instructor=other),
+            lesson(cls.bernard, 5, 11, 2),
+        ])
+
+    def test_students_without_duplicates(self):
+        self.assertCountEqual(instructor_students(self.instructor), [self.martin, self.bernard])
+
+    def test_roster_in_one_query(self):
+        with self.assertNumQueries(1):
+            roster = [
+                (student.user.last_name, student.lesson_count, student.hours_consumed, student.last_lesson_date,
+                 student.last_lesson_start, student.last_lesson_end, student.next_lesson_date)
+                for student in instructor_roster(self.instructor, self.TODAY)
+            ]
+        self.assertEqual(roster, [
+            ('Bernard', 1, 0, None, None, None, self.TODAY + timedelta(days=5)),
+            ('Martin', 5, 4, self.TODAY - timedelta(days=3), time(14), time(15), self.TODAY),
+        ])
+
+
+class DashboardInvalidationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.secretary = User.objects.create_user('secretaire', user_type='secretary')
+        cls.student = Student.objects.create(user=User.objects.create_user('eleve', user_type='student'), remaining_hours=10)
+        cls.other = Student.objects.create(user=User.objects.create_user('autre', user_type='student'), remaining_hours=10)
+        cls.instructor = Instructor.objects.create(user=User.objects.create_user('moniteur', user_type='instructor'))
+        cls.day = date.today() + timedelta(days=7)
+
+    def setUp(self):
+        caches[settings.DASHBOARD_CACHE_ALIAS].clear()
+        self.client.force_login(self.secretary)
+
+    def stats(self, user):
+        return async_to_sync(get_dashboard_stats)(user)
+
+    def post(self, url, student):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {
+                'student': student.pk, 'instructor': self.instructor.pk, 'date': self.day.isoformat(),
+                'start_time': '09:00', 'duration': 1, 'location': 'Centre',
+            })
+        self.assertEqual(response.status_code, 302)
+
+    def test_booking_refreshes_student_instructor_and_staff(self):
+        self.assertEqual(self.stats(self.student.user)['total_lessons'], 0)
+        self.assertEqual(self.stats(self.instructor.user)['active_students'], 0)
+        self.assertIsNone(self.stats(self.secretary)['next_appointment'])
+
+        self.post(reverse('appointment_create'), self.student)
+        self.assertEqual(self.stats(self.student.user)['total_lessons'], 1)
+        self.assertEqual(self.stats(self.instructor.user)['active_students'], 1)
+        self.assertIsNotNone(self.stats(self.secretary)['next_appointment'])
+
+    def test_edit_refreshes_previous_student(self):
+        self.post(reverse('appointment_create'), self.student)
+        self.assertEqual(self.stats(self.student.user)['total_lessons'], 1)
+        self.assertEqual(self.stats(self.other.user)['total_lessons'], 0)
+
+        self.post(reverse('appointment_edit', args=[Appointment.objects.get().pk]), self.other)
+        self.assertEqual(self.stats(self.student.user)['total_lessons'], 0)
+        self.assertEqual(self.stats(self.other.user)['total_lessons'], 1)
+
+    def test_user_ids_read_from_loaded_profiles(self):
+        appointment = Appointment(student=self.student, instructor=self.instructor)
+        with self.assertNumQueries(0):
+            user_ids = _related_user_ids(appointment, ('student', 'instructor'))
+        self.assertEqual(user_ids, {self.student.user_id, self.instructor.user_id})
+        # Ancien élève d'une modification : une requête
+        appointment._loaded_values = {'student_id': self.other.pk, 'instructor_id': self.instructor.pk}
+        with self.assertNumQueries(1):
+            user_ids = _related_user_ids(appointment, ('student', 'instructor'))
+        self.assertEqual(user_ids, {self.student.user_id, self.other.user_id, self.instructor.user_id})
@@ -6,6 +6,8 @@ urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('profile/', views.profile_view, name='profile'),
+    path('profile/calendar-token/', views.regenerate_calendar_token, name='regenerate_calendar_token'),
+    path('search/people/', views.people_search, name='people_search'),
     
     # Gestion des élèves
     path('students/', views.student_list, name='student_list'),
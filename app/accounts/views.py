@@ -1,60 +1,25 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
-from accounts.models import User, Student, Instructor
+from django.http import JsonResponse
+from accounts.models import User, Student, Instructor, generate_calendar_token
 from scheduling.models import Appointment
 from courses.models import Purchase
 from accounts.forms import InstructorForm, StudentForm
+from accounts.dashboard import get_dashboard_stats
+from accounts.search import search_people, MAX_LIMIT
+from accounts.roles import role_required, ACTION_DENIED
+from accounts.roster import instructor_students, instructor_roster
+from my_driving_school.pagination import paginate_keyset
+from my_driving_school.async_auth import aget_user
 
-def home(request):
-    if request.user.is_authenticated:
-        user = request.user
-        today = timezone.now().date()
-        
-        # Récupérer le prochain rendez-vous
-        if user.user_type == 'student':
-            next_appointment = Appointment.objects.filter(
-                student=user.student_profile,
-                date__gte=today
-            ).order_by('date', 'start_time').first()
-            
-            # Calcul de la progression (exemple simple)
-            total_lessons = Appointment.objects.filter(student=user.student_profile).count()
-            
-            context = {
-                'next_appointment': next_appointment,
-                'total_lessons': total_lessons,
-                'progress': min(total_lessons * 5, 100)  # 5% par leçon, max 100%
-            }
-            
-        elif user.user_type == 'instructor':
-            next_appointment = Appointment.objects.filter(
-                instructor=user.instructor_profile,
-                date__gte=today
-            ).order_by('date', 'start_time').first()
-            
-            # Nombre d'élèves actifs
-            active_students = Student.objects.filter(
-                appointments__instructor=user.instructor_profile,
-                appointments__date__gte=today
-            ).distinct().count()
-            
-            context = {
-                'next_appointment': next_appointment,
-                'active_students': active_students,
-                'total_teaching_hours': Appointment.objects.filter(instructor=user.instructor_profile).count() * 2  # Hypothèse: 2h par cours
-            }
-            
-        else:  # secretary or admin
-            next_appointment = Appointment.objects.filter(date__gte=today).order_by('date', 'start_time').first()
-            active_users = User.objects.filter(is_active=True).count()
-            
-            context = {
-                'next_appointment': next_appointment,
-                'active_users': active_users
-            }
+async def home(request):
+    user = await aget_user(request)
+    if user.is_authenticated:
+        context = dict(await get_dashboard_stats(user))
         
         # Mock data for recent activities
         recent_activities = [
@@ -107,45 +72,86 @@ def logout_view(request):
 @login_required
 def profile_view(request):
     user = request.user
+    role = request.role
     context = {'user': user}
     
-    if user.user_type == 'student':
-        context['student'] = user.student_profile
-    elif user.user_type == 'instructor':
-        context['instructor'] = user.instructor_profile
+    if role.is_student:
+        context['student'] = role.student
+        context['calendar_feed_url'] = request.build_absolute_uri(
+            reverse('student_ical_feed', args=[role.student.calendar_token])
+        )
+    elif role.is_instructor:
+        context['instructor'] = role.instructor
+        context['calendar_feed_url'] = request.build_absolute_uri(
+            reverse('instructor_ical_feed', args=[role.instructor.calendar_token])
+        )
         
     return render(request, 'accounts/profile.html', context)
 
 @login_required
-def student_list(request):
-    # Vérifier les autorisations
-    if request.user.user_type not in ['admin', 'secretary', 'instructor']:
-        messages.error(request, "Vous n'avez pas l'autorisation de voir cette page.")
+def regenerate_calendar_token(request):
+    """Remplace le jeton du flux iCalendar : l'ancienne URL cesse de fonctionner."""
+    profile = request.role.profile
+    if profile is None or request.method != 'POST':
         return redirect('profile')
     
+    profile.calendar_token = generate_calendar_token()
+    profile.save(update_fields=['calendar_token'])
+    
+    messages.success(request, "Une nouvelle adresse d'abonnement a été générée. Mettez à jour votre agenda.")
+    return redirect('profile')
+
+@login_required
+def people_search(request):
+    """Suggestions d'élèves ou d'instructeurs pour les champs de saisie (JSON)."""
+    user_type = request.GET.get('type')
+    # Un élève ne choisit que son instructeur
+    allowed = ['instructor'] if request.role.is_student else ['student', 'instructor']
+    if user_type not in allowed:
+        return JsonResponse({'error': "Type de recherche invalide."}, status=400)
+    
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        return JsonResponse({'error': "Paramètres de recherche invalides."}, status=400)
+    if not 1 <= limit <= MAX_LIMIT:
+        return JsonResponse({'error': "Paramètres de recherche hors limites."}, status=400)
+    
+    results = search_people(request.GET.get('q', ''), user_type, limit)
+    return JsonResponse({
+        'results': [
+            {
+                'id': result['id'],
+                'label': f"{result['first_name']} {result['last_name']}",
+                'detail': (
+                    f"{result['remaining_hours']} h restantes · {result['email']}" if user_type == 'student'
+                    else result['specialization'] or ''
+                ),
+            }
+            for result in results
+        ]
+    })
+
+@role_required('admin', 'secretary', 'instructor')
+def student_list(request):
     # Filtrer les étudiants pour les instructeurs
-    if request.user.user_type == 'instructor':
+    if request.role.is_instructor:
         # Montrer seulement les étudiants qui ont eu des rendez-vous avec cet instructeur
-        instructor = request.user.instructor_profile
-        student_ids = Appointment.objects.filter(instructor=instructor).values_list('student_id', flat=True).distinct()
-        students = Student.objects.filter(id__in=student_ids)
+        students = instructor_students(request.role.instructor)
     else:
         students = Student.objects.all()
     
+    students = paginate_keyset(students.select_related('user'), request, ordering=['id'])
+    
     return render(request, 'accounts/student_list.html', {'students': students})
 
-@login_required
+@role_required('admin', 'secretary', 'instructor')
 def student_detail(request, pk):
-    # Vérifier les autorisations
-    if request.user.user_type not in ['admin', 'secretary', 'instructor']:
-        messages.error(request, "Vous n'avez pas l'autorisation de voir cette page.")
-        return redirect('profile')
-    
-    student = get_object_or_404(Student, pk=pk)
+    student = get_object_or_404(Student.objects.select_related('user'), pk=pk)
     
     # Si l'utilisateur est un instructeur, vérifier qu'il a bien ce student
-    if request.user.user_type == 'instructor':
-        instructor = request.user.instructor_profile
+    if request.role.is_instructor:
+        instructor = request.role.instructor
         if not Appointment.objects.filter(instructor=instructor, student=student).exists():
             messages.error(request, "Cet élève n'est pas sous votre responsabilité.")
             return redirect('student_list')
@@ -155,10 +161,10 @@ def student_detail(request, pk):
     upcoming_appointments = Appointment.objects.filter(
         student=student,
         date__gte=today
-    ).order_by('date', 'start_time')
+    ).select_related('instructor__user').order_by('date', 'start_time')
     
     # Récupérer l'historique des achats
-    purchases = Purchase.objects.filter(student=student).order_by('-purchase_date')
+    purchases = Purchase.objects.filter(student=student).select_related('package').order_by('-purchase_date')
     
     return render(request, 'accounts/student_detail.html', {
         'student': student,
@@ -166,45 +172,24 @@ def student_detail(request, pk):
         'purchases': purchases
     })
 
-@login_required
+@role_required('admin', 'secretary')
 def instructor_list(request):
-    # Vérifier les autorisations
-    if request.user.user_type not in ['admin', 'secretary']:
-        messages.error(request, "Vous n'avez pas l'autorisation de voir cette page.")
-        return redirect('profile')
-    
-    instructors = Instructor.objects.all()
+    instructors = paginate_keyset(Instructor.objects.select_related('user'), request, ordering=['id'])
     return render(request, 'accounts/instructor_list.html', {'instructors': instructors})
 
-@login_required
+@role_required('admin', 'secretary')
 def instructor_detail(request, pk):
-    # Vérifier les autorisations
-    if request.user.user_type not in ['admin', 'secretary']:
-        messages.error(request, "Vous n'avez pas l'autorisation de voir cette page.")
-        return redirect('profile')
-    
-    instructor = get_object_or_404(Instructor, pk=pk)
-    
-    # Récupérer les élèves de cet instructeur
-    student_ids = Appointment.objects.filter(instructor=instructor).values_list('student_id', flat=True).distinct()
-    students = Student.objects.filter(id__in=student_ids)
+    instructor = get_object_or_404(Instructor.objects.select_related('user'), pk=pk)
+    today = timezone.now().date()
     
-    # Ajouter la date du dernier rendez-vous pour chaque étudiant
-    for student in students:
-        last_appointment = Appointment.objects.filter(
-            instructor=instructor,
-            student=student,
-            date__lt=timezone.now().date()
-        ).order_by('-date').first()
-        
-        student.last_appointment = last_appointment
+    # Élèves de cet instructeur, avec leur dernier cours, en une requête
+    students = instructor_roster(instructor, today)
     
     # Récupérer les rendez-vous à venir
-    today = timezone.now().date()
     upcoming_appointments = Appointment.objects.filter(
         instructor=instructor,
         date__gte=today
-    ).order_by('date', 'start_time')
+    ).select_related('student__user').order_by('date', 'start_time')
     
     return render(request, 'accounts/instructor_detail.html', {
         'instructor': instructor,
@@ -212,13 +197,8 @@ def instructor_detail(request, pk):
         'upcoming_appointments': upcoming_appointments
     })
 
-@login_required
+@role_required('admin', 'secretary', message=ACTION_DENIED, redirect_to='instructor_list')
 def instructor_create(request):
-    # Vérifier les autorisations
-    if request.user.user_type not in ['admin', 'secretary']:
-        messages.error(request, "Vous n'avez pas l'autorisation d'effectuer cette action.")
-        return redirect('instructor_list')
-    
     if request.method == 'POST':
         form = InstructorForm(request.POST)
         if form.is_valid():
@@ -233,13 +213,8 @@ def instructor_create(request):
         'is_new': True
     })
 
-@login_required
+@role_required('admin', 'secretary', message=ACTION_DENIED, redirect_to='instructor_list')
 def instructor_edit(request, pk):
-    # Vérifier les autorisations
-    if request.user.user_type not in ['admin', 'secretary']:
-        messages.error(request, "Vous n'avez pas l'autorisation d'effectuer cette action.")
-        return redirect('instructor_list')
-    
     instructor = get_object_or_404(Instructor, pk=pk)
     
     if request.method == 'POST':
@@ -257,13 +232,8 @@ def instructor_edit(request, pk):
         'is_new': False
     })
 
-@login_required
+@role_required('admin', 'secretary', message=ACTION_DENIED, redirect_to='instructor_list')
 def instructor_archive(request, pk):
-    # Vérifier les autorisations
-    if request.user.user_type not in ['admin', 'secretary']:
-        messages.error(request, "Vous n'avez pas l'autorisation d'effectuer cette action.")
-        return redirect('instructor_list')
-    
     instructor = get_object_or_404(Instructor, pk=pk)
     
     if request.method == 'POST':
@@ -278,13 +248,8 @@ def instructor_archive(request, pk):
         'instructor': instructor
     })
 
-@login_required
+@role_required('admin', 'secretary', message=ACTION_DENIED, redirect_to='student_list')
 def student_create(request):
-    # Vérifier les autorisations
-    if request.user.user_type not in ['admin', 'secretary']:
-        messages.error(request, "Vous n'avez pas l'autorisation d'effectuer cette action.")
-        return redirect('student_list')
-    
     if request.method == 'POST':
         form = StudentForm(request.POST)
         if form.is_valid():
@@ -299,13 +264,8 @@ def student_create(request):
         'is_new': True
     })
 
-@login_required
+@role_required('admin', 'secretary', message=ACTION_DENIED, redirect_to='student_list')
 def student_edit(request, pk):
-    # Vérifier les autorisations
-    if request.user.user_type not in ['admin', 'secretary']:
-        messages.error(request, "Vous n'avez pas l'autorisation d'effectuer cette action.")
-        return redirect('student_list')
-    
     student = get_object_or_404(Student, pk=pk)
     
     if request.method == 'POST':
@@ -323,13 +283,8 @@ def student_edit(request, pk):
         'is_new': False
     })
 
-@login_required
+@role_required('admin', 'secretary', message=ACTION_DENIED, redirect_to='student_list')
 def student_archive(request, pk):
-    # Vérifier les autorisations
-    if request.user.user_type not in ['admin', 'secretary']:
-        messages.error(request, "Vous n'avez pas l'autorisation d'effectuer cette action.")
-        return redirect('student_list')
-    
     student = get_object_or_404(Student, pk=pk)
     
     if request.method == 'POST':
@@ -0,0 +1,122 @@
+// Champs de recherche d'élève ou d'instructeur (templates/people_search.html) :
+// suggestions au fil de la saisie, l'id du profil choisi va dans le champ caché
+document.addEventListener('DOMContentLoaded', function() {
+    const DELAY = 150;
+
+    document.querySelectorAll('.people-search').forEach(function(widget) {
+        const hidden = widget.querySelector('input[type="hidden"]');
+        const input = widget.querySelector('input[type="search"]');
+        const list = widget.querySelector('.people-search-results');
+        let timer = null;
+        let controller = null;
+        let results = [];
+        let active = -1;
+
+        function validate() {
+            // Un texte saisi sans choisir de suggestion n'est pas un élève valide
+            input.setCustomValidity(input.value && !hidden.value ? 'Choisissez une personne dans la liste.' : '');
+        }
+
+        function close() {
+            list.classList.add('hidden');
+            input.setAttribute('aria-expanded', 'false');
+            active = -1;
+        }
+
+        function highlight(index) {
+            active = index;
+            list.querySelectorAll('li').forEach(function(item, itemIndex) {
+                item.classList.toggle('bg-primary-50', itemIndex === index);
+                item.setAttribute('aria-selected', itemIndex === index ? 'true' : 'false');
+            });
+        }
+
+        function choose(result) {
+            hidden.value = result.id;
+            input.value = result.label;
+            validate();
+            close();
+            hidden.dispatchEvent(new Event('change', {bubbles: true}));
+        }
+
+        function render() {
+            list.innerHTML = '';
+            if (!results.length) {
+                const empty = document.createElement('li');
+                empty.className = 'px-3 py-2 text-gray-500';
+                empty.textContent = 'Aucun résultat';
+                list.appendChild(empty);
+            }
+            results.forEach(function(result) {
+                const item = document.createElement('li');
+                item.setAttribute('role', 'option');
+                item.className = 'px-3 py-2 cursor-pointer hover:bg-primary-50';
+                const label = document.createElement('div');
+                label.className = 'font-medium text-gray-900';
+                label.textContent = result.label;
+                item.appendChild(label);
+                if (result.detail) {
+                    const detail = document.createElement('div');
+                    detail.className = 'text-xs text-gray-500';
+                    detail.textContent = result.detail;
+                    item.appendChild(detail);
+                }
+                // mousedown : avant la perte du focus qui ferme la liste
+                item.addEventListener('mousedown', function(event) {
+                    event.preventDefault();
+                    choose(result);
+                });
+                list.appendChild(item);
+            });
+            list.classList.remove('hidden');
+            input.setAttribute('aria-expanded', 'true');
+            active = -1;
+        }
+
+        function search() {
+            if (controller) {
+                controller.abort();
+            }
+            controller = new AbortController();
+            const params = new URLSearchParams({type: widget.dataset.kind, q: input.value, limit: 10});
+            fetch(widget.dataset.url + '?' + params.toString(), {signal: controller.signal})
+                .then(response => response.json())
+                .then(data => {
+                    results = data.results || [];
+                    render();
+                })
+                .catch(function() {});
+        }
+
+        input.addEventListener('input', function() {
+            hidden.value = '';
+            validate();
+            clearTimeout(timer);
+            if (input.value.trim().length < 2) {
+                close();
+                return;
+            }
+            timer = setTimeout(search, DELAY);
+        });
+
+        input.addEventListener('keydown', function(event) {
+            if (list.classList.contains('hidden') || !results.length) {
+                return;
+            }
+            if (event.key === 'ArrowDown') {
+                event.preventDefault();
+                highlight(Math.min(active + 1, results.length - 1));
+            } else if (event.key === 'ArrowUp') {
+                event.preventDefault();
+                highlight(Math.max(active - 1, 0));
+            } else if (event.key === 'Enter' && active >= 0) {
+                event.preventDefault();
+                choose(results[active]);
+            } else if (event.key === 'Escape') {
+                close();
+            }
+        });
+
+        input.addEventListener('blur', close);
+    });
+});
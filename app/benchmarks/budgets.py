@@ -0,0 +1,43 @@
+# Nombre maximal de requêtes SQL autorisées par vue (nom d'URL), quel que soit
+# le rôle de l'utilisateur. Les budgets ne dépendent pas du volume de données :
+# une vue qui les dépasse sur le jeu de données de référence a un N+1.
+# None : mesurée mais pas encore soumise à un budget.
+DEFAULT_QUERY_BUDGET = 10
+
+QUERY_BUDGETS = {
+    'home': 8,
+    'login': 2,
+    'logout': 4,
+    'profile': 4,
+    'people_search': 3,
+    'student_list': 6,
+    'student_detail': 7,
+    'student_create': 4,
+    'student_edit': 5,
+    'student_archive': 5,
+    'instructor_list': 4,
+    'instructor_detail': 6,
+    'instructor_create': 4,
+    'instructor_edit': 5,
+    'instructor_archive': 5,
+    'package_list': 4,
+    'package_detail': 4,
+    'package_create': 4,
+    'package_edit': 5,
+    'package_delete': 6,
+    'purchase_package': 6,
+    'purchase_history': 5,
+    'accounting_dashboard': 8,
+    # Exports et flux : lignes lues pendant l'envoi, en un seul curseur
+    'export_purchases': 3,
+    'export_appointments': 3,
+    'appointment_list': 6,
+    'appointment_detail': 4,
+    'appointment_create': 6,
+    'free_slots': 5,
+    'appointment_edit': 6,
+    'appointment_delete': 4,
+    'calendar': 5,
+    'instructor_ical_feed': 2,
+    'student_ical_feed': 2,
+}
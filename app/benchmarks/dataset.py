@@ -0,0 +1,151 @@
+import io
+import random
+from datetime import date, time, timedelta
+from decimal import Decimal
+from itertools import islice
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import transaction
+from accounts.dashboard import invalidate_dashboards
+from accounts.models import User, Student, Instructor
+from courses.models import CoursePackage, Purchase
+from scheduling.fragments import invalidate_fragments
+from scheduling.models import Appointment
+
+FIRST_NAMES = ['Lucas', 'Emma', 'Hugo', 'Léa', 'Louis', 'Chloé', 'Gabriel', 'Manon', 'Arthur', 'Camille', 'Jules', 'Inès']
+LAST_NAMES = ['Martin', 'Bernard', 'Dubois', 'Thomas', 'Robert', 'Richard', 'Petit', 'Durand', 'Leroy', 'Moreau']
+LOCATIONS = ["Centre-ville", "Autoroute A6", "Périphérique", "Zone industrielle", "Campagne", "Parking de l'auto-école"]
+SLOT_STARTS = [time(8), time(10), time(14), time(16)]
+# Mot de passe de tous les utilisateurs générés, pour se connecter avec l'un
+# d'eux (mesures des vues authentifiées, essais à la main)
+PASSWORD = 'seed-password'
+PACKAGES = [
+    ("Forfait Découverte", 10, Decimal('500.00')),
+    ("Forfait Classique", 20, Decimal('900.00')),
+    ("Forfait Premium", 30, Decimal('1300.00')),
+    ("Heure supplémentaire", 1, Decimal('55.00')),
+]
+
+
+def _bulk_insert(model, objects, batch_size):
+    """Insère un itérable d'objets par lots, sans le matérialiser entièrement."""
+    created = []
+    objects = iter(objects)
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return created
+        created.extend(model.objects.bulk_create(batch))
+
+
+def _count_insert(model, objects, batch_size):
+    """Comme _bulk_insert, mais ne garde que le nombre de lignes insérées."""
+    count = 0
+    objects = iter(objects)
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return count
+        model.objects.bulk_create(batch)
+        count += len(batch)
+
+
+def _users(rng, user_type, count, password, prefix, first=0):
+    for index in range(first, first + count):
+        yield User(
+            username=f"{prefix}{user_type}{index}",
+            password=password,
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            email=f"{prefix}{user_type}{index}@example.com",
+            user_type=user_type,
+            phone_number=f"06{rng.randrange(10 ** 8):08d}",
+            address=f"{rng.randrange(1, 200)} rue de la Paix",
+        )
+
+
+def _appointments(rng, student_profiles, instructor_profiles, start, weeks):
+    # Pour chaque créneau, des élèves distincts sont tirés pour chaque instructeur :
+    # ni l'instructeur ni l'élève n'ont deux rendez-vous qui se chevauchent.
+    for day_offset in range(weeks * 7):
+        day = start + timedelta(days=day_offset)
+        if day.weekday() == 6:
+            continue
+        for slot_start in SLOT_STARTS:
+            booked_students = rng.sample(student_profiles, min(len(student_profiles), len(instructor_profiles)))
+            for instructor, student in zip(instructor_profiles, booked_students):
+                if rng.random() < 0.3:
+                    continue
+                yield Appointment(
+                    student=student,
+                    instructor=instructor,
+                    date=day,
+                    start_time=slot_start,
+                    end_time=time(slot_start.hour + 2),
+                    location=rng.choice(LOCATIONS),
+                    duration=2,
+                )
+
+
+@transaction.atomic
+def seed_dataset(students=50, instructors=5, weeks=4, seed=42, start=None, batch_size=1000, prefix='', password=PASSWORD):
+    """
+    Génère un jeu de données réaliste et déterministe : utilisateurs de chaque
+    type, forfaits, achats et rendez-vous sans chevauchement sur `weeks`
+    semaines à partir de `start`.
+
+    Tout passe par bulk_create par lots : pas de Purchase.save() ni
+    d'Appointment.save() (agrégats et occupation sont reconstruits à la fin, le
+    journal d'heures n'est pas alimenté) et un seul hachage de `password`,
+    partagé par tous les utilisateurs.
+    """
+    rng = random.Random(seed)
+    password = make_password(password)
+    start = start or date.today() - timedelta(weeks=weeks // 2)
+
+    _bulk_insert(User, _users(rng, 'admin', 1, password, prefix), batch_size)
+    _bulk_insert(User, _users(rng, 'secretary', 1, password, prefix), batch_size)
+
+    instructor_profiles = _bulk_insert(Instructor, (
+        Instructor(user=user, specialization=rng.choice(['Permis B', 'Conduite accompagnée', 'Boîte automatique']))
+        for user in _bulk_insert(User, _users(rng, 'instructor', instructors, password, prefix), batch_size)
+    ), batch_size)
+
+    student_profiles = []
+    for offset in range(0, students, batch_size):
+        users = _bulk_insert(User, _users(rng, 'student', min(batch_size, students - offset), password, prefix, offset), batch_size)
+        student_profiles += Student.objects.bulk_create([
+            Student(user=user, remaining_hours=rng.randrange(0, 40)) for user in users
+        ])
+    profile_user_ids = [profile.user_id for profile in instructor_profiles + student_profiles]
+
+    packages = CoursePackage.objects.bulk_create([
+        CoursePackage(name=name, hours=hours, price=price) for name, hours, price in PACKAGES
+    ])
+    purchase_count = _count_insert(Purchase, (
+        Purchase(student=student, package=package, hours_added=package.hours, amount_paid=package.price)
+        for student in student_profiles
+        for package in rng.sample(packages, rng.randrange(1, 3))
+    ), batch_size)
+
+    appointment_count = _count_insert(
+        Appointment, _appointments(rng, student_profiles, instructor_profiles, start, weeks), batch_size
+    )
+
+    # bulk_create n'appelle ni Purchase.save() ni Appointment.save() : recalculer
+    # les agrégats de chiffre d'affaires et l'occupation des instructeurs
+    call_command('rebuild_revenue_rollups', stdout=io.StringIO())
+    call_command('rebuild_occupancy', stdout=io.StringIO())
+    # Pas de signaux non plus : périmer les fragments du calendrier et les
+    # compteurs de la page d'accueil déjà en cache (une base recréée réutilise
+    # les mêmes identifiants d'utilisateurs)
+    invalidate_fragments(everything=True)
+    invalidate_dashboards(profile_user_ids, staff=True)
+
+    return {
+        'students': len(student_profiles),
+        'instructors': len(instructor_profiles),
+        'packages': len(packages),
+        'purchases': purchase_count,
+        'appointments': appointment_count,
+    }
@@ -0,0 +1,270 @@
+import json
+import re
+from django.apps import apps
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection
+from django.test import Client
+from django.test.utils import override_settings
+from benchmarks.dataset import seed_dataset
+from benchmarks.management.commands.benchmark_views import (
+    BENCHMARK_STORAGES, USER_TYPES, Command as BenchmarkCommand,
+)
+
+# Colonne qualifiée : "table"."colonne" ou alias de sous-requête U0."colonne"
+COLUMN = r'(?:"(\w+)"|\b(U\d+))\."(\w+)"'
+EQUALITY = re.compile(COLUMN + r'\s*(?:=\s*%s|IN\s*\(|IS NULL)', re.I)
+RANGE = re.compile(COLUMN + r'\s*(?:[<>]=?\s*%s|BETWEEN\b)', re.I)
+TABLE_ALIAS = re.compile(r'\b(?:FROM|JOIN)\s+"(\w+)"(?:\s+(?:AS\s+)?(U\d+|"\w+"))?', re.I)
+# Fonction appliquée à une colonne dans un filtre : l'index de la colonne ne
+# sert plus (purchase_date__month, __year, __date, __iexact...)
+NON_SARGABLE = re.compile(
+    r'\b(django_\w+|strftime|date_trunc|extract|lower|upper)\s*\([^()]*?' + COLUMN, re.I
+)
+
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(.*)$')
+POSTGRESQL_SCAN = re.compile(r'Seq Scan on (\w+)(?: (\w+))?')
+
+
+class Command(BenchmarkCommand):
+    help = (
+        "Rejoue les vues sur le jeu de données de référence, analyse le plan de chaque requête "
+        "(EXPLAIN) et signale parcours complets, tris sans index et filtres qui empêchent "
+        "l'usage d'un index, avec les index à ajouter"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--instructors', type=int, default=10)
+        parser.add_argument('--weeks', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--min-rows', type=int, default=100,
+                            help="Taille en dessous de laquelle le parcours complet d'une table est ignoré")
+        parser.add_argument('--output', help="Fichier JSON du rapport")
+        parser.add_argument('--strict', action='store_true',
+                            help="Échoue si un index est recommandé (intégration continue)")
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f"Plans d'exécution non pris en charge pour « {connection.vendor} ».")
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(ALLOWED_HOSTS=['*'], DEBUG=False, STORAGES=BENCHMARK_STORAGES):
+                dataset = seed_dataset(
+                    students=options['students'],
+                    instructors=options['instructors'],
+                    weeks=options['weeks'],
+                    seed=options['seed'],
+                )
+                statements = self.capture_statements()
+                findings = self.audit(statements, options['min_rows'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.write_report(findings, len(statements))
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump({'dataset': dataset, 'findings': findings}, output_file, indent=2)
+
+        recommended = {finding['index'] for finding in findings if finding['index']}
+        if options['strict'] and recommended:
+            raise CommandError(f"{len(recommended)} index recommandé(s).")
+
+    def capture_statements(self):
+        """
+        Requêtes SELECT émises par chaque vue pour chaque type d'utilisateur,
+        dédoublonnées par texte SQL : {(sql, params): {'views': {...}}}.
+        """
+        statements = {}
+        client = Client()
+        users = self.reference_users()
+
+        for name, path in self.view_paths(users):
+            for user_type in USER_TYPES:
+                client.force_login(users[user_type])
+                self.clear_caches()
+                captured = []
+
+                def record(execute, sql, params, many, context):
+                    if not many and sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+                        captured.append((sql, tuple(params or ())))
+                    return execute(sql, params, many, context)
+
+                with connection.execute_wrapper(record):
+                    self.fetch(client, path)
+                for sql, params in captured:
+                    entry = statements.setdefault(sql, {'params': params, 'views': set()})
+                    entry['views'].add(f"{name} ({user_type})")
+        return statements
+
+    def audit(self, statements, min_rows):
+        tables = {model._meta.db_table: model for model in apps.get_models()}
+        row_counts = {}
+
+        def large(table):
+            if table not in row_counts:
+                row_counts[table] = tables[table]._default_manager.count()
+            return row_counts[table] >= min_rows
+
+        findings = []
+        for sql, entry in statements.items():
+            plan = self.explain(sql, entry['params'])
+            if plan is None:
+                continue
+            aliases = _aliases(sql)
+            views = sorted(entry['views'])
+
+            def add(kind, table, detail, columns=None):
+                model = tables[table]
+                findings.append({
+                    'kind': kind,
+                    'table': table,
+                    'detail': detail,
+                    'index': _recommend(model, columns) if columns else None,
+                    'views': views,
+                    'sql': sql,
+                })
+
+            for table in self.scanned_tables(plan, aliases):
+                if table not in tables or not large(table):
+                    continue
+                # Sans filtre ni tri sur la table (comptage, pagination par
+                # clé primaire), aucun index n'éviterait de la lire
+                pk_column = tables[table]._meta.pk.column
+                columns = [column for column in _index_columns(sql, table, aliases) if column != pk_column]
+                if columns:
+                    add('scan', table, f"parcours complet de {table} ({row_counts[table]} lignes)", columns)
+
+            if self.sorts_without_index(plan):
+                order_columns = _order_columns(sql, aliases)
+                sorted_tables = {table for table, _ in order_columns}
+                if len(sorted_tables) == 1:
+                    table = sorted_tables.pop()
+                    if table in tables and large(table):
+                        columns = _filter_columns(EQUALITY, sql, table, aliases)
+                        columns += [column for _, column in order_columns if column not in columns]
+                        add('sort', table, "tri dans un B-tree temporaire (ORDER BY sans index)", columns)
+
+            for function, *column in NON_SARGABLE.findall(_where(sql)):
+                table = aliases.get(column[0] or column[1])
+                if table in tables:
+                    add('non_sargable', table,
+                        f"{function}() appliquée à {table}.{column[2]} : filtrer sur un intervalle de valeurs")
+
+        return findings
+
+    def explain(self, sql, params):
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(prefix + sql, params)
+                rows = cursor.fetchall()
+        except DatabaseError:
+            # Requête qui dépend d'un état disparu (table temporaire, curseur...)
+            return None
+        # SQLite : (id, parent, notused, detail) ; PostgreSQL : une ligne de texte
+        return [row[-1] for row in rows]
+
+    def scanned_tables(self, plan, aliases):
+        for line in plan:
+            if connection.vendor == 'sqlite':
+                match = SQLITE_SCAN.match(line.strip())
+                if match and not re.search(r'USING (COVERING |INTEGER PRIMARY KEY|INDEX)|VIRTUAL TABLE', match.group(2)):
+                    yield aliases.get(match.group(1), match.group(1))
+            else:
+                match = POSTGRESQL_SCAN.search(line)
+                if match:
+                    yield match.group(1)
+
+    def sorts_without_index(self, plan):
+        if connection.vendor == 'sqlite':
+            # « FOR LAST 2 TERMS OF ORDER BY » : l'index fournit déjà l'ordre
+            # principal, seules les égalités (même jour...) sont triées
+            return any(line.strip() == 'USE TEMP B-TREE FOR ORDER BY' for line in plan)
+        return any('Sort Key:' in line for line in plan)
+
+    def write_report(self, findings, statement_count):
+        self.stdout.write(f"{statement_count} requêtes distinctes analysées, {len(findings)} problème(s).")
+        for finding in findings:
+            self.stdout.write('')
+            self.stdout.write(self.style.WARNING(f"[{finding['kind']}] {finding['detail']}"))
+            self.stdout.write(f"  vues : {', '.join(finding['views'][:6])}"
+                              + (f" (+{len(finding['views']) - 6})" if len(finding['views']) > 6 else ''))
+            self.stdout.write(f"  sql : {finding['sql'][:300]}")
+            if finding['index']:
+                self.stdout.write(f"  index recommandé : {finding['index']}")
+
+        recommended = sorted({finding['index'] for finding in findings if finding['index']})
+        if recommended:
+            self.stdout.write('')
+            self.stdout.write(self.style.SUCCESS("Index recommandés :"))
+            for index in recommended:
+                self.stdout.write(f"  {index}")
+
+
+def _aliases(sql):
+    aliases = {}
+    for table, alias in TABLE_ALIAS.findall(sql):
+        aliases[table] = table
+        if alias:
+            aliases[alias.strip('"')] = table
+    return aliases
+
+
+def _where(sql):
+    # Texte après le premier WHERE : les fonctions de la liste SELECT (annotations) ne comptent pas
+    return sql.split(' WHERE ', 1)[1] if ' WHERE ' in sql else ''
+
+
+def _filter_columns(pattern, sql, table, aliases):
+    columns = []
+    for quoted, alias, column in pattern.findall(_where(sql)):
+        if aliases.get(quoted or alias) == table and column not in columns:
+            columns.append(column)
+    return columns
+
+
+def _order_columns(sql, aliases):
+    # Dernier ORDER BY du texte : celui de la requête principale, sauf s'il
+    # n'y en a que dans les sous-requêtes (coupé à la parenthèse fermante)
+    position = sql.upper().rfind('ORDER BY')
+    if position < 0:
+        return []
+    clause = re.split(r'\bLIMIT\b|\bOFFSET\b|\)', sql[position + len('ORDER BY'):], maxsplit=1)[0]
+    return [(aliases.get(quoted or alias), column) for quoted, alias, column in re.findall(COLUMN, clause)]
+
+
+def _index_columns(sql, table, aliases):
+    # Égalités d'abord, puis un seul intervalle, puis le tri : l'ordre où un
+    # index composite peut servir les trois
+    columns = _filter_columns(EQUALITY, sql, table, aliases)
+    columns += _filter_columns(RANGE, sql, table, aliases)[:1]
+    columns += [column for owner, column in _order_columns(sql, aliases) if owner == table]
+    return list(dict.fromkeys(columns))[:3]
+
+
+def _existing_indexes(model):
+    fields = {field.name: field.column for field in model._meta.concrete_fields}
+    indexes = [[field.column] for field in model._meta.concrete_fields if field.db_index or field.unique]
+    indexes += [[fields[name.lstrip('-')] for name in index.fields] for index in model._meta.indexes]
+    indexes += [
+        [fields[name] for name in constraint.fields]
+        for constraint in model._meta.constraints if getattr(constraint, 'fields', None)
+    ]
+    return indexes
+
+
+def _recommend(model, columns):
+    """Index à déclarer sur `model` pour `columns`, ou None s'il existe déjà."""
+    # La clé primaire départage déjà les lignes de chaque index (rowid sous SQLite)
+    columns = [column for column in columns if column != model._meta.pk.column]
+    if not columns:
+        return None
+    if any(index[:len(columns)] == columns for index in _existing_indexes(model)):
+        return None
+    names = {field.column: field.name for field in model._meta.concrete_fields}
+    fields = [names[column] for column in columns if column in names]
+    if not fields:
+        return None
+    name = '_'.join([model._meta.model_name[:8], *fields])[:26] + '_idx'
+    return f"{model.__name__} : models.Index(fields={fields!r}, name={name!r})"
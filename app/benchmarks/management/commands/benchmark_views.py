@@ -0,0 +1,231 @@
+import json
+import statistics
+import time
+import tracemalloc
+from importlib import import_module
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from accounts.models import User, Student, Instructor
+from courses.models import CoursePackage
+from scheduling.models import Appointment
+from benchmarks.budgets import QUERY_BUDGETS, DEFAULT_QUERY_BUDGET
+from benchmarks.dataset import seed_dataset
+
+URL_MODULES = ['accounts.urls', 'courses.urls', 'scheduling.urls']
+BENCHMARK_STORAGES = {
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+USER_TYPES = ['admin', 'secretary', 'instructor', 'student']
+
+# Modèle utilisé pour renseigner les paramètres d'URL, selon le préfixe du nom de la vue
+URL_OBJECTS = {
+    'student': Student,
+    'instructor': Instructor,
+    'package': CoursePackage,
+    'purchase': CoursePackage,
+    'appointment': Appointment,
+}
+
+
+class Command(BaseCommand):
+    help = "Mesure requêtes SQL, temps et mémoire de chaque vue pour chaque type d'utilisateur"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--instructors', type=int, default=10)
+        parser.add_argument('--weeks', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--repeat', type=int, default=3, help="Nombre de mesures par vue (médiane)")
+        parser.add_argument('--output', help="Fichier JSON de résultats (sortie standard par défaut)")
+        parser.add_argument('--baseline', help="Résultats JSON d'une version précédente à comparer")
+        parser.add_argument('--threshold', type=float, default=1.5,
+                            help="Facteur de temps au-delà duquel une vue est en régression")
+
+    def handle(self, *args, **options):
+        # Base de test dédiée : les données de production ne sont jamais touchées
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # Stockage statique sans manifeste : la mesure ne doit pas dépendre
+            # d'un collectstatic préalable
+            with override_settings(ALLOWED_HOSTS=['*'], DEBUG=False, STORAGES=BENCHMARK_STORAGES):
+                dataset = seed_dataset(
+                    students=options['students'],
+                    instructors=options['instructors'],
+                    weeks=options['weeks'],
+                    seed=options['seed'],
+                )
+                results = self.run_views(options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        failures = self.check_budgets(results)
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+            failures += self.check_regressions(results, baseline['results'], options['threshold'])
+
+        report = json.dumps({'dataset': dataset, 'results': results, 'failures': failures}, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                output_file.write(report)
+        else:
+            self.stdout.write(report)
+
+        if failures:
+            raise CommandError(f"{len(failures)} vue(s) hors budget ou en régression.")
+
+    def url_kwargs(self, name, converters, users):
+        kwargs = {}
+        for param in converters:
+            model = URL_OBJECTS[name.split('_')[0]]
+            queryset = model.objects.order_by('pk')
+            # Choisir un objet lié à l'utilisateur quand la vue le vérifie
+            if model is Appointment:
+                queryset = queryset.filter(instructor__user=users['instructor'], student__user=users['student'])
+            elif model is Student:
+                queryset = queryset.filter(user=users['student'])
+            elif model is Instructor:
+                queryset = queryset.filter(user=users['instructor'])
+            # Les flux iCalendar sont adressés par jeton, pas par clé primaire
+            field = 'calendar_token' if param == 'token' else 'pk'
+            kwargs[param] = queryset.values_list(field, flat=True).first()
+        return kwargs
+
+    def url_query(self, name, users):
+        # Paramètres GET sans lesquels la vue répond 400
+        if name == 'free_slots':
+            return '?' + urlencode({
+                'student': users['student'].student_profile.pk,
+                'instructor': users['instructor'].instructor_profile.pk,
+                'duration': 2,
+            })
+        if name == 'people_search':
+            # Les élèves ne cherchent que des instructeurs
+            return '?' + urlencode({'type': 'instructor', 'q': users['instructor'].last_name[:3]})
+        return ''
+
+    def fetch(self, client, path):
+        response = client.get(path)
+        # Exports et flux iCalendar : les requêtes et le rendu ont lieu
+        # pendant la lecture du contenu, après le retour de la vue
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def clear_caches(self):
+        # Compteurs de l'accueil, fragments du calendrier et des rendez-vous :
+        # une vue servie depuis le cache ne montrerait plus ses requêtes
+        for cache in caches.all():
+            cache.clear()
+
+    def sample(self, client, user, path, repeat, cold):
+        """Statut, requêtes et temps médian de `path`, cache vidé avant chaque appel si `cold`."""
+        timings = []
+        for run in range(repeat + 1):
+            client.force_login(user)
+            if cold:
+                self.clear_caches()
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = self.fetch(client, path)
+                elapsed = time.perf_counter() - start
+            # Le premier passage (compilation des templates, cache encore
+            # vide pour la mesure à chaud) n'est pas compté
+            if run:
+                timings.append(elapsed)
+        return response.status_code, len(queries), round(statistics.median(timings) * 1000, 2)
+
+    def measure(self, client, user, path, repeat):
+        # Les budgets portent sur la mesure à froid, la seule où un N+1 se voit
+        status, queries, wall_ms = self.sample(client, user, path, repeat, cold=True)
+        _, warm_queries, warm_wall_ms = self.sample(client, user, path, repeat, cold=False)
+
+        client.force_login(user)
+        self.clear_caches()
+        tracemalloc.start()
+        self.fetch(client, path)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        return {
+            'status': status,
+            'queries': queries,
+            'wall_ms': wall_ms,
+            'warm_queries': warm_queries,
+            'warm_wall_ms': warm_wall_ms,
+            'peak_kib': round(peak / 1024, 1),
+        }
+
+    def reference_users(self):
+        # Un utilisateur de référence par type : l'instructeur et l'élève qui ont le plus de cours ensemble
+        reference = Appointment.objects.values('instructor__user', 'student__user').order_by('pk').first()
+        return {
+            'admin': User.objects.filter(user_type='admin').first(),
+            'secretary': User.objects.filter(user_type='secretary').first(),
+            'instructor': User.objects.get(pk=reference['instructor__user']),
+            'student': User.objects.get(pk=reference['student__user']),
+        }
+
+    def view_paths(self, users):
+        """(nom, chemin) de chaque vue de URL_MODULES, paramètres d'URL renseignés."""
+        for module in URL_MODULES:
+            for pattern in import_module(module).urlpatterns:
+                name = pattern.name
+                kwargs = self.url_kwargs(name, pattern.pattern.converters, users)
+                yield name, reverse(name, kwargs=kwargs) + self.url_query(name, users)
+
+    def run_views(self, repeat):
+        users = self.reference_users()
+        client = Client()
+
+        results = []
+        for name, path in self.view_paths(users):
+            for user_type in USER_TYPES:
+                result = {'view': name, 'path': path, 'user_type': user_type}
+                result.update(self.measure(client, users[user_type], path, repeat))
+                result['budget'] = QUERY_BUDGETS.get(name, DEFAULT_QUERY_BUDGET)
+                results.append(result)
+                self.stderr.write(
+                    f"{name:<26} {user_type:<10} {result['status']} "
+                    f"{result['queries']:>3} requêtes {result['wall_ms']:>8} ms "
+                    f"(à chaud {result['warm_queries']:>3} / {result['warm_wall_ms']:>8} ms) {result['peak_kib']:>9} KiB"
+                )
+        return results
+
+    def check_budgets(self, results):
+        return [
+            f"{result['view']} ({result['user_type']}) : {result['queries']} requêtes pour un budget de {result['budget']}"
+            for result in results
+            if result['budget'] is not None and result['queries'] > result['budget']
+        ]
+
+    def check_regressions(self, results, baseline_results, threshold):
+        baseline = {(result['view'], result['user_type']): result for result in baseline_results}
+        failures = []
+        for result in results:
+            previous = baseline.get((result['view'], result['user_type']))
+            if previous is None:
+                continue
+            if result['queries'] > previous['queries']:
+                failures.append(
+                    f"{result['view']} ({result['user_type']}) : {result['queries']} requêtes contre {previous['queries']}"
+                )
+            # Résultats antérieurs à la mesure à chaud : pas de comparaison
+            if result['warm_queries'] > previous.get('warm_queries', result['warm_queries']):
+                failures.append(
+                    f"{result['view']} ({result['user_type']}) : {result['warm_queries']} requêtes à chaud "
+                    f"contre {previous['warm_queries']}"
+                )
+            # Écart absolu minimal de 5 ms pour ignorer le bruit sur les vues rapides
+            if result['wall_ms'] > previous['wall_ms'] * threshold and result['wall_ms'] - previous['wall_ms'] > 5:
+                failures.append(
+                    f"{result['view']} ({result['user_type']}) : {result['wall_ms']} ms contre {previous['wall_ms']} ms"
+                )
+        return failures
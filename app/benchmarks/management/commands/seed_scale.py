@@ -0,0 +1,42 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import User
+from benchmarks.dataset import PASSWORD, seed_dataset
+
+
+class Command(BaseCommand):
+    help = "Génère un jeu de données volumineux et déterministe pour reproduire les problèmes de performance"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--instructors', type=int, default=20)
+        parser.add_argument('--weeks', type=int, default=52)
+        parser.add_argument('--seed', type=int, default=42, help="Graine aléatoire : même graine, mêmes données")
+        parser.add_argument('--start', type=date.fromisoformat,
+                            help="Premier jour des rendez-vous (AAAA-MM-JJ), à fixer pour des données identiques d'un jour à l'autre")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='seed-', help="Préfixe des noms d'utilisateur générés")
+        parser.add_argument('--password', default=PASSWORD, help="Mot de passe de tous les utilisateurs générés")
+
+    def handle(self, *args, **options):
+        if options['students'] < options['instructors']:
+            raise CommandError("Il faut au moins autant d'élèves que d'instructeurs pour éviter les chevauchements.")
+        if User.objects.filter(username__startswith=options['prefix']).exists():
+            raise CommandError(f"Des utilisateurs « {options['prefix']}* » existent déjà : choisissez un autre --prefix.")
+
+        start = time.perf_counter()
+        counts = seed_dataset(
+            students=options['students'],
+            instructors=options['instructors'],
+            weeks=options['weeks'],
+            seed=options['seed'],
+            start=options['start'],
+            batch_size=options['batch_size'],
+            prefix=options['prefix'],
+            password=options['password'],
+        )
+        elapsed = time.perf_counter() - start
+
+        summary = ', '.join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Créé en {elapsed:.1f} s : {summary}."))
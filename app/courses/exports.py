@@ -0,0 +1,150 @@
+import csv
+import tempfile
+from datetime import date, datetime, time
+from decimal import Decimal
+from asgiref.sync import sync_to_async
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+CHUNK_SIZE = 2000
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+PURCHASE_HEADER = ['N° achat', 'Date', 'Élève', 'Email', 'Forfait', 'Heures', 'Montant payé (€)']
+APPOINTMENT_HEADER = ['N° rendez-vous', 'Date', 'Début', 'Fin', 'Durée (h)', 'Élève', 'Instructeur', 'Lieu']
+
+
+class Echo:
+    """Pseudo-fichier dont write() renvoie la ligne au lieu de la stocker."""
+
+    def write(self, value):
+        return value
+
+
+def _purchase_row(purchase):
+    return [
+        purchase.pk,
+        timezone.localtime(purchase.purchase_date).replace(tzinfo=None),
+        f"{purchase.student.user.first_name} {purchase.student.user.last_name}",
+        purchase.student.user.email,
+        purchase.package.name,
+        purchase.hours_added,
+        purchase.amount_paid,
+    ]
+
+
+def _appointment_row(appointment):
+    return [
+        appointment.pk,
+        appointment.date,
+        appointment.start_time,
+        appointment.end_time,
+        appointment.duration,
+        f"{appointment.student.user.first_name} {appointment.student.user.last_name}",
+        f"{appointment.instructor.user.first_name} {appointment.instructor.user.last_name}",
+        appointment.location,
+    ]
+
+
+def purchase_rows(purchases):
+    """Lignes de l'export des achats, lues par paquets sans charger le queryset."""
+    yield PURCHASE_HEADER
+    for purchase in purchases.select_related('student__user', 'package').iterator(chunk_size=CHUNK_SIZE):
+        yield _purchase_row(purchase)
+
+
+async def apurchase_rows(purchases):
+    """Équivalent de purchase_rows avec .aiterator(), pour une réponse servie sous ASGI."""
+    yield PURCHASE_HEADER
+    async for purchase in purchases.select_related('student__user', 'package').aiterator(chunk_size=CHUNK_SIZE):
+        yield _purchase_row(purchase)
+
+
+def appointment_rows(appointments):
+    """Lignes de l'export des rendez-vous, lues par paquets sans charger le queryset."""
+    yield APPOINTMENT_HEADER
+    for appointment in appointments.select_related('student__user', 'instructor__user').iterator(chunk_size=CHUNK_SIZE):
+        yield _appointment_row(appointment)
+
+
+async def aappointment_rows(appointments):
+    """Équivalent de appointment_rows avec .aiterator(), pour une réponse servie sous ASGI."""
+    yield APPOINTMENT_HEADER
+    async for appointment in appointments.select_related('student__user', 'instructor__user').aiterator(chunk_size=CHUNK_SIZE):
+        yield _appointment_row(appointment)
+
+
+def _csv_value(value):
+    # Format attendu par un tableur français : virgule décimale, dates jj/mm/aaaa
+    if isinstance(value, datetime):
+        return value.strftime('%d/%m/%Y %H:%M')
+    if isinstance(value, date):
+        return value.strftime('%d/%m/%Y')
+    if isinstance(value, time):
+        return value.strftime('%H:%M')
+    if isinstance(value, Decimal):
+        return str(value).replace('.', ',')
+    return value
+
+
+def csv_response(rows, filename):
+    """
+    Diffuse les lignes en CSV au fil de l'eau : séparateur point-virgule et
+    BOM UTF-8 pour qu'Excel ouvre le fichier correctement. `rows` est un
+    itérateur sync (WSGI) ou async (ASGI), diffusé tel quel.
+    """
+    writer = csv.writer(Echo(), delimiter=';')
+
+    def stream():
+        yield '\ufeff'
+        for row in rows:
+            yield writer.writerow([_csv_value(value) for value in row])
+
+    async def astream():
+        yield '\ufeff'
+        async for row in rows:
+            yield writer.writerow([_csv_value(value) for value in row])
+
+    content = astream() if hasattr(rows, '__aiter__') else stream()
+    response = StreamingHttpResponse(content, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def xlsx_response(rows, filename, title, asynchronous=False):
+    """
+    Écrit les lignes (itérateur sync) dans un classeur XLSX en mode
+    write_only (mémoire constante) sur un fichier temporaire, puis le renvoie
+    par blocs. Sous ASGI (`asynchronous`), les blocs sont lus par un
+    générateur async : FileResponse chargerait tout le fichier en mémoire.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    for row in rows:
+        sheet.append(row)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    size = output.tell()
+    output.seek(0)
+
+    if asynchronous:
+        async def blocks():
+            try:
+                while block := await sync_to_async(output.read, thread_sensitive=False)(FileResponse.block_size):
+                    yield block
+            finally:
+                output.close()
+
+        response = StreamingHttpResponse(blocks(), content_type=XLSX_CONTENT_TYPE)
+        response['Content-Length'] = size
+        response['Content-Disposition'] = f'attachment; filename="{filename}.xlsx"'
+        return response
+
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f"{filename}.xlsx",
+        content_type=XLSX_CONTENT_TYPE,
+    )
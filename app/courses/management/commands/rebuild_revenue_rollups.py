@@ -0,0 +1,36 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from courses.models import Purchase, RevenueRollup
+
+
+class Command(BaseCommand):
+    help = "Reconstruit entièrement les agrégats de chiffre d'affaires à partir des achats"
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        totals = defaultdict(lambda: [Decimal('0'), 0])
+
+        purchases = Purchase.objects.values_list('package_id', 'purchase_date', 'amount_paid').order_by()
+        for package_id, purchase_date, amount_paid in purchases.iterator(chunk_size=2000):
+            for period, period_start in RevenueRollup.period_starts(purchase_date).items():
+                total = totals[(period, period_start, package_id)]
+                total[0] += amount_paid
+                total[1] += 1
+
+        rollups = [
+            RevenueRollup(
+                period=period,
+                period_start=period_start,
+                package_id=package_id,
+                revenue=revenue,
+                purchase_count=purchase_count,
+            )
+            for (period, period_start, package_id), (revenue, purchase_count) in totals.items()
+        ]
+
+        RevenueRollup.objects.all().delete()
+        RevenueRollup.objects.bulk_create(rollups, batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(f"{len(rollups)} agrégats reconstruits."))
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import defaultdict
+from decimal import Decimal
+from django.utils import timezone
+
+
+def populate_rollups(apps, schema_editor):
+    Purchase = apps.get_model('courses', 'Purchase')
+    RevenueRollup = apps.get_model('courses', 'RevenueRollup')
+    
+    totals = defaultdict(lambda: [Decimal('0'), 0])
+    for package_id, purchase_date, amount_paid in Purchase.objects.values_list('package_id', 'purchase_date', 'amount_paid').iterator():
+        day = timezone.localtime(purchase_date).date() if timezone.is_aware(purchase_date) else purchase_date.date()
+        for key in (('day', day, package_id), ('month', day.replace(day=1), package_id)):
+            totals[key][0] += amount_paid
+            totals[key][1] += 1
+    
+    RevenueRollup.objects.bulk_create([
+        RevenueRollup(period=period, period_start=period_start, package_id=package_id, revenue=revenue, purchase_count=count)
+        for (period, period_start, package_id), (revenue, count) in totals.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevenueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Jour'), ('month', 'Mois')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('purchase_count', models.IntegerField(default=0)),
+                ('package', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revenue_rollups', to='courses.coursepackage')),
+            ],
+            options={
+                'ordering': ['period', 'period_start'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='revenuerollup',
+            constraint=models.UniqueConstraint(fields=('period', 'period_start', 'package'), name='unique_revenue_rollup'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,10 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
 from accounts.models import Student
+from accounts import ledger
 
 class CoursePackage(models.Model):
     name = models.CharField(max_length=100)
@@ -11,18 +16,120 @@ class CoursePackage(models.Model):
         return f"{self.name} ({self.hours}h) - {self.price}€"
     
 class Purchase(models.Model):
+    # Champs dont dépendent les agrégats de chiffre d'affaires
+    ROLLUP_FIELDS = ('package_id', 'purchase_date', 'amount_paid')
+
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='purchases')
     package = models.ForeignKey(CoursePackage, on_delete=models.CASCADE)
     purchase_date = models.DateTimeField(auto_now_add=True)
     hours_added = models.PositiveIntegerField()
     amount_paid = models.DecimalField(max_digits=8, decimal_places=2)
     
+    class Meta:
+        indexes = [
+            # Historiques et exports triés ou filtrés par date d'achat
+            models.Index(fields=['purchase_date'], name='purchase_date_idx'),
+            models.Index(fields=['student', 'purchase_date'], name='purchase_student_date_idx'),
+        ]
+    
     def __str__(self):
         return f"Achat par {self.student} le {self.purchase_date.strftime('%d/%m/%Y')}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valeurs chargées, pour retirer l'ancien achat des agrégats lors d'une modification
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
     def save(self, *args, **kwargs):
-        # Mettre à jour le nombre d'heures restantes de l'étudiant lors de l'achat
-        if not self.pk:  # Seulement lors de la création
-            self.student.remaining_hours += self.hours_added
-            self.student.save()
-        super().save(*args, **kwargs)
\ No newline at end of file
+        loaded = getattr(self, '_loaded_values', {})
+        if self.pk and not all(name in loaded for name in self.ROLLUP_FIELDS):
+            # Instance construite à la main ou champs différés : relire l'achat enregistré
+            self._loaded_values = Purchase.objects.filter(pk=self.pk).values(*self.ROLLUP_FIELDS).first() or {}
+        # L'achat, le crédit d'heures et les agrégats mis à jour par
+        # _purchase_saved sont enregistrés ensemble
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self._loaded_values = {name: getattr(self, name) for name in self.ROLLUP_FIELDS}
+
+class RevenueRollup(models.Model):
+    """
+    Chiffre d'affaires et nombre d'achats agrégés par période et par forfait.
+    Maintenu par les signaux post_save/post_delete des achats (suppressions
+    en cascade et QuerySet.delete() comprises) ; après un QuerySet.update()
+    ou un chargement de fixtures, le reconstruire avec `rebuild_revenue_rollups`.
+    """
+    PERIOD_CHOICES = (
+        ('day', 'Jour'),
+        ('month', 'Mois'),
+    )
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    package = models.ForeignKey(CoursePackage, on_delete=models.CASCADE, related_name='revenue_rollups')
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    purchase_count = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'period_start', 'package'], name='unique_revenue_rollup'),
+        ]
+        ordering = ['period', 'period_start']
+    
+    def __str__(self):
+        return f"{self.get_period_display()} {self.period_start} - {self.package_id}: {self.revenue}€"
+    
+    @staticmethod
+    def period_starts(purchase_date):
+        # Les périodes suivent le fuseau horaire du site, comme les filtres __month/__year
+        day = timezone.localtime(purchase_date).date() if timezone.is_aware(purchase_date) else purchase_date.date()
+        return {'day': day, 'month': day.replace(day=1)}
+    
+    @classmethod
+    def record(cls, purchase, sign=1):
+        """Ajoute (ou retire avec sign=-1) un achat des agrégats jour et mois."""
+        amount = purchase.amount_paid * sign
+        for period, period_start in cls.period_starts(purchase.purchase_date).items():
+            if sign < 0:
+                # Un retrait ne crée pas d'agrégat : ceux d'un forfait
+                # supprimé disparaissent avec lui, avant ses achats
+                cls.objects.filter(period=period, period_start=period_start, package_id=purchase.package_id).update(
+                    revenue=F('revenue') + amount,
+                    purchase_count=F('purchase_count') + sign,
+                )
+                continue
+            rollup, created = cls.objects.get_or_create(
+                period=period,
+                period_start=period_start,
+                package_id=purchase.package_id,
+                defaults={'revenue': amount, 'purchase_count': sign},
+            )
+            if not created:
+                cls.objects.filter(pk=rollup.pk).update(
+                    revenue=F('revenue') + amount,
+                    purchase_count=F('purchase_count') + sign,
+                )
+
+
+@receiver(post_save, sender=Purchase)
+def _purchase_saved(sender, instance, created, raw=False, **kwargs):
+    # Fixtures : agrégats reconstruits ensuite par rebuild_revenue_rollups
+    if raw:
+        return
+    if created:
+        # Créditer les heures du forfait sur le solde de l'étudiant
+        ledger.credit(instance.student_id, instance.hours_added, 'purchase', f"Achat n°{instance.pk}")
+        RevenueRollup.record(instance)
+        return
+    previous = Purchase(**getattr(instance, '_loaded_values', {}))
+    if all(getattr(previous, name) == getattr(instance, name) for name in Purchase.ROLLUP_FIELDS):
+        return
+    RevenueRollup.record(previous, sign=-1)
+    RevenueRollup.record(instance)
+
+
+@receiver(post_delete, sender=Purchase)
+def _purchase_deleted(sender, instance, **kwargs):
+    # Aussi appelé pour QuerySet.delete(), l'action « supprimer » de l'admin
+    # et les suppressions en cascade d'un élève, qui n'appellent pas delete()
+    RevenueRollup.record(instance, sign=-1)
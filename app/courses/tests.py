@@ -0,0 +1,146 @@
+import warnings
+from collections import defaultdict
+from decimal import Decimal
+from unittest import mock
+from django.test import Client, TestCase
+from django.urls import reverse
+from accounts.models import User, Student
+from courses import exports
+from courses.models import CoursePackage, Purchase, RevenueRollup
+from my_driving_school.testing import asgi_get, response_body
+
+
+class RevenueRollupTests(TestCase):
+    """Les agrégats restent égaux à ceux recalculés depuis les achats, quel que soit le chemin d'écriture."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.students = [
+            Student.objects.create(user=User.objects.create_user(f'eleve{index}', user_type='student'))
+            for index in range(2)
+        ]
+        cls.packages = [
+            CoursePackage.objects.create(name=f'Forfait {hours}h', hours=hours, price=Decimal(hours * 45))
+            for hours in (10, 20)
+        ]
+
+    def buy(self, student, package, amount=None):
+        return Purchase.objects.create(
+            student=student, package=package, hours_added=package.hours,
+            amount_paid=package.price if amount is None else amount,
+        )
+
+    def assert_rollups_match(self):
+        expected = defaultdict(lambda: [Decimal('0'), 0])
+        for purchase in Purchase.objects.all():
+            for period, period_start in RevenueRollup.period_starts(purchase.purchase_date).items():
+                total = expected[(period, period_start, purchase.package_id)]
+                total[0] += purchase.amount_paid
+                total[1] += 1
+        actual = {
+            (rollup.period, rollup.period_start, rollup.package_id): [rollup.revenue, rollup.purchase_count]
+            for rollup in RevenueRollup.objects.exclude(purchase_count=0)
+        }
+        self.assertEqual(actual, dict(expected))
+
+    def test_create(self):
+        self.buy(self.students[0], self.packages[0])
+        self.buy(self.students[1], self.packages[0], Decimal('400.00'))
+        self.assert_rollups_match()
+        self.students[0].refresh_from_db()
+        self.assertEqual(self.students[0].remaining_hours, 10)
+
+    def test_package_and_amount_change(self):
+        purchase = self.buy(self.students[0], self.packages[0])
+        purchase.package = self.packages[1]
+        purchase.save()
+        self.assert_rollups_match()
+        purchase = Purchase.objects.get()
+        purchase.amount_paid = Decimal('123.45')
+        purchase.save()
+        self.assert_rollups_match()
+        # Instance construite sans passer par la base
+        Purchase(
+            pk=purchase.pk, student=purchase.student, package=self.packages[0], purchase_date=purchase.purchase_date,
+            hours_added=10, amount_paid=Decimal('99.00'),
+        ).save()
+        self.assert_rollups_match()
+
+    def test_instance_delete(self):
+        purchase = self.buy(self.students[0], self.packages[0])
+        self.buy(self.students[0], self.packages[1])
+        purchase.delete()
+        self.assert_rollups_match()
+
+    def test_queryset_delete(self):
+        for student in self.students:
+            self.buy(student, self.packages[0])
+        Purchase.objects.filter(student=self.students[0]).delete()
+        self.assert_rollups_match()
+
+    def test_cascade_from_student(self):
+        for student in self.students:
+            self.buy(student, self.packages[1])
+        self.students[1].user.delete()
+        self.assert_rollups_match()
+
+    def test_cascade_from_package(self):
+        self.buy(self.students[0], self.packages[0])
+        self.buy(self.students[0], self.packages[1])
+        self.packages[0].delete()
+        self.assert_rollups_match()
+        self.assertFalse(RevenueRollup.objects.filter(package_id=self.packages[0].pk).exists())
+
+
+class ExportStreamingTests(TestCase):
+    """Sous ASGI, les exports sont envoyés au fil de la lecture, pas chargés en mémoire."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', user_type='admin')
+        student = Student.objects.create(user=User.objects.create_user('eleve', first_name='Léa', user_type='student'))
+        package = CoursePackage.objects.create(name='Forfait 10h', hours=10, price=Decimal('450.00'))
+        # bulk_create : ni crédit d'heures ni agrégats, inutiles ici
+        Purchase.objects.bulk_create([
+            Purchase(student=student, package=package, hours_added=10, amount_paid=Decimal('450.00'))
+            for _ in range(12)
+        ])
+
+    def setUp(self):
+        client = Client()
+        client.force_login(self.admin)
+        self.cookie = '; '.join(f'{name}={morsel.value}' for name, morsel in client.cookies.items())
+
+    async def get(self, path, trace=None):
+        with warnings.catch_warnings():
+            # Repli de Django qui lit tout le contenu avant l'envoi
+            warnings.filterwarnings('error', 'StreamingHttpResponse must consume')
+            return await asgi_get(path, cookie=self.cookie, trace=trace)
+
+    async def test_csv_is_streamed_under_asgi(self):
+        trace = []
+
+        def traced_row(purchase):
+            trace.append('row')
+            return purchase_row(purchase)
+
+        purchase_row = exports._purchase_row
+        with mock.patch.object(exports, 'CHUNK_SIZE', 5), mock.patch.object(exports, '_purchase_row', traced_row):
+            messages = await self.get(reverse('export_purchases'), trace)
+
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertEqual(response_body(messages).decode('utf-8-sig').count('Forfait 10h'), 12)
+        # Le BOM part avant la lecture du premier achat
+        first_body = next(index for index, item in enumerate(trace) if item != 'row' and item.get('body'))
+        self.assertNotIn('row', trace[:first_body])
+
+    async def test_xlsx_is_sent_by_blocks_under_asgi(self):
+        with mock.patch('django.http.FileResponse.block_size', 1024):
+            messages = await self.get(reverse('export_purchases') + '?format=xlsx')
+
+        self.assertEqual(messages[0]['status'], 200)
+        headers = dict(messages[0]['headers'])
+        body = response_body(messages)
+        self.assertEqual(int(headers[b'Content-Length']), len(body))
+        self.assertTrue(body.startswith(b'PK'))
+        self.assertGreater(sum(1 for message in messages if message.get('body')), 1)
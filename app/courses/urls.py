@@ -15,4 +15,6 @@ urlpatterns = [
     
     # Espace comptabilité
     path('accounting/', views.accounting_dashboard, name='accounting_dashboard'),
+    path('accounting/export/purchases/', views.accounting_export, {'dataset': 'purchases'}, name='export_purchases'),
+    path('accounting/export/appointments/', views.accounting_export, {'dataset': 'appointments'}, name='export_appointments'),
 ]
\ No newline at end of file
@@ -1,11 +1,22 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from courses.models import CoursePackage, Purchase
+from courses.models import CoursePackage, Purchase, RevenueRollup
 from accounts.models import Student
+from accounts.search import find_profile
+from accounts.roles import role_required, ACTION_DENIED
 from courses.forms import PurchaseForm, CoursePackageForm
 from django.utils import timezone
-from django.db import models
+from django.db import models, router
+from datetime import datetime, timedelta
+from courses import exports
+from scheduling.models import Appointment
+from my_driving_school.pagination import apaginate_keyset
+from my_driving_school import metrics
+from my_driving_school.db_router import use_replica
+from my_driving_school.streaming import serves_async
+
+ACCOUNTING_DENIED = "Vous n'avez pas l'autorisation d'accéder à cette page."
 
 @login_required
 def package_list(request):
@@ -17,13 +28,9 @@ def package_detail(request, pk):
     package = get_object_or_404(CoursePackage, pk=pk)
     return render(request, 'courses/package_detail.html', {'package': package})
 
-@login_required
+# Seuls les secrétaires et admins peuvent enregistrer des achats
+@role_required('secretary', 'admin', message=ACTION_DENIED, redirect_to='package_list')
 def purchase_package(request, package_id):
-    # Seuls les secrétaires et admins peuvent enregistrer des achats
-    if request.user.user_type not in ['secretary', 'admin']:
-        messages.error(request, "Vous n'avez pas l'autorisation d'effectuer cette action.")
-        return redirect('package_list')
-    
     package = get_object_or_404(CoursePackage, pk=package_id)
     
     if request.method == 'POST':
@@ -32,20 +39,17 @@ def purchase_package(request, package_id):
         
         if not student_id:
             messages.error(request, "Veuillez sélectionner un élève.")
-            students = Student.objects.all()
             return render(request, 'courses/purchase_form.html', {
-                'package': package,
-                'students': students
+                'package': package
             })
         
         try:
             amount_paid = float(amount_paid)
         except ValueError:
             messages.error(request, "Le montant payé doit être un nombre valide.")
-            students = Student.objects.all()
             return render(request, 'courses/purchase_form.html', {
                 'package': package,
-                'students': students
+                'selected_student': find_profile('student', student_id)
             })
             
         student = get_object_or_404(Student, pk=student_id)
@@ -57,37 +61,34 @@ def purchase_package(request, package_id):
             amount_paid=amount_paid
         )
         purchase.save()
+        metrics.PURCHASES.inc()
+        metrics.HOURS_SOLD.inc(purchase.hours_added)
         
         messages.success(request, f"Achat enregistré avec succès pour {student.user.first_name} {student.user.last_name}.")
         return redirect('purchase_history')
     
-    students = Student.objects.all()
     return render(request, 'courses/purchase_form.html', {
         'package': package,
-        'students': students
+        'selected_student': find_profile('student', request.GET.get('student'))
     })
 
-@login_required
-def purchase_history(request):
-    user = request.user
-    
-    if user.user_type == 'student':
-        purchases = Purchase.objects.filter(student=user.student_profile)
-    elif user.user_type in ['secretary', 'admin']:
-        purchases = Purchase.objects.all().order_by('-purchase_date')
+@use_replica
+@role_required('student', 'secretary', 'admin')
+async def purchase_history(request):
+    if request.role.is_student:
+        purchases = Purchase.objects.filter(student=request.role.student)
     else:
-        messages.error(request, "Vous n'avez pas l'autorisation de voir cette page.")
-        return redirect('profile')
+        purchases = Purchase.objects.all()
+    
+    purchases = await apaginate_keyset(
+        purchases.select_related('student__user', 'package'), request,
+        ordering=['-purchase_date', '-id']
+    )
     
     return render(request, 'courses/purchase_history.html', {'purchases': purchases})
 
-@login_required
+@role_required('admin', 'secretary', message=ACTION_DENIED, redirect_to='package_list')
 def package_create(request):
-    # Vérifier les autorisations
-    if request.user.user_type not in ['admin', 'secretary']:
-        messages.error(request, "Vous n'avez pas l'autorisation d'effectuer cette action.")
-        return redirect('package_list')
-    
     if request.method == 'POST':
         form = CoursePackageForm(request.POST)
         if form.is_valid():
@@ -102,13 +103,8 @@ def package_create(request):
         'is_new': True
     })
 
-@login_required
+@role_required('admin', 'secretary', message=ACTION_DENIED, redirect_to='package_list')
 def package_edit(request, pk):
-    # Vérifier les autorisations
-    if request.user.user_type not in ['admin', 'secretary']:
-        messages.error(request, "Vous n'avez pas l'autorisation d'effectuer cette action.")
-        return redirect('package_list')
-    
     package = get_object_or_404(CoursePackage, pk=pk)
     
     if request.method == 'POST':
@@ -126,13 +122,8 @@ def package_edit(request, pk):
         'is_new': False
     })
 
-@login_required
+@role_required('admin', 'secretary', message=ACTION_DENIED, redirect_to='package_list')
 def package_delete(request, pk):
-    # Vérifier les autorisations
-    if request.user.user_type not in ['admin', 'secretary']:
-        messages.error(request, "Vous n'avez pas l'autorisation d'effectuer cette action.")
-        return redirect('package_list')
-    
     package = get_object_or_404(CoursePackage, pk=pk)
     
     # Vérifier si le forfait peut être supprimé
@@ -150,65 +141,109 @@ def package_delete(request, pk):
         'package': package
     })
 
-@login_required
+# Comptabilité : réservée aux administrateurs
+@use_replica
+@role_required('admin', message=ACCOUNTING_DENIED, redirect_to='home')
 def accounting_dashboard(request):
-    # Vérifier les autorisations (réservé aux administrateurs)
-    if request.user.user_type != 'admin':
-        messages.error(request, "Vous n'avez pas l'autorisation d'accéder à cette page.")
-        return redirect('home')
-    
-    # Récupérer toutes les transactions
-    all_purchases = Purchase.objects.all().order_by('-purchase_date')
-    
-    # Calculer les statistiques
-    total_revenue = Purchase.objects.aggregate(total=models.Sum('amount_paid'))['total'] or 0
-    
-    # Revenus du mois en cours
-    current_month = timezone.now().month
-    current_year = timezone.now().year
-    monthly_revenue = Purchase.objects.filter(
-        purchase_date__month=current_month,
-        purchase_date__year=current_year
-    ).aggregate(total=models.Sum('amount_paid'))['total'] or 0
+    # Récupérer les dernières transactions
+    recent_purchases = Purchase.objects.select_related('student__user', 'package').order_by('-purchase_date', '-id')[:10]
+    
+    # Les statistiques sont lues dans les agrégats mensuels (une ligne par mois et par forfait)
+    monthly_rollups = RevenueRollup.objects.filter(period='month')
+    totals = monthly_rollups.aggregate(
+        total=models.Sum('revenue'),
+        count=models.Sum('purchase_count')
+    )
+    total_revenue = totals['total'] or 0
+    total_purchases = totals['count'] or 0
     
     # Nombre de forfaits vendus par type
-    package_stats = Purchase.objects.values('package__name').annotate(
-        count=models.Count('id'),
-        total=models.Sum('amount_paid')
+    package_stats = monthly_rollups.values('package__name').annotate(
+        count=models.Sum('purchase_count'),
+        total=models.Sum('revenue')
     ).order_by('-count')
     
-    # Revenus par mois (pour le graphique)
+    # Revenus par mois sur les 6 derniers mois et le mois en cours (pour le graphique)
+    current_month_start = timezone.localdate().replace(day=1)
+    month_starts = [current_month_start]
+    for i in range(6):
+        month_starts.insert(0, (month_starts[0] - timezone.timedelta(days=1)).replace(day=1))
+    
+    revenue_by_month = dict(
+        monthly_rollups.filter(period_start__gte=month_starts[0]).values('period_start').annotate(
+            total=models.Sum('revenue')
+        ).values_list('period_start', 'total').order_by()
+    )
+    
     months = []
     revenues = []
+    for month_start in month_starts:
+        months.append(month_start.strftime('%B %Y'))
+        revenues.append(float(revenue_by_month.get(month_start) or 0))
     
-    for i in range(6, 0, -1):
-        # Calculer la date pour les 6 derniers mois
-        date = timezone.now() - timezone.timedelta(days=30 * i)
-        month = date.month
-        year = date.year
-        
-        month_name = date.strftime('%B %Y')
-        
-        month_revenue = Purchase.objects.filter(
-            purchase_date__month=month,
-            purchase_date__year=year
-        ).aggregate(total=models.Sum('amount_paid'))['total'] or 0
-        
-        months.append(month_name)
-        revenues.append(float(month_revenue))
-    
-    # Ajouter le mois en cours
-    current_month_name = timezone.now().strftime('%B %Y')
-    months.append(current_month_name)
-    revenues.append(float(monthly_revenue))
+    # Revenus du mois en cours
+    monthly_revenue = revenue_by_month.get(current_month_start) or 0
     
     context = {
-        'all_purchases': all_purchases,
+        'recent_purchases': recent_purchases,
+        'total_purchases': total_purchases,
         'total_revenue': total_revenue,
         'monthly_revenue': monthly_revenue,
         'package_stats': package_stats,
         'months': months,
         'revenues': revenues,
+        'packages': CoursePackage.objects.order_by('name'),
     }
     
-    return render(request, 'courses/accounting_dashboard.html', context)
\ No newline at end of file
+    return render(request, 'courses/accounting_dashboard.html', context)
+
+@use_replica
+@role_required('admin', message=ACCOUNTING_DENIED, redirect_to='home')
+def accounting_export(request, dataset):
+    """Export CSV ou XLSX des achats ou des rendez-vous, filtré par période et par forfait."""
+    export_format = request.GET.get('format', 'csv')
+    try:
+        date_from = datetime.strptime(request.GET['from'], '%Y-%m-%d').date() if request.GET.get('from') else None
+        date_to = datetime.strptime(request.GET['to'], '%Y-%m-%d').date() if request.GET.get('to') else None
+        package_id = int(request.GET['package']) if request.GET.get('package') else None
+    except ValueError:
+        messages.error(request, "Les filtres de l'export sont invalides.")
+        return redirect('accounting_dashboard')
+    
+    if export_format not in ('csv', 'xlsx'):
+        messages.error(request, "Format d'export inconnu.")
+        return redirect('accounting_dashboard')
+    
+    # Les lignes sont lues pendant l'envoi, après la vue : la base (réplica)
+    # est donc choisie ici. Le CSV est produit par un générateur async sous
+    # ASGI, sinon le serveur le chargerait en mémoire avant l'envoi.
+    stream_async = serves_async(request) and export_format == 'csv'
+    if dataset == 'purchases':
+        queryset = Purchase.objects.using(router.db_for_read(Purchase)).order_by('purchase_date', 'id')
+        # Bornes en heure locale, comparées directement à purchase_date pour rester indexables
+        if date_from:
+            queryset = queryset.filter(purchase_date__gte=timezone.make_aware(datetime.combine(date_from, datetime.min.time())))
+        if date_to:
+            queryset = queryset.filter(purchase_date__lt=timezone.make_aware(datetime.combine(date_to + timedelta(days=1), datetime.min.time())))
+        if package_id:
+            queryset = queryset.filter(package_id=package_id)
+        rows = exports.apurchase_rows(queryset) if stream_async else exports.purchase_rows(queryset)
+        title = 'Achats'
+    else:
+        queryset = Appointment.objects.using(router.db_for_read(Appointment)).order_by('date', 'start_time', 'id')
+        if date_from:
+            queryset = queryset.filter(date__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(date__lte=date_to)
+        rows = exports.aappointment_rows(queryset) if stream_async else exports.appointment_rows(queryset)
+        title = 'Rendez-vous'
+    
+    filename = f"{dataset}-{date_from or 'debut'}-{date_to or timezone.localdate()}"
+    
+    if export_format == 'xlsx':
+        try:
+            return exports.xlsx_response(rows, filename, title, asynchronous=serves_async(request))
+        except ImportError:
+            messages.error(request, "L'export XLSX nécessite le paquet openpyxl.")
+            return redirect('accounting_dashboard')
+    return exports.csv_response(rows, filename)
@@ -0,0 +1,33 @@
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.contrib.auth.middleware import get_user
+from django.contrib.auth.views import redirect_to_login
+from accounts.roles import get_role
+
+
+def _load_user(request):
+    user = get_user(request)
+    return user, get_role(user)
+
+
+async def aget_user(request):
+    """
+    Charge l'utilisateur de la requête (session puis base) et son rôle hors
+    de la boucle d'événements. Ensuite request.user et request.role ne sont
+    plus paresseux : une vue async peut les lire sans requête synchrone.
+    """
+    request.user, request.role = await sync_to_async(_load_user)(request)
+    return request.user
+
+
+def async_login_required(view):
+    """Équivalent de login_required pour les vues async (absent de Django 4.2)."""
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await aget_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,25 @@
+import time
+
+# Invalidation par version, partagée par les compteurs de l'accueil
+# (accounts.dashboard) et les fragments du calendrier (scheduling.fragments) :
+# chaque entrée du cache garde les versions avec lesquelles elle a été
+# calculée, une écriture incrémente ces versions et l'entrée est recalculée à
+# la lecture suivante.
+
+
+def bump(cache, version_keys):
+    """Incrémente les versions `version_keys` de `cache`."""
+    for key in version_keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Version absente ou évincée : repartir d'une valeur jamais utilisée
+            cache.add(key, time.time_ns(), None)
+
+
+async def abump(cache, version_key):
+    """Équivalent de bump pour une version, depuis une vue async."""
+    try:
+        await cache.aincr(version_key)
+    except ValueError:
+        await cache.aadd(version_key, time.time_ns(), None)
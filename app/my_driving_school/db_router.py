@@ -0,0 +1,142 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Lectures sur les réplicas (settings.REPLICA_DATABASES), écritures sur la
+# base principale. Seules les vues marquées @use_replica lisent sur une
+# réplica, et jamais juste après une écriture du même navigateur : celle-ci
+# pose un cookie qui ramène ses lectures sur la base principale pendant
+# REPLICA_PIN_SECONDS, le temps que la réplication rattrape son retard.
+
+
+class RoutingState:
+    """Choix de la base pour la requête en cours (mutable, partagé par les threads de la requête)."""
+
+    def __init__(self, pinned=False):
+        self.use_replica = False
+        # Lectures forcées sur la base principale (écriture récente)
+        self.pinned = pinned
+        self.wrote = False
+
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is None or not state.use_replica or state.pinned
+            or not settings.REPLICA_DATABASES
+            # Une transaction en cours doit relire ses propres écritures
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.REPLICA_DATABASES)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            # Les lectures suivantes de la requête voient l'écriture
+            state.wrote = state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Les réplicas sont des copies de la base principale
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Les réplicas reçoivent le schéma par la réplication
+        return db not in settings.REPLICA_DATABASES
+
+
+@contextmanager
+def _routing(**changes):
+    state = _state.get()
+    token = None
+    if state is None:
+        # Hors requête (commande, tâche) ou middleware absent
+        state = RoutingState()
+        token = _state.set(state)
+    previous = {name: getattr(state, name) for name in changes}
+    for name, value in changes.items():
+        setattr(state, name, value)
+    try:
+        yield state
+    finally:
+        for name, value in previous.items():
+            setattr(state, name, value)
+        # Une écriture faite dans le bloc garde la suite de la requête sur la base principale
+        state.pinned = state.pinned or state.wrote
+        if token is not None:
+            _state.reset(token)
+
+
+def primary_reads():
+    """Bloc dont les lectures vont sur la base principale, même dans une vue @use_replica."""
+    return _routing(pinned=True)
+
+
+def use_replica(view):
+    """Vue (sync ou async) en lecture seule dont les requêtes peuvent aller sur une réplica."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            with _routing(use_replica=True):
+                return await view(request, *args, **kwargs)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with _routing(use_replica=True):
+            return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaMiddleware:
+    """
+    Prépare le routage de chaque requête et, après une écriture, pose le
+    cookie qui garde ce navigateur sur la base principale. Sans accès à la
+    session : il sert aussi aux vues async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RoutingState(pinned=settings.REPLICA_PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._pin(state, response)
+
+    async def __acall__(self, request):
+        state = RoutingState(pinned=settings.REPLICA_PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._pin(state, response)
+
+    def _pin(self, state, response):
+        if state.wrote and settings.REPLICA_DATABASES:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
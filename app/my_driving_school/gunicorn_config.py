@@ -0,0 +1,96 @@
+# Configuration gunicorn de production :
+#   gunicorn -c app/my_driving_school/gunicorn_config.py
+# Chaque réglage peut être surchargé par variable d'environnement.
+import multiprocessing
+import os
+import resource
+import time
+from pathlib import Path
+
+ASYNC_WORKER = 'uvicorn_worker.UvicornWorker'
+
+# Répertoire contenant le paquet my_driving_school et les applications
+chdir = str(Path(__file__).resolve().parent.parent)
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS') or ASYNC_WORKER
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+wsgi_app = os.environ.get('GUNICORN_APP', (
+    'my_driving_school.asgi:application' if worker_class == ASYNC_WORKER
+    else 'my_driving_school.wsgi:application'
+))
+
+# Un worker ASGI sert de nombreuses requêtes à la fois sur sa boucle
+# d'événements : un par CPU suffit. Un worker synchrone n'en sert qu'une
+# (ou `threads`) : la règle habituelle 2 x CPU + 1 couvre les attentes d'E/S.
+cpu_count = multiprocessing.cpu_count()
+default_workers = cpu_count if worker_class == ASYNC_WORKER else cpu_count * 2 + 1
+workers = int(os.environ.get('WEB_CONCURRENCY') or default_workers)
+
+# Le cache locmem est propre à chaque worker : une écriture n'invaliderait
+# les compteurs et les fragments que dans le worker qui l'a faite, les autres
+# les serviraient périmés jusqu'à leur expiration.
+if workers > 1 and (os.environ.get('CACHE_BACKEND') or 'locmem') == 'locmem':
+    raise RuntimeError(
+        f"{workers} workers avec le cache locmem : choisir un cache partagé "
+        "(CACHE_BACKEND=redis ou memcached) ou WEB_CONCURRENCY=1"
+    )
+
+# Django, le résolveur d'URL et les templates sont chargés une fois dans le
+# maître puis partagés (copie sur écriture) par tous les workers.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+# Préchauffage des caches de Django avant la première requête (désactivable
+# pour mesurer son effet sur django_worker_first_request_seconds)
+warmup = os.environ.get('GUNICORN_WARMUP', '1') == '1'
+
+# Recycler les workers limite la croissance mémoire ; la gigue évite qu'ils
+# redémarrent tous en même temps.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-')
+errorlog = '-'
+
+
+def _warm_up(log):
+    from my_driving_school.warmup import warm_up
+
+    start = time.perf_counter()
+    timings = warm_up()
+    log.info(
+        "Préchauffage en %.0f ms (URL %.0f ms, modèles %.0f ms, %d templates %.0f ms), RSS %d Mio",
+        (time.perf_counter() - start) * 1000, timings['urls'] * 1000, timings['models'] * 1000,
+        timings['template_count'], timings['templates'] * 1000,
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024,
+    )
+
+
+def when_ready(server):
+    # Avec preload_app, l'application est déjà chargée dans le maître
+    if preload_app and warmup:
+        _warm_up(server.log)
+    if preload_app:
+        # Le maître ne sert aucune requête : retirer ses jauges par processus
+        # créées à l'import des métriques
+        _mark_process_dead(os.getpid())
+
+
+def post_worker_init(worker):
+    if warmup and not preload_app:
+        _warm_up(worker.log)
+
+
+def child_exit(server, worker):
+    # Les métriques Prometheus d'un worker arrêté ne doivent plus compter
+    # dans les jauges agrégées (requêtes en cours, mémoire...)
+    _mark_process_dead(worker.pid)
+
+
+def _mark_process_dead(pid):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,160 @@
+import os
+import resource
+import time
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+from django.http import HttpResponse
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess,
+)
+
+# En mode multi-processus (gunicorn), prometheus_client écrit les valeurs dans
+# PROMETHEUS_MULTIPROC_DIR et /metrics agrège les fichiers de tous les workers.
+MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_LATENCY = Histogram(
+    'django_view_request_latency_seconds', "Durée de traitement des requêtes par vue",
+    ['view', 'method', 'status'], buckets=LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    'django_view_response_size_bytes', "Taille des réponses par vue",
+    ['view'], buckets=(512, 2048, 8192, 32768, 131072, 524288, 2097152),
+)
+DB_QUERIES = Histogram(
+    'django_view_db_queries', "Nombre de requêtes SQL par requête HTTP",
+    ['view'], buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250),
+)
+DB_TIME = Histogram(
+    'django_view_db_time_seconds', "Temps passé en base de données par requête HTTP",
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+IN_FLIGHT = Gauge(
+    'django_requests_in_flight', "Requêtes en cours de traitement",
+    multiprocess_mode='livesum',
+)
+
+# Une série par worker (pid) : coût du démarrage à froid et mémoire, à
+# surveiller avec preload_app et max_requests (gunicorn_config.py)
+WORKER_FIRST_REQUEST = Gauge(
+    'django_worker_first_request_seconds', "Durée de la première requête servie par le worker",
+    multiprocess_mode='liveall',
+)
+WORKER_MAX_RSS = Gauge(
+    'django_worker_max_rss_bytes', "Pic de mémoire résidente du worker",
+    multiprocess_mode='liveall',
+)
+
+# Indicateurs métier : rate(...[1m]) donne les réservations et achats par minute
+APPOINTMENTS_BOOKED = Counter('driving_school_appointments_booked', "Rendez-vous réservés")
+APPOINTMENTS_CANCELLED = Counter('driving_school_appointments_cancelled', "Rendez-vous annulés")
+PURCHASES = Counter('driving_school_purchases', "Forfaits achetés")
+HOURS_SOLD = Counter('driving_school_hours_sold', "Heures de conduite vendues")
+
+
+class QueryTimer:
+    """Wrapper d'exécution SQL qui compte les requêtes et cumule leur durée."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+def _watch_queries(stack, timer):
+    for alias in connections:
+        stack.enter_context(connections[alias].execute_wrapper(timer))
+
+
+class PrometheusMiddleware:
+    """
+    Mesure latence, taille de réponse et activité SQL de chaque vue nommée.
+    Compatible sync et async : sous ASGI, les vues async ne réservent pas de
+    thread pendant toute la requête.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path == '/metrics':
+            return self.get_response(request)
+
+        timer = QueryTimer()
+        start = time.perf_counter()
+        IN_FLIGHT.inc()
+        try:
+            with ExitStack() as stack:
+                _watch_queries(stack, timer)
+                response = self.get_response(request)
+        finally:
+            IN_FLIGHT.dec()
+        self._observe(request, response, timer, start)
+        return response
+
+    async def __acall__(self, request):
+        if request.path == '/metrics':
+            return await self.get_response(request)
+
+        timer = QueryTimer()
+        start = time.perf_counter()
+        IN_FLIGHT.inc()
+        stack = ExitStack()
+        try:
+            # Les requêtes SQL, y compris celles de l'ORM async, s'exécutent
+            # dans le thread synchrone propre à la requête : c'est sur ses
+            # connexions que le wrapper doit être posé.
+            await sync_to_async(_watch_queries)(stack, timer)
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            IN_FLIGHT.dec()
+        self._observe(request, response, timer, start)
+        return response
+
+    def _observe(self, request, response, timer, start):
+        resolver_match = getattr(request, 'resolver_match', None)
+        view = resolver_match.url_name if resolver_match and resolver_match.url_name else 'unmatched'
+
+        REQUEST_LATENCY.labels(view, request.method, response.status_code).observe(time.perf_counter() - start)
+        if not response.streaming:
+            RESPONSE_SIZE.labels(view).observe(len(response.content))
+        DB_QUERIES.labels(view).observe(timer.count)
+        DB_TIME.labels(view).observe(timer.duration)
+        _observe_worker(time.perf_counter() - start)
+
+
+_first_request_served = False
+
+
+def _observe_worker(duration):
+    global _first_request_served
+    if not _first_request_served:
+        _first_request_served = True
+        WORKER_FIRST_REQUEST.set(duration)
+    # ru_maxrss est en Kio sous Linux
+    WORKER_MAX_RSS.set(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+
+
+def metrics_view(request):
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
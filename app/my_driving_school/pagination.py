@@ -0,0 +1,154 @@
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    """Page de résultats paginée par curseur, avec liens suivant/précédent."""
+
+    def __init__(self, items, request, param, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self._request = request
+        self._param = param
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def _query_with(self, cursor):
+        params = self._request.GET.copy()
+        params[self._param] = cursor
+        return params.urlencode()
+
+    @property
+    def next_query(self):
+        return self._query_with(self.next_cursor)
+
+    @property
+    def previous_query(self):
+        return self._query_with(self.prev_cursor)
+
+
+def _encode_cursor(direction, values):
+    payload = json.dumps([direction, [None if value is None else str(value) for value in values]])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor, fields):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, raw_values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if direction not in ('next', 'prev') or len(raw_values) != len(fields):
+            return None
+        return direction, [field.to_python(value) for field, value in zip(fields, raw_values)]
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+def _resolve_field(model, path):
+    field = None
+    for name in path.split('__'):
+        field = model._meta.get_field(name)
+        if field.is_relation:
+            model = field.related_model
+    # Une clé étrangère se compare sur la valeur de la clé cible
+    return field.target_field if field.is_relation else field
+
+
+def _after(keys, values):
+    """Condition lexicographique « strictement après » pour un ordre mixte."""
+    condition = Q()
+    for index, (name, descending) in enumerate(keys):
+        step = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[index]})
+        for previous_index in range(index):
+            step &= Q(**{keys[previous_index][0]: values[previous_index]})
+        condition |= step
+    return condition
+
+
+def _page_query(queryset, request, ordering, per_page, param):
+    keys = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+    fields = [_resolve_field(queryset.model, name) for name, _ in keys]
+
+    direction, values = 'next', None
+    cursor = request.GET.get(param)
+    if cursor:
+        decoded = _decode_cursor(cursor, fields)
+        if decoded:
+            direction, values = decoded
+
+    if direction == 'prev':
+        # Parcourir à rebours puis remettre la page dans l'ordre d'affichage
+        reversed_keys = [(name, not descending) for name, descending in keys]
+        page_queryset = queryset.filter(_after(reversed_keys, values)).order_by(
+            *[f"{'-' if descending else ''}{name}" for name, descending in reversed_keys]
+        )
+    else:
+        page_queryset = queryset.order_by(*ordering)
+        if values is not None:
+            page_queryset = page_queryset.filter(_after(keys, values))
+    return keys, direction, values, page_queryset[:per_page + 1]
+
+
+def _build_page(items, request, param, keys, direction, values, per_page):
+    if direction == 'prev':
+        has_more_before = len(items) > per_page
+        items = items[:per_page][::-1]
+        has_more_after = True
+    else:
+        has_more_after = len(items) > per_page
+        items = items[:per_page]
+        has_more_before = values is not None
+
+    def key_values(item):
+        result = []
+        for name, _ in keys:
+            value = item
+            for attname in name.split('__'):
+                value = getattr(value, attname)
+            result.append(value.pk if hasattr(value, 'pk') else value)
+        return result
+
+    next_cursor = prev_cursor = None
+    if items and has_more_after:
+        next_cursor = _encode_cursor('next', key_values(items[-1]))
+    if items and has_more_before:
+        prev_cursor = _encode_cursor('prev', key_values(items[0]))
+
+    return KeysetPage(items, request, param, next_cursor, prev_cursor)
+
+
+def paginate_keyset(queryset, request, ordering, per_page=25, param='cursor'):
+    """
+    Pagine `queryset` par curseur (keyset) sur les champs de `ordering`.
+
+    `ordering` doit rendre l'ordre total (terminer par 'id' ou '-id'). Chaque
+    page se lit avec un WHERE sur la dernière clé vue et un LIMIT, sans OFFSET :
+    le coût d'une page ne dépend pas de sa position dans l'historique.
+    """
+    keys, direction, values, page_queryset = _page_query(queryset, request, ordering, per_page, param)
+    return _build_page(list(page_queryset), request, param, keys, direction, values, per_page)
+
+
+async def apaginate_keyset(queryset, request, ordering, per_page=25, param='cursor'):
+    """Variante asynchrone de paginate_keyset, pour les vues async."""
+    keys, direction, values, page_queryset = _page_query(queryset, request, ordering, per_page, param)
+    items = [item async for item in page_queryset]
+    return _build_page(items, request, param, keys, direction, values, per_page)
@@ -20,14 +20,18 @@ INSTALLED_APPS = [
     'accounts',
     'scheduling',
     'courses',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
+    'my_driving_school.metrics.PrometheusMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'my_driving_school.db_router.ReplicaMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.roles.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -51,14 +55,126 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'my_driving_school.wsgi.application'
+ASGI_APPLICATION = 'my_driving_school.asgi.application'
 
-DATABASES = {
+# Base de données : SQLite par défaut (développement), PostgreSQL avec DB_ENGINE=postgresql
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+# Worker gunicorn synchrone (voir gunicorn_config.py), ASGI sinon
+_SYNC_WORKER = os.environ.get('GUNICORN_WORKER_CLASS') in ('sync', 'gthread')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'driving_school'),
+            'USER': os.environ.get('POSTGRES_USER', 'driving_school'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'db'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # Connexions persistantes avec un worker gunicorn synchrone : chaque
+            # thread garde la sienne entre les requêtes (workers x threads
+            # connexions côté PostgreSQL). Sous ASGI, le défaut en production,
+            # le code synchrone d'une requête tourne dans un thread créé pour
+            # elle : une connexion persistante n'y serait jamais réutilisée.
+            # Les connexions y sont mutualisées par PgBouncer (docker-stack.yml).
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600 if _SYNC_WORKER else 0)),
+            'CONN_HEALTH_CHECKS': True,
+            # PgBouncer en mode transaction : la connexion serveur peut changer
+            # entre deux transactions, un curseur nommé (iterator()) n'y survit pas
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_TRANSACTION_POOLING') == '1',
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', os.path.join('/app/data', 'db.sqlite3')),
+        }
+    }
+
+# Réplicas en lecture : DB_REPLICAS=hôte1,hôte2 (PostgreSQL, mêmes
+# identifiants que la base principale) ou chemin1,chemin2 (copies SQLite).
+# Les vues marquées @use_replica y lisent (voir my_driving_school/db_router.py) ;
+# après une écriture, le navigateur relit sur la base principale pendant
+# REPLICA_PIN_SECONDS, le temps que la réplication rattrape son retard.
+REPLICA_DATABASES = []
+for _index, _location in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), 1):
+    _location = _location.strip()
+    DATABASES[f'replica{_index}'] = {
+        **DATABASES['default'],
+        **({'HOST': _location} if DB_ENGINE == 'postgresql' else {'NAME': _location}),
+        # En test, seconde connexion vers la base de test de default
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(f'replica{_index}')
+DATABASE_ROUTERS = ['my_driving_school.db_router.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 15))
+REPLICA_PIN_COOKIE = 'db_primary'
+
+# Cache, choisi par CACHE_BACKEND :
+# - locmem (défaut) : mémoire locale, propre à chaque processus. Il offre les
+#   mêmes opérations (incr/add) que les caches partagés et les remplace pour
+#   le développement, les tests et `benchmark_views` ;
+# - file : fichiers dans CACHE_LOCATION, partagés par les workers d'une même
+#   machine (incr n'y est pas atomique) ;
+# - memcached, redis : caches partagés entre workers et réplicas ;
+# - dummy : aucun cache, pour mesurer les vues sans lui ;
+# - ou le chemin complet d'un backend Django.
+# Avec plusieurs workers ou réplicas, choisir un cache partagé pour que
+# l'invalidation des compteurs et des fragments atteigne tous les processus.
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', ''),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', '/app/data/cache'),
+    'memcached': ('django.core.cache.backends.memcached.PyMemcacheCache', 'memcached:11211'),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://redis:6379/1'),
+    'dummy': ('django.core.cache.backends.dummy.DummyCache', ''),
+}
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or 'locmem'
+_cache_backend, _cache_location = CACHE_BACKENDS.get(CACHE_BACKEND, (CACHE_BACKEND, ''))
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join('/app/data', 'db.sqlite3'),
+        'BACKEND': _cache_backend,
+        'LOCATION': os.environ.get('CACHE_LOCATION') or _cache_location,
+        # Plusieurs instances peuvent partager un même serveur de cache
+        'KEY_PREFIX': os.environ.get('CACHE_KEY_PREFIX', ''),
     }
 }
 
+# Sessions : hors de la base de données pour que leur lecture à chaque
+# requête authentifiée (et leur écriture à la connexion) ne dispute plus le
+# verrou de SQLite aux écritures des rendez-vous.
+# - cached_db : lues dans le cache, écrites dans le cache et la base. Une
+#   session supprimée (déconnexion) doit disparaître du cache de tous les
+#   processus : seulement avec un cache partagé ;
+# - signed_cookies : tout le contenu dans un cookie signé, sans stockage
+#   côté serveur. Défaut avec un cache propre à chaque processus ;
+# - db : comportement d'origine.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND') or (
+    'cached_db' if CACHE_BACKEND in ('memcached', 'redis') else 'signed_cookies'
+)
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+SESSION_CACHE_ALIAS = os.environ.get('SESSION_CACHE_ALIAS', 'default')
+# Messages affichés après chaque action : dans un cookie, jamais en session
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+DASHBOARD_CACHE_ALIAS = os.environ.get('DASHBOARD_CACHE_ALIAS', 'default')
+DASHBOARD_CACHE_TIMEOUT = int(os.environ.get('DASHBOARD_CACHE_TIMEOUT', 3600))
+
+# Fragments HTML du calendrier et de la liste des rendez-vous (scheduling.fragments).
+# Ils sont invalidés par version : la durée de vie ne sert qu'à libérer la place.
+FRAGMENT_CACHE_ALIAS = os.environ.get('FRAGMENT_CACHE_ALIAS', 'default')
+FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('FRAGMENT_CACHE_TIMEOUT', 86400))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -80,7 +196,26 @@ USE_I18N = True
 USE_TZ = True
 
 STATIC_URL = '/static/'
-STATIC_ROOT = os.path.join(BASE_DIR, 'static')
+STATIC_ROOT = os.environ.get('STATIC_ROOT', os.path.join(BASE_DIR, 'static'))
+# JS de l'application, puis CSS compilée et bibliothèques copiées par
+# `npm run build` (frontend/) dans build/assets, hors du code monté en
+# développement par docker-stack.yml
+STATICFILES_DIRS = [
+    os.path.join(BASE_DIR, 'assets'),
+    os.path.join(BASE_DIR.parent, 'build', 'assets'),
+]
+
+# collectstatic ajoute une empreinte du contenu au nom de chaque fichier, ce
+# qui permet à nginx de les mettre en cache indéfiniment, et écrit leurs
+# variantes compressées .gz/.br
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'my_driving_school.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
@@ -88,6 +223,12 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'accounts.User'
 
+# L'utilisateur de la session est chargé avec son profil d'élève ou
+# d'instructeur (une requête au lieu de deux, voir accounts/backends.py)
+AUTHENTICATION_BACKENDS = ['accounts.backends.ProfileBackend']
+# Page de connexion des visiteurs renvoyés par role_required
+LOGIN_URL = 'login'
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
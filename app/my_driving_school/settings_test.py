@@ -0,0 +1,9 @@
+# Réglages des tests : `manage.py test --settings=my_driving_school.settings_test`
+from my_driving_school.settings import *  # noqa: F401,F403
+from my_driving_school.settings import DATABASES
+
+# Réplica miroir de la base de test (seconde connexion vers la même base),
+# pour que les tests du routage (my_driving_school/tests.py) observent les
+# lectures envoyées aux réplicas. Elle n'en reçoit que dans les tests qui
+# l'ajoutent à REPLICA_DATABASES.
+DATABASES.setdefault('replica1', {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}})
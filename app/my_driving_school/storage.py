@@ -0,0 +1,47 @@
+import gzip
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - variantes .br facultatives
+    brotli = None
+
+# Les polices woff2, les images et les archives sont déjà compressées
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.map', '.ttf', '.eot', '.otf')
+# En dessous, l'en-tête de compression coûte plus qu'il ne fait gagner
+MIN_SIZE = 512
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage qui écrit, à côté de chaque fichier texte
+    versionné (nom avec empreinte), ses variantes .gz et .br. nginx les sert
+    telles quelles (gzip_static) sans compresser à chaque requête.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for hashed_name in set(self.hashed_files.values()):
+            if hashed_name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self._write_compressed(hashed_name)
+
+    def _write_compressed(self, name):
+        variants = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli:
+            variants.append(('.br', lambda data: brotli.compress(data, quality=11)))
+
+        pending = [(suffix, compress) for suffix, compress in variants if not self.exists(name + suffix)]
+        if not pending:
+            # Même empreinte, même contenu : variantes d'un collectstatic précédent
+            return
+        with self.open(name) as original:
+            data = original.read()
+        if len(data) < MIN_SIZE:
+            return
+        for suffix, compress in pending:
+            compressed = compress(data)
+            if len(compressed) < len(data):
+                with open(self.path(name + suffix), 'wb') as output:
+                    output.write(compressed)
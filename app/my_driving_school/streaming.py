@@ -0,0 +1,12 @@
+from django.core.handlers.asgi import ASGIRequest
+
+# StreamingHttpResponse ne diffuse au fil de l'eau que le type d'itérateur
+# attendu par le serveur : sous ASGI, un itérateur sync est d'abord lu en
+# entier par sync_to_async(list) ; sous WSGI, un itérateur async l'est par
+# async_to_sync. Les contenus en flux (exports, iCalendar) sont donc produits
+# par un générateur async (aiterator) ou sync (iterator) selon la requête.
+
+
+def serves_async(request):
+    """Vrai si la réponse à `request` est envoyée par le serveur ASGI."""
+    return isinstance(request, ASGIRequest)
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections
+
+# Sans collectstatic, pas de manifeste des fichiers statiques
+TEST_STORAGES = {**settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}}
+
+
+async def asgi_get(path, cookie='', trace=None):
+    """
+    Envoie GET `path` au gestionnaire ASGI de production (pas au client de
+    test, qui ne passe pas par l'envoi de la réponse) et retourne les messages
+    envoyés au serveur. Chaque message est aussi ajouté à `trace`, pour
+    situer l'envoi du contenu par rapport au travail de la vue.
+    """
+    path, _, query_string = path.partition('?')
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query_string.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 50000),
+        'server': ('testserver', 80),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+        if trace is not None:
+            trace.append(message)
+
+    # Comme le client de test : la connexion porte la transaction du test
+    request_started.disconnect(close_old_connections)
+    request_finished.disconnect(close_old_connections)
+    try:
+        await ASGIHandler()(scope, receive, send)
+    finally:
+        request_started.connect(close_old_connections)
+        request_finished.connect(close_old_connections)
+    return messages
+
+
+def response_body(messages):
+    return b''.join(message.get('body', b'') for message in messages if message['type'] == 'http.response.body')
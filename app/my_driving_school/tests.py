@@ -0,0 +1,160 @@
+from datetime import timedelta
+from unittest import skipUnless
+from django.conf import settings
+from django.db import connections, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import User, Student, Instructor
+from my_driving_school.db_router import ReplicaRouter, primary_reads, use_replica
+from my_driving_school.pagination import _encode_cursor, apaginate_keyset, paginate_keyset
+from my_driving_school.testing import TEST_STORAGES
+from scheduling.models import Appointment
+
+
+# replica1 : miroir de la base de test déclaré par settings_test.
+HAS_TEST_REPLICA = 'replica1' in settings.DATABASES
+
+
+# TransactionTestCase : les données sont validées, donc visibles par la
+# seconde connexion
+@skipUnless(HAS_TEST_REPLICA, "réplica de test déclarée par --settings=my_driving_school.settings_test")
+@override_settings(REPLICA_DATABASES=['replica1'], STORAGES=TEST_STORAGES)
+class ReplicaRoutingTests(TransactionTestCase):
+    # Les bases des tests ignorés doivent aussi exister
+    databases = {'default', 'replica1'} if HAS_TEST_REPLICA else {'default'}
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.secretary = User.objects.create_user('secretaire', password='x', user_type='secretary')
+        self.student = Student.objects.create(
+            user=User.objects.create_user('eleve', user_type='student'), remaining_hours=10,
+        )
+        self.instructor = Instructor.objects.create(user=User.objects.create_user('moniteur', user_type='instructor'))
+
+    def read_db(self):
+        return self.router.db_for_read(Appointment)
+
+    def get_counting_queries(self, path):
+        """GET `path` et retourne (réponse, requêtes sur la base principale, requêtes sur la réplica)."""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica1']) as replica:
+            response = self.client.get(path)
+        return response, len(primary), len(replica)
+
+    def test_reads_stay_on_primary_outside_replica_views(self):
+        self.assertEqual(self.read_db(), 'default')
+
+    def test_use_replica_reads_from_replica(self):
+        use_replica(lambda request: self.assertEqual(self.read_db(), 'replica1'))(None)
+
+    def test_primary_reads_inside_replica_view(self):
+        def view(request):
+            with primary_reads():
+                self.assertEqual(self.read_db(), 'default')
+            self.assertEqual(self.read_db(), 'replica1')
+
+        use_replica(view)(None)
+
+    def test_write_pins_rest_of_view_to_primary(self):
+        def view(request):
+            self.router.db_for_write(Appointment)
+            self.assertEqual(self.read_db(), 'default')
+
+        use_replica(view)(None)
+
+    def test_transaction_reads_from_primary(self):
+        def view(request):
+            with transaction.atomic():
+                self.assertEqual(self.read_db(), 'default')
+
+        use_replica(view)(None)
+
+    def test_post_pins_following_reads_to_primary(self):
+        self.client.login(username='secretaire', password='x')
+        response, primary, replica = self.get_counting_queries(reverse('purchase_history'))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(replica, 0)
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+        response = self.client.post(reverse('appointment_create'), {
+            'student': self.student.pk, 'instructor': self.instructor.pk,
+            'date': (timezone.now().date() + timedelta(days=7)).isoformat(),
+            'start_time': '09:00', 'duration': 1, 'location': 'Centre',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Appointment.objects.exists())
+        self.assertEqual(response.cookies[settings.REPLICA_PIN_COOKIE]['max-age'], settings.REPLICA_PIN_SECONDS)
+
+        # Le client de test renvoie le cookie : plus aucune lecture sur la réplica
+        for name in ('purchase_history', 'appointment_list'):
+            response, primary, replica = self.get_counting_queries(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            self.assertGreater(primary, 0)
+            self.assertEqual(replica, 0)
+
+
+class KeysetPaginationTests(TestCase):
+    # Ordre mixte avec des noms en double : seul l'id départage
+    ORDERING = ['-last_name', 'first_name', 'id']
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(7):
+            User.objects.create_user(f'user{index}', last_name='Martin' if index % 2 else 'Durand', first_name='Léa')
+        cls.expected = list(User.objects.order_by(*cls.ORDERING).values_list('pk', flat=True))
+
+    def page(self, cursor=None):
+        request = RequestFactory().get('/', {'cursor': cursor, 'q': 'x'} if cursor else {'q': 'x'})
+        return paginate_keyset(User.objects.all(), request, self.ORDERING, per_page=3)
+
+    @staticmethod
+    def pks(page):
+        return [user.pk for user in page]
+
+    def test_forward_and_back_through_duplicate_keys(self):
+        pages = [self.page()]
+        while pages[-1].has_next:
+            pages.append(self.page(pages[-1].next_cursor))
+        self.assertEqual([pk for page in pages for pk in self.pks(page)], self.expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertFalse(pages[0].has_previous)
+
+        # Retour en arrière depuis la dernière page : mêmes pages
+        page = pages[-1]
+        for previous in reversed(pages[:-1]):
+            page = self.page(page.prev_cursor)
+            self.assertEqual(self.pks(page), self.pks(previous))
+        self.assertFalse(page.has_previous)
+
+    def test_last_page_has_no_next(self):
+        # Curseur posé sur l'avant-dernier : un seul résultat reste
+        before_last = User.objects.get(pk=self.expected[-2])
+        page = self.page(_encode_cursor('next', [before_last.last_name, before_last.first_name, before_last.pk]))
+        self.assertEqual(self.pks(page), self.expected[-1:])
+        self.assertFalse(page.has_next)
+        self.assertTrue(page.has_previous)
+        self.assertIsNone(page.next_cursor)
+
+    def test_links_keep_the_query_string(self):
+        page = self.page()
+        self.assertEqual(page.next_query, f'q=x&cursor={page.next_cursor}')
+
+    def test_invalid_cursor_starts_over(self):
+        first = self.pks(self.page())
+        for cursor in (
+            'pas-un-curseur', '!!!', _encode_cursor('sideways', ['Martin', 'Léa', 1]),
+            _encode_cursor('next', ['Martin', 1]), _encode_cursor('next', ['Martin', 'Léa', 'abc']),
+        ):
+            page = self.page(cursor)
+            self.assertEqual(self.pks(page), first, cursor)
+            self.assertFalse(page.has_previous)
+
+    async def test_async_variant_matches(self):
+        request = RequestFactory().get('/')
+        first = await apaginate_keyset(User.objects.all(), request, self.ORDERING, per_page=3)
+        request = RequestFactory().get('/', {'cursor': first.next_cursor})
+        second = await apaginate_keyset(User.objects.all(), request, self.ORDERING, per_page=3)
+        self.assertEqual(self.pks(first) + self.pks(second), self.expected[:6])
+        self.assertTrue(second.has_previous and second.has_next)
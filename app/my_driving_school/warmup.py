@@ -0,0 +1,50 @@
+import os
+import time
+from django.apps import apps
+from django.conf import settings
+from django.template import engines
+from django.urls import reverse
+
+
+def _project_templates(engine):
+    # Templates du projet uniquement, pas ceux de Django ni de l'admin
+    for directory in engine.template_dirs:
+        if not str(directory).startswith(str(settings.BASE_DIR)):
+            continue
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if filename.endswith('.html'):
+                    yield os.path.relpath(os.path.join(root, filename), directory)
+
+
+def warm_up():
+    """
+    Charge à l'avance ce que Django construit paresseusement à la première
+    requête : résolveur d'URL, métadonnées des modèles et templates compilés
+    (gardés par le loader en cache). Appelée dans le processus maître de
+    gunicorn avant le fork, elle évite à chaque worker de refaire ce travail
+    et partage la mémoire entre eux.
+
+    Ne touche pas à la base de données. Renvoie la durée de chaque étape et
+    le nombre de templates chargés.
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    reverse('home')
+    timings['urls'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for model in apps.get_models():
+        model._meta.get_fields()
+    timings['models'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    count = 0
+    for engine in engines.all():
+        for name in _project_templates(engine):
+            engine.get_template(name)
+            count += 1
+    timings['templates'] = time.perf_counter() - start
+    timings['template_count'] = count
+    return timings
@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 class SchedulingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'scheduling'
\ No newline at end of file
+    name = 'scheduling'
+
+    def ready(self):
+        # Branche l'invalidation du cache des fragments du calendrier
+        from scheduling import fragments  # noqa: F401
@@ -0,0 +1,78 @@
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from scheduling.models import Appointment, InstructorDayOccupancy
+
+# Plage horaire dans laquelle des créneaux sont proposés, du lundi au samedi
+OPENING_TIME = time(8)
+CLOSING_TIME = time(20)
+OPEN_WEEKDAYS = range(6)
+
+SLOT_MINUTES = InstructorDayOccupancy.SLOT_MINUTES
+FULL_DAY = (1 << InstructorDayOccupancy.SLOTS_PER_DAY) - 1
+
+
+def _slot_time(index):
+    minutes = index * SLOT_MINUTES
+    return time(minutes // 60, minutes % 60)
+
+
+def _slot_index(value):
+    return (value.hour * 60 + value.minute) // SLOT_MINUTES
+
+
+def _fits(free, length):
+    """Bits de départ à partir desquels `length` quarts d'heure consécutifs sont libres."""
+    starts = free
+    for shift in range(1, length):
+        starts &= free >> shift
+    return starts
+
+
+def find_free_slots(instructor_id, student_id, duration, date_from, date_to, limit=5, now=None):
+    """
+    Retourne jusqu'à `limit` créneaux libres de `duration` heures, pour
+    l'instructeur et l'élève à la fois, entre `date_from` et `date_to`
+    inclus, sous forme de tuples (date, start_time, end_time).
+
+    L'occupation de l'instructeur vient des bitmaps journalières et celle de
+    l'élève est calculée à partir de ses rendez-vous sur la période : deux
+    requêtes au total, puis la recherche se fait par opérations bit à bit.
+    Les créneaux proposés ne se chevauchent pas entre eux.
+    """
+    now = timezone.localtime(now or timezone.now())
+    date_from = max(date_from, now.date())
+    length = duration * 60 // SLOT_MINUTES
+    if limit <= 0 or length <= 0 or date_from > date_to:
+        return []
+
+    instructor_masks = {
+        occupancy.date: occupancy.mask
+        for occupancy in InstructorDayOccupancy.objects.filter(
+            instructor_id=instructor_id, date__range=(date_from, date_to)
+        )
+    }
+    student_masks = {}
+    for date, start_time, end_time in Appointment.objects.filter(
+        student_id=student_id, date__range=(date_from, date_to)
+    ).values_list('date', 'start_time', 'end_time').order_by():
+        student_masks[date] = student_masks.get(date, 0) | InstructorDayOccupancy.slot_mask(start_time, end_time)
+
+    opening_hours = InstructorDayOccupancy.slot_mask(OPENING_TIME, CLOSING_TIME)
+    slots = []
+    day = date_from
+    while day <= date_to and len(slots) < limit:
+        if day.weekday() in OPEN_WEEKDAYS:
+            free = opening_hours & ~instructor_masks.get(day, 0) & ~student_masks.get(day, 0)
+            if day == now.date():
+                # Pas de créneau déjà commencé
+                free &= FULL_DAY << (_slot_index(now.time()) + 1)
+            starts = _fits(free, length)
+            while starts and len(slots) < limit:
+                first = (starts & -starts).bit_length() - 1
+                start_time = _slot_time(first)
+                end_time = (datetime.combine(day, start_time) + timedelta(hours=duration)).time()
+                slots.append((day, start_time, end_time))
+                # Le créneau suivant commence après la fin de celui-ci
+                starts &= FULL_DAY << (first + length)
+        day += timedelta(days=1)
+    return slots
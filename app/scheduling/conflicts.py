@@ -0,0 +1,153 @@
+from collections import defaultdict
+from django.db.models import Q
+from scheduling.models import Appointment
+
+
+class SlotTaken(Exception):
+    """Créneau réservé par une requête concurrente entre la vérification et l'enregistrement."""
+
+    def __init__(self, conflicts):
+        super().__init__(conflicts)
+        # {date: SlotConflict} des rendez-vous en conflit
+        self.conflicts = conflicts
+
+    def messages(self):
+        return list(dict.fromkeys(
+            message for conflict in self.conflicts.values() for message in conflict.messages()
+        ))
+
+
+class SlotConflict:
+    """Résultat d'une vérification de disponibilité pour un créneau."""
+
+    def __init__(self, instructor=False, student=False):
+        self.instructor = instructor
+        self.student = student
+
+    def __bool__(self):
+        return self.instructor or self.student
+
+    def __repr__(self):
+        return f"SlotConflict(instructor={self.instructor}, student={self.student})"
+
+    def messages(self):
+        errors = []
+        if self.instructor:
+            errors.append("L'instructeur a déjà un rendez-vous prévu dans cette plage horaire.")
+        if self.student:
+            errors.append("L'élève a déjà un rendez-vous prévu dans cette plage horaire.")
+        return errors
+
+
+def _overlaps(start_a, end_a, start_b, end_b):
+    return start_a < end_b and end_a > start_b
+
+
+def find_conflict(instructor_id, student_id, date, start_time, end_time, exclude_pk=None):
+    """
+    Vérifie en une seule requête si le créneau chevauche un rendez-vous
+    existant de l'instructeur ou de l'élève.
+
+    La requête s'appuie sur les index (instructor, date, start_time) et
+    (student, date, start_time) de Appointment.
+    """
+    overlapping = Appointment.objects.filter(
+        Q(instructor_id=instructor_id) | Q(student_id=student_id),
+        date=date,
+        start_time__lt=end_time,
+        end_time__gt=start_time,
+    )
+    if exclude_pk is not None:
+        overlapping = overlapping.exclude(pk=exclude_pk)
+
+    conflict = SlotConflict()
+    for appt_instructor_id, appt_student_id in overlapping.values_list('instructor_id', 'student_id'):
+        if appt_instructor_id == instructor_id:
+            conflict.instructor = True
+        if appt_student_id == student_id:
+            conflict.student = True
+    return conflict
+
+
+def find_conflicts_batch(slots, exclude_pks=None, check_between_slots=True):
+    """
+    Vérifie un lot de créneaux candidats en une seule requête.
+
+    `slots` est une liste de tuples (instructor_id, student_id, date,
+    start_time, end_time). Retourne une liste de SlotConflict dans le même
+    ordre. Si `check_between_slots` est vrai, les créneaux du lot sont aussi
+    comparés entre eux (utile pour une réservation groupée).
+    """
+    conflicts = [SlotConflict() for _ in slots]
+    if not slots:
+        return conflicts
+
+    instructor_ids = {slot[0] for slot in slots}
+    student_ids = {slot[1] for slot in slots}
+    dates = {slot[2] for slot in slots}
+
+    existing = Appointment.objects.filter(
+        Q(instructor_id__in=instructor_ids) | Q(student_id__in=student_ids),
+        date__in=dates,
+    )
+    if exclude_pks:
+        existing = existing.exclude(pk__in=exclude_pks)
+
+    # Regroupement en mémoire par (instructeur, date) et (élève, date)
+    by_instructor = defaultdict(list)
+    by_student = defaultdict(list)
+    for appt_instructor_id, appt_student_id, appt_date, appt_start, appt_end in existing.values_list(
+        'instructor_id', 'student_id', 'date', 'start_time', 'end_time'
+    ).order_by():
+        by_instructor[(appt_instructor_id, appt_date)].append((appt_start, appt_end))
+        by_student[(appt_student_id, appt_date)].append((appt_start, appt_end))
+
+    for index, (instructor_id, student_id, date, start_time, end_time) in enumerate(slots):
+        conflict = conflicts[index]
+        conflict.instructor = any(
+            _overlaps(start_time, end_time, other_start, other_end)
+            for other_start, other_end in by_instructor.get((instructor_id, date), ())
+        )
+        conflict.student = any(
+            _overlaps(start_time, end_time, other_start, other_end)
+            for other_start, other_end in by_student.get((student_id, date), ())
+        )
+
+        # Un créneau rejeté ne sera pas réservé : il ne bloque pas les suivants
+        if check_between_slots and not conflict:
+            by_instructor[(instructor_id, date)].append((start_time, end_time))
+            by_student[(student_id, date)].append((start_time, end_time))
+
+    return conflicts
+
+
+def ensure_no_conflict(appointments):
+    """
+    Revérifie, dans la transaction qui vient de les enregistrer, que les
+    rendez-vous ne chevauchent aucun autre rendez-vous de leur instructeur ou
+    de leur élève, et lève SlotTaken sinon pour l'annuler.
+
+    À appeler après Appointment.touch_schedules (fait par le signal post_save
+    de Appointment) : cette mise à jour verrouille les lignes de l'élève et de
+    l'instructeur jusqu'à la fin de la transaction. Deux réservations
+    concurrentes pour une même personne se vérifient donc l'une après
+    l'autre, et la seconde voit le rendez-vous de la première. SQLite, sans
+    verrou de ligne, n'accepte de toute façon qu'une transaction d'écriture
+    à la fois.
+    """
+    conflicts = find_conflicts_batch(
+        [
+            (appointment.instructor_id, appointment.student_id, appointment.date,
+             appointment.start_time, appointment.end_time)
+            for appointment in appointments
+        ],
+        exclude_pks=[appointment.pk for appointment in appointments],
+        check_between_slots=False,
+    )
+    taken = {
+        appointment.date: conflict
+        for appointment, conflict in zip(appointments, conflicts)
+        if conflict
+    }
+    if taken:
+        raise SlotTaken(taken)
@@ -0,0 +1,107 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from accounts.models import User
+from scheduling.models import Appointment
+from my_driving_school.cache_versions import bump, abump
+from my_driving_school.db_router import primary_reads
+
+# Fragments HTML du calendrier et de la liste des rendez-vous, partagés par
+# tous les utilisateurs qui regardent le même périmètre. Comme pour les
+# compteurs de la page d'accueil, chaque entrée garde les versions avec
+# lesquelles elle a été rendue : une écriture incrémente ces versions et
+# l'entrée est refaite à la lecture suivante, sur toutes les instances qui
+# partagent le cache. La durée de vie ne sert qu'à libérer la place.
+#
+# - la version globale change à chaque modification d'un rendez-vous ;
+# - la version d'un instructeur, à chaque modification de l'un des siens ;
+# - la version commune, quand un nom affiché change (ou après un chargement
+#   en masse) : elle entre dans tous les fragments.
+GLOBAL_VERSION_KEY = 'fragments:version:global'
+COMMON_VERSION_KEY = 'fragments:version:common'
+
+
+def _cache():
+    return caches[settings.FRAGMENT_CACHE_ALIAS]
+
+
+def _instructor_version_key(instructor_id):
+    return f'fragments:version:instructor:{instructor_id}'
+
+
+def viewer_scope(role, instructor_id=None):
+    """
+    Périmètre (nom, clé de version) des rendez-vous vus par `role` : ses
+    propres rendez-vous, ceux d'un instructeur (filtre du personnel) ou tous.
+    """
+    if role.is_student:
+        # Les rendez-vous d'un élève concernent plusieurs instructeurs
+        return f'student:{role.user.pk}', GLOBAL_VERSION_KEY
+    if role.is_instructor:
+        instructor_id = role.instructor.pk
+        return f'instructor:{instructor_id}', _instructor_version_key(instructor_id)
+    if instructor_id:
+        return f'staff:instructor:{instructor_id}', _instructor_version_key(instructor_id)
+    return 'staff', GLOBAL_VERSION_KEY
+
+
+async def get_fragment(name, scope, parts, render):
+    """
+    Retourne le fragment `name` du périmètre `scope` ; `parts` distingue les
+    variantes (période, page, jour courant...). Sur un défaut de cache, la
+    coroutine `render()` le calcule. Les versions sont lues avant le rendu :
+    une écriture concurrente le rend aussitôt périmé.
+    """
+    cache = _cache()
+    scope_name, version_key = scope
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    fragment_key = f'fragments:{name}:{scope_name}:{digest}'
+    version_keys = [version_key, COMMON_VERSION_KEY]
+
+    cached = await cache.aget_many([fragment_key, *version_keys])
+    for key in version_keys:
+        if key not in cached:
+            await abump(cache, key)
+            cached[key] = await cache.aget(key)
+    versions = tuple(cached[key] for key in version_keys)
+
+    entry = cached.get(fragment_key)
+    if entry and entry['version'] == versions:
+        return entry['html']
+
+    # Calculé sur la base principale : lu juste après une écriture, un
+    # fragment rendu depuis une réplica en retard resterait périmé pour tous
+    with primary_reads():
+        html = await render()
+    await cache.aset(fragment_key, {'version': versions, 'html': html}, settings.FRAGMENT_CACHE_TIMEOUT)
+    return html
+
+
+def invalidate_fragments(instructor_ids=(), everything=False):
+    """Périme après le commit les fragments des instructeurs donnés et globaux."""
+    keys = [GLOBAL_VERSION_KEY] + [_instructor_version_key(instructor_id) for instructor_id in instructor_ids]
+    if everything:
+        keys.append(COMMON_VERSION_KEY)
+    transaction.on_commit(lambda: bump(_cache(), keys))
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def _appointment_changed(sender, instance, **kwargs):
+    # Lors d'une modification, l'ancien instructeur perd le rendez-vous
+    loaded = getattr(instance, '_loaded_values', {})
+    invalidate_fragments({instance.instructor_id, loaded.get('instructor_id', instance.instructor_id)})
+
+
+@receiver(post_save, sender=User)
+def _user_changed(sender, instance, created=False, update_fields=None, **kwargs):
+    # Seuls les noms apparaissent dans les fragments, et un nouvel
+    # utilisateur n'a encore aucun rendez-vous
+    if created:
+        return
+    if update_fields is not None and not {'first_name', 'last_name'} & set(update_fields):
+        return
+    invalidate_fragments(everything=True)
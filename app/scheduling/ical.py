@@ -0,0 +1,101 @@
+from datetime import datetime, timezone as dt_timezone
+from django.utils import timezone
+
+PRODID = '-//My Driving School//Rendez-vous//FR'
+CHUNK_SIZE = 500
+
+
+def escape(value):
+    """Échappe un texte selon la RFC 5545 (section 3.3.11)."""
+    return (
+        str(value or '')
+        .replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+    )
+
+
+def fold(line):
+    """Replie une ligne de contenu à 75 octets, continuations préfixées d'un espace."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    limit = 75
+    while encoded:
+        # Ne pas couper au milieu d'un caractère UTF-8 multi-octets
+        cut = min(limit, len(encoded))
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+        limit = 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def format_utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _local_datetime(date, time):
+    return timezone.make_aware(datetime.combine(date, time))
+
+
+def event(appointment, summary, stamp):
+    """Lignes VEVENT d'un rendez-vous, horaires convertis en UTC."""
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:appointment-{appointment.pk}@my-driving-school',
+        f'DTSTAMP:{format_utc(stamp)}',
+        f'DTSTART:{format_utc(_local_datetime(appointment.date, appointment.start_time))}',
+        f'DTEND:{format_utc(_local_datetime(appointment.date, appointment.end_time))}',
+        f'SUMMARY:{escape(summary)}',
+        f'LOCATION:{escape(appointment.location)}',
+    ]
+    if appointment.notes:
+        lines.append(f'DESCRIPTION:{escape(appointment.notes)}')
+    lines.append('END:VEVENT')
+    return ''.join(fold(line) for line in lines)
+
+
+def _calendar_header(name):
+    return ''.join(fold(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape(name)}',
+    ))
+
+
+def stream_calendar(name, appointments, summary, stamp):
+    """
+    Génère le calendrier morceau par morceau : les rendez-vous sont lus par
+    paquets de CHUNK_SIZE avec .iterator(), la mémoire reste constante quel
+    que soit le nombre d'événements. Pour une réponse servie sous WSGI.
+    """
+    yield _calendar_header(name)
+    batch = []
+    for appointment in appointments.iterator(chunk_size=CHUNK_SIZE):
+        batch.append(event(appointment, summary(appointment), stamp))
+        if len(batch) == CHUNK_SIZE:
+            yield ''.join(batch)
+            batch = []
+    batch.append('END:VCALENDAR\r\n')
+    yield ''.join(batch)
+
+
+async def astream_calendar(name, appointments, summary, stamp):
+    """Équivalent de stream_calendar avec .aiterator(), pour une réponse servie sous ASGI."""
+    yield _calendar_header(name)
+    batch = []
+    async for appointment in appointments.aiterator(chunk_size=CHUNK_SIZE):
+        batch.append(event(appointment, summary(appointment), stamp))
+        if len(batch) == CHUNK_SIZE:
+            yield ''.join(batch)
+            batch = []
+    batch.append('END:VCALENDAR\r\n')
+    yield ''.join(batch)
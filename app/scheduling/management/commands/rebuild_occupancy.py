@@ -0,0 +1,26 @@
+from collections import defaultdict
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from scheduling.models import Appointment, InstructorDayOccupancy
+
+
+class Command(BaseCommand):
+    help = "Reconstruit entièrement l'occupation journalière des instructeurs à partir des rendez-vous"
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        masks = defaultdict(int)
+
+        appointments = Appointment.objects.values_list('instructor_id', 'date', 'start_time', 'end_time').order_by()
+        for instructor_id, date, start_time, end_time in appointments.iterator(chunk_size=2000):
+            masks[(instructor_id, date)] |= InstructorDayOccupancy.slot_mask(start_time, end_time)
+
+        occupancies = [
+            InstructorDayOccupancy(instructor_id=instructor_id, date=date, bitmap=InstructorDayOccupancy.to_bitmap(mask))
+            for (instructor_id, date), mask in masks.items()
+        ]
+
+        InstructorDayOccupancy.objects.all().delete()
+        InstructorDayOccupancy.objects.bulk_create(occupancies, batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(f"{len(occupancies)} journées d'occupation reconstruites."))
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import defaultdict
+
+
+def populate_occupancy(apps, schema_editor):
+    Appointment = apps.get_model('scheduling', 'Appointment')
+    InstructorDayOccupancy = apps.get_model('scheduling', 'InstructorDayOccupancy')
+    
+    masks = defaultdict(int)
+    for instructor_id, date, start_time, end_time in Appointment.objects.values_list('instructor_id', 'date', 'start_time', 'end_time').iterator():
+        first = (start_time.hour * 60 + start_time.minute) // 15
+        last = -(-(end_time.hour * 60 + end_time.minute) // 15)
+        if last <= first:
+            last = 96
+        masks[(instructor_id, date)] |= ((1 << (last - first)) - 1) << first
+    
+    InstructorDayOccupancy.objects.bulk_create([
+        InstructorDayOccupancy(instructor_id=instructor_id, date=date, bitmap=mask.to_bytes(12, 'little'))
+        for (instructor_id, date), mask in masks.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_hour_transaction'),
+        ('scheduling', '0002_appointment_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstructorDayOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('bitmap', models.BinaryField(max_length=12)),
+                ('instructor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_occupancies', to='accounts.instructor')),
+            ],
+            options={
+                'ordering': ['instructor', 'date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='instructordayoccupancy',
+            constraint=models.UniqueConstraint(fields=('instructor', 'date'), name='unique_instructor_day_occupancy'),
+        ),
+        migrations.RunPython(populate_occupancy, migrations.RunPython.noop),
+    ]
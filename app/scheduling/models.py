@@ -1,4 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
 from accounts.models import Student, Instructor
 
 class Appointment(models.Model):
@@ -13,6 +16,160 @@ class Appointment(models.Model):
     
     class Meta:
         ordering = ['date', 'start_time']
-        
+        indexes = [
+            models.Index(fields=['instructor', 'date', 'start_time'], name='appt_instructor_date_idx'),
+            models.Index(fields=['student', 'date', 'start_time'], name='appt_student_date_idx'),
+            # Planning de toute l'auto-école (secrétariat) : par date, sans filtre de personne
+            models.Index(fields=['date', 'start_time'], name='appt_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"RDV: {self.student} avec {self.instructor} le {self.date} à {self.start_time}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valeurs chargées, pour retrouver l'ancien créneau lors d'une modification
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    @staticmethod
+    def touch_schedules(student_ids, instructor_ids):
+        """Date le dernier changement de planning des profils (flux iCalendar)."""
+        now = timezone.now()
+        Student.objects.filter(pk__in=student_ids).update(schedule_updated_at=now)
+        Instructor.objects.filter(pk__in=instructor_ids).update(schedule_updated_at=now)
+
+    def save(self, *args, **kwargs):
+        # Le rendez-vous et l'occupation recalculée par _appointment_saved
+        # sont enregistrés ensemble. Sans point de sauvegarde dans une
+        # transaction déjà ouverte (réservation) : un échec l'annule en entier
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+        self._loaded_values = {'student_id': self.student_id, 'instructor_id': self.instructor_id, 'date': self.date}
+
+
+class InstructorDayOccupancy(models.Model):
+    """
+    Occupation d'un instructeur sur une journée, par quarts d'heure : le bit i
+    correspond au quart d'heure commençant à i * 15 minutes après minuit.
+    Une journée sans rendez-vous n'a pas de ligne. Maintenue par les signaux
+    post_save/post_delete des rendez-vous (suppressions en cascade et
+    QuerySet.delete() comprises) ; après un QuerySet.update() ou un
+    chargement de fixtures, la reconstruire avec `rebuild_occupancy`.
+    """
+    SLOT_MINUTES = 15
+    SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+    instructor = models.ForeignKey(Instructor, on_delete=models.CASCADE, related_name='day_occupancies')
+    date = models.DateField()
+    bitmap = models.BinaryField(max_length=SLOTS_PER_DAY // 8)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['instructor', 'date'], name='unique_instructor_day_occupancy'),
+        ]
+        ordering = ['instructor', 'date']
+
     def __str__(self):
-        return f"RDV: {self.student} avec {self.instructor} le {self.date} à {self.start_time}"
\ No newline at end of file
+        return f"Occupation de {self.instructor_id} le {self.date}"
+
+    @property
+    def mask(self):
+        return int.from_bytes(self.bitmap, 'little')
+
+    @classmethod
+    def to_bitmap(cls, mask):
+        return mask.to_bytes(cls.SLOTS_PER_DAY // 8, 'little')
+
+    @classmethod
+    def slot_mask(cls, start_time, end_time):
+        """Bits des quarts d'heure touchés par le créneau [start_time, end_time)."""
+        first = (start_time.hour * 60 + start_time.minute) // cls.SLOT_MINUTES
+        last = -(-(end_time.hour * 60 + end_time.minute) // cls.SLOT_MINUTES)
+        # Un créneau qui se termine à minuit (ou au-delà) occupe la fin de journée
+        if last <= first:
+            last = cls.SLOTS_PER_DAY
+        return ((1 << (last - first)) - 1) << first
+
+    @classmethod
+    def refresh(cls, instructor_id, date):
+        """
+        Recalcule l'occupation d'une journée à partir des rendez-vous, en deux
+        requêtes : lecture des rendez-vous, puis écriture (insertion ou mise à
+        jour en une instruction) ou suppression de la ligne.
+
+        Les recalculs concurrents d'une même journée sont sérialisés par le
+        verrou que pose Appointment.touch_schedules sur l'instructeur, appelé
+        avant par les signaux des rendez-vous.
+        """
+        mask = 0
+        for start_time, end_time in Appointment.objects.filter(
+            instructor_id=instructor_id, date=date
+        ).values_list('start_time', 'end_time').order_by():
+            mask |= cls.slot_mask(start_time, end_time)
+        if not mask:
+            # Dernier rendez-vous du jour supprimé, éventuellement avec
+            # l'instructeur lui-même (suppression en cascade)
+            cls.objects.filter(instructor_id=instructor_id, date=date).delete()
+            return
+        cls.objects.bulk_create(
+            [cls(instructor_id=instructor_id, date=date, bitmap=cls.to_bitmap(mask))],
+            update_conflicts=True, unique_fields=['instructor', 'date'], update_fields=['bitmap'],
+        )
+
+    @classmethod
+    def add(cls, appointments):
+        """
+        Ajoute des rendez-vous nouvellement créés (par bulk_create, qui
+        n'appelle pas save()) à l'occupation de leurs journées, en trois
+        requêtes quel que soit leur nombre.
+        """
+        masks = {}
+        for appointment in appointments:
+            key = (appointment.instructor_id, appointment.date)
+            masks[key] = masks.get(key, 0) | cls.slot_mask(appointment.start_time, appointment.end_time)
+        if not masks:
+            return
+
+        with transaction.atomic():
+            cls.objects.bulk_create([
+                cls(instructor_id=instructor_id, date=date, bitmap=cls.to_bitmap(0))
+                for instructor_id, date in masks
+            ], ignore_conflicts=True)
+            instructor_ids = {instructor_id for instructor_id, _ in masks}
+            dates = {date for _, date in masks}
+            occupancies = [
+                occupancy
+                for occupancy in cls.objects.select_for_update().filter(instructor_id__in=instructor_ids, date__in=dates)
+                if (occupancy.instructor_id, occupancy.date) in masks
+            ]
+            for occupancy in occupancies:
+                occupancy.bitmap = cls.to_bitmap(occupancy.mask | masks[(occupancy.instructor_id, occupancy.date)])
+            cls.objects.bulk_update(occupancies, ['bitmap'])
+
+
+@receiver(post_save, sender=Appointment)
+def _appointment_saved(sender, instance, raw=False, **kwargs):
+    # Fixtures : occupation reconstruite ensuite par rebuild_occupancy
+    if raw:
+        return
+    loaded = getattr(instance, '_loaded_values', {})
+    # En premier : verrouille l'élève et l'instructeur jusqu'à la fin de la
+    # transaction (voir conflicts.ensure_no_conflict)
+    Appointment.touch_schedules(
+        {instance.student_id, loaded.get('student_id', instance.student_id)},
+        {instance.instructor_id, loaded.get('instructor_id', instance.instructor_id)},
+    )
+    previous_day = (loaded.get('instructor_id'), loaded.get('date'))
+    InstructorDayOccupancy.refresh(instance.instructor_id, instance.date)
+    if None not in previous_day and previous_day != (instance.instructor_id, instance.date):
+        InstructorDayOccupancy.refresh(*previous_day)
+
+
+@receiver(post_delete, sender=Appointment)
+def _appointment_deleted(sender, instance, **kwargs):
+    # Aussi appelé pour QuerySet.delete() et les suppressions en cascade
+    # d'un élève ou d'un instructeur, qui n'appellent pas delete()
+    Appointment.touch_schedules([instance.student_id], [instance.instructor_id])
+    InstructorDayOccupancy.refresh(instance.instructor_id, instance.date)
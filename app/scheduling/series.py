@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+from django.db import transaction
+from accounts import ledger
+from accounts.dashboard import invalidate_dashboards
+from scheduling.fragments import invalidate_fragments
+from scheduling.conflicts import ensure_no_conflict, find_conflicts_batch
+from scheduling.models import Appointment, InstructorDayOccupancy
+
+# Nombre de semaines entre deux leçons d'une série
+FREQUENCIES = {
+    'weekly': 1,
+    'biweekly': 2,
+}
+MAX_OCCURRENCES = 52
+
+
+class Occurrence:
+    """Une leçon candidate d'une série, avec son éventuel conflit."""
+
+    def __init__(self, date, start_time, end_time, conflict=None):
+        self.date = date
+        self.start_time = start_time
+        self.end_time = end_time
+        self.conflict = conflict
+
+    @property
+    def is_free(self):
+        return not self.conflict
+
+
+def plan_series(student, instructor, first_date, start_time, duration, frequency, count):
+    """
+    Calcule les `count` occurrences d'une série et les vérifie toutes contre
+    les rendez-vous existants de l'instructeur et de l'élève en une requête.
+    """
+    end_time = (datetime.combine(first_date, start_time) + timedelta(hours=duration)).time()
+    step = timedelta(weeks=FREQUENCIES[frequency])
+    occurrences = [
+        Occurrence(first_date + index * step, start_time, end_time)
+        for index in range(count)
+    ]
+    conflicts = find_conflicts_batch([
+        (instructor.id, student.id, occurrence.date, occurrence.start_time, occurrence.end_time)
+        for occurrence in occurrences
+    ])
+    for occurrence, conflict in zip(occurrences, conflicts):
+        occurrence.conflict = conflict
+    return occurrences
+
+
+def book_series(student, instructor, occurrences, duration, location, notes=''):
+    """
+    Réserve les occurrences données dans une seule transaction : un seul
+    débit d'heures pour toute la série, puis insertion groupée des rendez-vous.
+    Lève ledger.InsufficientHours si le solde ne couvre pas la série, et
+    conflicts.SlotTaken si une occurrence a été prise depuis plan_series :
+    rien n'est alors réservé.
+    """
+    appointments = [
+        Appointment(
+            student=student,
+            instructor=instructor,
+            date=occurrence.date,
+            start_time=occurrence.start_time,
+            end_time=occurrence.end_time,
+            location=location,
+            duration=duration,
+            notes=notes,
+        )
+        for occurrence in occurrences
+    ]
+    if not appointments:
+        return appointments
+
+    first, last = appointments[0], appointments[-1]
+    with transaction.atomic():
+        ledger.debit(
+            student.id, duration * len(appointments), 'booking',
+            f"Série de {len(appointments)} rendez-vous du {first.date:%d/%m/%Y} au {last.date:%d/%m/%Y} "
+            f"à {first.start_time:%H:%M}"
+        )
+        Appointment.objects.bulk_create(appointments)
+        # bulk_create n'appelle pas save() ni les signaux : mettre à jour les
+        # plannings (ce qui verrouille l'élève et l'instructeur), revérifier
+        # les conflits, puis l'occupation, les compteurs de la page d'accueil
+        # et les fragments du calendrier explicitement
+        Appointment.touch_schedules([student.id], [instructor.id])
+        ensure_no_conflict(appointments)
+        InstructorDayOccupancy.add(appointments)
+        invalidate_dashboards([student.user_id, instructor.user_id], staff=True)
+        invalidate_fragments([instructor.id])
+    return appointments
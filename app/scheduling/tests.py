@@ -0,0 +1,363 @@
+import warnings
+from datetime import date, time, timedelta
+from unittest import mock
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import User, Student, Instructor, HourTransaction
+from scheduling import ical, series
+from scheduling.conflicts import SlotTaken, find_conflict, find_conflicts_batch
+from scheduling.models import Appointment, InstructorDayOccupancy
+from my_driving_school.testing import TEST_STORAGES, asgi_get, response_body
+
+# Lundi de référence : la semaine et le mois affichés sont fixes
+MONDAY = date(2030, 4, 8)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class CalendarQueryCountTests(TestCase):
+    """Le calendrier lit toute sa période en une requête, quel que soit le nombre de rendez-vous."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.secretary = User.objects.create_user('secretaire', password='x', user_type='secretary')
+        cls.students = []
+        cls.instructors = []
+        for index in range(4):
+            cls.students.append(Student.objects.create(
+                user=User.objects.create_user(f'eleve{index}', first_name='Élève', last_name=str(index), user_type='student')
+            ))
+            cls.instructors.append(Instructor.objects.create(
+                user=User.objects.create_user(f'moniteur{index}', first_name='Moniteur', last_name=str(index), user_type='instructor')
+            ))
+
+    def setUp(self):
+        self.client.force_login(self.secretary)
+
+    def add_appointments(self, count):
+        # bulk_create : ni occupation ni invalidation, inutiles ici
+        Appointment.objects.bulk_create([
+            Appointment(
+                student=self.students[index % 4],
+                instructor=self.instructors[(index // 4) % 4],
+                date=MONDAY + timedelta(days=index % 7),
+                start_time=time(8 + index % 10), end_time=time(9 + index % 10),
+                location='Centre', duration=1,
+            )
+            for index in range(count)
+        ])
+
+    def assert_calendar_queries(self, params, appointment_count):
+        self.add_appointments(appointment_count)
+        # Grille non mise en cache : la requête de la période est comptée
+        caches['default'].clear()
+        # L'utilisateur avec son profil, puis tous les rendez-vous de la période
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('calendar'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Centre - 1h', count=Appointment.objects.count())
+
+    def test_week_with_few_appointments(self):
+        self.assert_calendar_queries({'week': MONDAY.isoformat()}, 3)
+
+    def test_week_with_many_appointments(self):
+        self.assert_calendar_queries({'week': MONDAY.isoformat()}, 60)
+
+    def test_month_with_few_appointments(self):
+        self.assert_calendar_queries({'mode': 'month', 'week': MONDAY.isoformat()}, 3)
+
+    def test_month_with_many_appointments(self):
+        self.assert_calendar_queries({'mode': 'month', 'week': MONDAY.isoformat()}, 60)
+
+    def test_cached_grid_expires_on_write(self):
+        params = {'week': MONDAY.isoformat()}
+        self.assertNotContains(self.client.get(reverse('calendar'), params), 'Piste')
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.create(
+                student=self.students[0], instructor=self.instructors[0], date=MONDAY,
+                start_time=time(14), end_time=time(15), location='Piste', duration=1,
+            )
+        self.assertContains(self.client.get(reverse('calendar'), params), 'Piste - 1h')
+
+
+class OccupancyTests(TestCase):
+    """L'occupation suit les rendez-vous, y compris quand delete() n'est pas appelé."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = Instructor.objects.create(user=User.objects.create_user('moniteur', user_type='instructor'))
+        cls.students = [
+            Student.objects.create(user=User.objects.create_user(f'eleve{index}', user_type='student'))
+            for index in range(2)
+        ]
+
+    def book(self, student, hour):
+        return Appointment.objects.create(
+            student=student, instructor=self.instructor, date=MONDAY,
+            start_time=time(hour), end_time=time(hour + 1), location='Centre', duration=1,
+        )
+
+    def mask(self):
+        occupancy = InstructorDayOccupancy.objects.filter(instructor=self.instructor, date=MONDAY).first()
+        return occupancy.mask if occupancy else 0
+
+    def test_save_and_move(self):
+        appointment = self.book(self.students[0], 9)
+        self.assertEqual(self.mask(), InstructorDayOccupancy.slot_mask(time(9), time(10)))
+        appointment.date = MONDAY + timedelta(days=1)
+        appointment.save()
+        self.assertEqual(self.mask(), 0)
+
+    def test_queryset_delete(self):
+        self.book(self.students[0], 9)
+        self.book(self.students[1], 11)
+        Appointment.objects.filter(student=self.students[0]).delete()
+        self.assertEqual(self.mask(), InstructorDayOccupancy.slot_mask(time(11), time(12)))
+
+    def test_cascade_from_student(self):
+        self.book(self.students[0], 9)
+        self.book(self.students[1], 11)
+        self.students[1].user.delete()
+        self.assertEqual(self.mask(), InstructorDayOccupancy.slot_mask(time(9), time(10)))
+
+    def test_cascade_from_instructor(self):
+        self.book(self.students[0], 9)
+        self.instructor.user.delete()
+        self.assertFalse(InstructorDayOccupancy.objects.exists())
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class SeriesFormTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.secretary = User.objects.create_user('secretaire', user_type='secretary')
+        cls.student = Student.objects.create(user=User.objects.create_user('eleve', user_type='student'), remaining_hours=10)
+        cls.instructor = Instructor.objects.create(user=User.objects.create_user('moniteur', user_type='instructor'))
+
+    def test_zero_duration_until_hours_exhausted(self):
+        self.client.force_login(self.secretary)
+        response = self.client.post(reverse('appointment_series_create'), {
+            'student': self.student.pk, 'instructor': self.instructor.pk,
+            'date': MONDAY.isoformat(), 'start_time': '09:00', 'duration': 0,
+            'frequency': 'weekly', 'until_hours_exhausted': 'on', 'location': 'Centre',
+        })
+        self.assertContains(response, "Une leçon dure au moins une heure.")
+        self.assertFalse(Appointment.objects.exists())
+
+
+class ConflictTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructors = [
+            Instructor.objects.create(user=User.objects.create_user(f'moniteur{index}', user_type='instructor'))
+            for index in range(2)
+        ]
+        cls.students = [
+            Student.objects.create(user=User.objects.create_user(f'eleve{index}', user_type='student'))
+            for index in range(2)
+        ]
+        # Instructeur 0 et élève 0, de 10 h à 12 h
+        cls.booked = Appointment.objects.create(
+            student=cls.students[0], instructor=cls.instructors[0], date=MONDAY,
+            start_time=time(10), end_time=time(12), location='Centre', duration=2,
+        )
+
+    def conflict(self, instructor, student, start, end, day=MONDAY, **kwargs):
+        return find_conflict(self.instructors[instructor].id, self.students[student].id, day, start, end, **kwargs)
+
+    def test_adjacent_slots_do_not_overlap(self):
+        self.assertFalse(self.conflict(0, 0, time(8), time(10)))
+        self.assertFalse(self.conflict(0, 0, time(12), time(13)))
+
+    def test_overlapping_slots(self):
+        self.assertTrue(self.conflict(0, 1, time(9, 59), time(11)).instructor)
+        self.assertTrue(self.conflict(0, 1, time(11, 59), time(13)).instructor)
+        # Créneau qui englobe le rendez-vous
+        self.assertTrue(self.conflict(0, 1, time(9), time(13)).instructor)
+
+    def test_conflict_side(self):
+        conflict = self.conflict(1, 0, time(11), time(12))
+        self.assertEqual((conflict.instructor, conflict.student), (False, True))
+        conflict = self.conflict(0, 1, time(11), time(12))
+        self.assertEqual((conflict.instructor, conflict.student), (True, False))
+        self.assertFalse(self.conflict(1, 1, time(11), time(12)))
+        self.assertFalse(self.conflict(0, 0, time(11), time(12), day=MONDAY + timedelta(days=1)))
+
+    def test_edit_excludes_itself(self):
+        self.assertTrue(self.conflict(0, 0, time(11), time(13)))
+        self.assertFalse(self.conflict(0, 0, time(11), time(13), exclude_pk=self.booked.pk))
+
+    def test_batch_keeps_order_and_groups_by_person_and_day(self):
+        instructor = [instructor.id for instructor in self.instructors]
+        student = [student.id for student in self.students]
+        with self.assertNumQueries(1):
+            conflicts = find_conflicts_batch([
+                (instructor[1], student[1], MONDAY, time(10), time(11)),
+                (instructor[0], student[1], MONDAY, time(11), time(12)),
+                (instructor[1], student[0], MONDAY, time(8), time(10)),
+                (instructor[1], student[0], MONDAY, time(9), time(11)),
+                (instructor[0], student[0], MONDAY + timedelta(days=1), time(10), time(12)),
+            ])
+        self.assertEqual(
+            [(conflict.instructor, conflict.student) for conflict in conflicts],
+            [(False, False), (True, False), (False, False), (True, True), (False, False)],
+        )
+
+    def test_batch_between_slots(self):
+        slots = [
+            (self.instructors[1].id, self.students[1].id, MONDAY, time(14), time(16)),
+            (self.instructors[1].id, self.students[1].id, MONDAY, time(15), time(17)),
+        ]
+        self.assertEqual([bool(conflict) for conflict in find_conflicts_batch(slots)], [False, True])
+        self.assertEqual(
+            [bool(conflict) for conflict in find_conflicts_batch(slots, check_between_slots=False)],
+            [False, False],
+        )
+        # Un créneau rejeté ne bloque pas les suivants
+        slots.insert(0, (self.instructors[0].id, self.students[1].id, MONDAY, time(11), time(15)))
+        self.assertEqual([bool(conflict) for conflict in find_conflicts_batch(slots)], [True, False, True])
+
+    def test_batch_excludes_edited_appointments(self):
+        slot = (self.instructors[0].id, self.students[0].id, MONDAY, time(11), time(13))
+        self.assertTrue(find_conflicts_batch([slot])[0])
+        self.assertFalse(find_conflicts_batch([slot], exclude_pks=[self.booked.pk])[0])
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class BookingViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.secretary = User.objects.create_user('secretaire', user_type='secretary')
+        cls.student = Student.objects.create(user=User.objects.create_user('eleve', user_type='student'), remaining_hours=10)
+        cls.other = Student.objects.create(user=User.objects.create_user('autre', user_type='student'), remaining_hours=10)
+        cls.instructor = Instructor.objects.create(user=User.objects.create_user('moniteur', user_type='instructor'))
+        cls.day = timezone.now().date() + timedelta(days=7)
+
+    def setUp(self):
+        self.client.force_login(self.secretary)
+
+    def book(self, student, hour, duration=1):
+        return self.client.post(reverse('appointment_create'), {
+            'student': student.pk, 'instructor': self.instructor.pk, 'date': self.day.isoformat(),
+            'start_time': f'{hour:02d}:00', 'duration': duration, 'location': 'Centre',
+        })
+
+    def test_conflicting_booking_is_rolled_back(self):
+        self.assertEqual(self.book(self.student, 9, 2).status_code, 302)
+        response = self.book(self.other, 10)
+        self.assertContains(response, "L&#x27;instructeur a déjà un rendez-vous prévu dans cette plage horaire.")
+        self.assertFalse(Appointment.objects.filter(student=self.other).exists())
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.remaining_hours, 10)
+
+    def test_edit_may_overlap_its_own_slot(self):
+        self.book(self.student, 9, 2)
+        appointment = Appointment.objects.get()
+        response = self.client.post(reverse('appointment_edit', args=[appointment.pk]), {
+            'student': self.student.pk, 'instructor': self.instructor.pk, 'date': self.day.isoformat(),
+            'start_time': '10:00', 'duration': 2, 'location': 'Centre',
+        })
+        self.assertEqual(response.status_code, 302)
+        appointment.refresh_from_db()
+        self.assertEqual((appointment.start_time, appointment.end_time), (time(10), time(12)))
+
+    def edit_student(self, appointment, student, duration):
+        return self.client.post(reverse('appointment_edit', args=[appointment.pk]), {
+            'student': student.pk, 'instructor': self.instructor.pk, 'date': self.day.isoformat(),
+            'start_time': '09:00', 'duration': duration, 'location': 'Centre',
+        })
+
+    def test_edit_moves_hours_to_new_student(self):
+        self.book(self.student, 9, 2)
+        appointment = Appointment.objects.get()
+        self.assertEqual(self.edit_student(appointment, self.other, 3).status_code, 302)
+        self.student.refresh_from_db()
+        self.other.refresh_from_db()
+        # Ancien élève recrédité de 2 heures, nouveau débité de 3
+        self.assertEqual((self.student.remaining_hours, self.other.remaining_hours), (10, 7))
+        self.assertEqual(
+            list(HourTransaction.objects.filter(reason='booking_change').order_by('pk').values_list('student_id', 'hours')),
+            [(self.student.pk, 2), (self.other.pk, -3)],
+        )
+
+    def test_edit_to_student_without_hours_is_rolled_back(self):
+        self.book(self.student, 9, 2)
+        appointment = Appointment.objects.get()
+        Student.objects.filter(pk=self.other.pk).update(remaining_hours=1)
+        response = self.edit_student(appointment, self.other, 2)
+        self.assertContains(response, "L&#x27;élève n&#x27;a pas assez d&#x27;heures disponibles.")
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.student_id, self.student.pk)
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.remaining_hours, 8)
+        self.assertFalse(HourTransaction.objects.filter(reason='booking_change').exists())
+
+
+class SeriesBookingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = Student.objects.create(user=User.objects.create_user('eleve', user_type='student'), remaining_hours=10)
+        cls.other = Student.objects.create(user=User.objects.create_user('autre', user_type='student'), remaining_hours=10)
+        cls.instructor = Instructor.objects.create(user=User.objects.create_user('moniteur', user_type='instructor'))
+
+    def test_slot_taken_after_planning_aborts_series(self):
+        occurrences = series.plan_series(self.student, self.instructor, MONDAY, time(9), 1, 'weekly', 3)
+        self.assertTrue(all(occurrence.is_free for occurrence in occurrences))
+        # Réservation concurrente entre l'aperçu et la confirmation
+        Appointment.objects.create(
+            student=self.other, instructor=self.instructor, date=MONDAY + timedelta(weeks=1),
+            start_time=time(9, 30), end_time=time(10, 30), location='Centre', duration=1,
+        )
+        with self.assertRaises(SlotTaken) as raised:
+            series.book_series(self.student, self.instructor, occurrences, 1, 'Centre')
+        self.assertEqual(list(raised.exception.conflicts), [MONDAY + timedelta(weeks=1)])
+        self.assertFalse(Appointment.objects.filter(student=self.student).exists())
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.remaining_hours, 10)
+
+    def test_free_series_is_booked(self):
+        occurrences = series.plan_series(self.student, self.instructor, MONDAY, time(9), 2, 'biweekly', 3)
+        series.book_series(self.student, self.instructor, occurrences, 2, 'Centre')
+        self.assertEqual(Appointment.objects.filter(student=self.student).count(), 3)
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.remaining_hours, 4)
+
+
+class ICalStreamingTests(TestCase):
+    """Sous ASGI, le flux est envoyé au fil de la lecture des rendez-vous, pas chargé en mémoire."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = Instructor.objects.create(user=User.objects.create_user('moniteur', user_type='instructor'))
+        student = Student.objects.create(user=User.objects.create_user('eleve', user_type='student'))
+        Appointment.objects.bulk_create([
+            Appointment(
+                student=student, instructor=cls.instructor, date=MONDAY + timedelta(days=index),
+                start_time=time(9), end_time=time(10), location='Centre', duration=1,
+            )
+            for index in range(12)
+        ])
+
+    async def test_feed_is_streamed_under_asgi(self):
+        trace = []
+
+        def traced_event(*args):
+            trace.append('event')
+            return event(*args)
+
+        event = ical.event
+        path = reverse('instructor_ical_feed', kwargs={'token': self.instructor.calendar_token})
+        with mock.patch.object(ical, 'CHUNK_SIZE', 5), mock.patch.object(ical, 'event', traced_event), \
+                warnings.catch_warnings():
+            # Repli de Django qui lit tout le contenu avant l'envoi
+            warnings.filterwarnings('error', 'StreamingHttpResponse must consume')
+            messages = await asgi_get(path, trace=trace)
+
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertEqual(response_body(messages).count(b'BEGIN:VEVENT'), 12)
+        # En-tête du calendrier envoyé avant la lecture du premier rendez-vous,
+        # puis un morceau par paquet de 5
+        first_body = next(index for index, item in enumerate(trace) if item != 'event' and item.get('body'))
+        self.assertNotIn('event', trace[:first_body])
+        self.assertGreater(sum(1 for item in trace if item != 'event' and item.get('body')), 3)
@@ -5,7 +5,11 @@ urlpatterns = [
     path('appointments/', views.appointment_list, name='appointment_list'),
     path('appointments/<int:pk>/', views.appointment_detail, name='appointment_detail'),
     path('appointments/create/', views.appointment_create, name='appointment_create'),
+    path('appointments/series/create/', views.appointment_series_create, name='appointment_series_create'),
+    path('appointments/free-slots/', views.free_slots, name='free_slots'),
     path('appointments/<int:pk>/edit/', views.appointment_edit, name='appointment_edit'),
     path('appointments/<int:pk>/delete/', views.appointment_delete, name='appointment_delete'),
     path('calendar/', views.calendar_view, name='calendar'),
+    path('calendar/feeds/instructor/<str:token>.ics', views.ical_feed, {'kind': 'instructor'}, name='instructor_ical_feed'),
+    path('calendar/feeds/student/<str:token>.ics', views.ical_feed, {'kind': 'student'}, name='student_ical_feed'),
 ]
\ No newline at end of file
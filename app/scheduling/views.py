@@ -2,49 +2,89 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
+from django.utils.safestring import mark_safe
+from django.template.loader import render_to_string
+from django.db import transaction
+from collections import defaultdict
 from datetime import datetime, timedelta
 from scheduling.models import Appointment
+from scheduling.conflicts import SlotTaken, ensure_no_conflict
+from scheduling.availability import find_free_slots
+from scheduling import series
+from scheduling import fragments
 from accounts.models import Student, Instructor
-from django.http import HttpResponseForbidden
+from accounts import ledger
+from accounts.search import find_profile
+from my_driving_school.pagination import apaginate_keyset
+from accounts.roles import role_required
+from my_driving_school.async_auth import async_login_required
+from my_driving_school import metrics
+from my_driving_school.db_router import use_replica
+from django.http import HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from scheduling.ical import stream_calendar, astream_calendar
+from my_driving_school.streaming import serves_async
 
-@login_required
-def appointment_list(request):
+@use_replica
+@role_required('student', 'instructor', 'secretary', 'admin')
+async def appointment_list(request):
     user = request.user
+    role = request.role
     today = timezone.now().date()
     
-    if user.user_type == 'student':
+    if role.is_student:
         # Les étudiants ne voient que leurs rendez-vous
-        appointments = Appointment.objects.filter(student=user.student_profile)
-    elif user.user_type == 'instructor':
+        appointments = Appointment.objects.filter(student=role.student)
+    elif role.is_instructor:
         # Les instructeurs ne voient que leurs rendez-vous
-        appointments = Appointment.objects.filter(instructor=user.instructor_profile)
-    elif user.user_type in ['secretary', 'admin']:
+        appointments = Appointment.objects.filter(instructor=role.instructor)
+    else:
         # Les secrétaires et admins voient tous les rendez-vous
         appointments = Appointment.objects.all()
-    else:
-        messages.error(request, "Vous n'avez pas l'autorisation de voir cette page.")
-        return redirect('profile')
     
-    # Séparer les rendez-vous passés et futurs
-    future_appointments = appointments.filter(date__gte=today).order_by('date', 'start_time')
-    past_appointments = appointments.filter(date__lt=today).order_by('-date', 'start_time')
+    appointments = appointments.select_related('student__user', 'instructor__user')
+    
+    async def render_tables():
+        # Séparer les rendez-vous passés et futurs, chacun paginé par curseur
+        future_appointments = await apaginate_keyset(
+            appointments.filter(date__gte=today), request,
+            ordering=['date', 'start_time', 'id'], param='future'
+        )
+        past_appointments = await apaginate_keyset(
+            appointments.filter(date__lt=today), request,
+            ordering=['-date', 'start_time', 'id'], param='past'
+        )
+        return render_to_string('scheduling/appointment_tables.html', {
+            'user': user,
+            'future_appointments': future_appointments,
+            'past_appointments': past_appointments,
+            'show_past': 'past' in request.GET
+        })
+    
+    # Les tableaux ne dépendent que du périmètre, des curseurs de pagination
+    # (dans la chaîne de requête) et du jour
+    appointment_tables = await fragments.get_fragment(
+        'appointment_tables', fragments.viewer_scope(role),
+        (today, sorted(request.GET.lists())), render_tables
+    )
     
     return render(request, 'scheduling/appointment_list.html', {
-        'future_appointments': future_appointments,
-        'past_appointments': past_appointments
+        'appointment_tables': mark_safe(appointment_tables),
+        'show_past': 'past' in request.GET
     })
 
 @login_required
 def appointment_detail(request, pk):
-    appointment = get_object_or_404(Appointment, pk=pk)
+    appointment = get_object_or_404(Appointment.objects.select_related('student__user', 'instructor__user'), pk=pk)
     today_date = timezone.now().date()
     
     # Vérification des permissions
-    user = request.user
-    if user.user_type == 'student' and appointment.student.user != user:
+    role = request.role
+    if role.is_student and appointment.student != role.student:
         messages.error(request, "Vous n'avez pas l'autorisation de voir ce rendez-vous.")
         return redirect('appointment_list')
-    elif user.user_type == 'instructor' and appointment.instructor.user != user:
+    elif role.is_instructor and appointment.instructor != role.instructor:
         messages.error(request, "Vous n'avez pas l'autorisation de voir ce rendez-vous.")
         return redirect('appointment_list')
     
@@ -53,12 +93,19 @@ def appointment_detail(request, pk):
         'today_date': today_date
     })
 
+def _selected_people(data):
+    """Élève et instructeur déjà choisis pour les champs de recherche du formulaire."""
+    return {
+        'selected_student': find_profile('student', data.get('student')),
+        'selected_instructor': find_profile('instructor', data.get('instructor')),
+    }
+
 @login_required
 def appointment_create(request):
-    user = request.user
+    role = request.role
     
     # Vérification préalable pour les étudiants sans heures restantes
-    if user.user_type == 'student' and user.student_profile.remaining_hours <= 0:
+    if role.is_student and role.student.remaining_hours <= 0:
         messages.error(request, "Vous n'avez plus d'heures disponibles. Veuillez contacter la secrétaire pour acheter un forfait.")
         return redirect('appointment_list')
     
@@ -89,51 +136,19 @@ def appointment_create(request):
                 errors.append("La date du rendez-vous doit être dans le futur.")
                 
             # Récupérer l'étudiant et l'instructeur
-            if user.user_type == 'student':
-                student = user.student_profile
+            if role.is_student:
+                student = role.student
             else:
                 student = get_object_or_404(Student, pk=student_id)
                 
-            if user.user_type == 'instructor':
-                instructor = user.instructor_profile
+            if role.is_instructor:
+                instructor = role.instructor
             else:
                 instructor = get_object_or_404(Instructor, pk=instructor_id)
                 
             # Vérifier si l'étudiant a suffisamment d'heures
             if student.remaining_hours < duration:
                 errors.append(f"L'élève n'a pas assez d'heures disponibles ({student.remaining_hours} heures restantes).")
-                
-            # Vérifier les disponibilités de l'instructeur
-            instructor_appointments = Appointment.objects.filter(
-                instructor=instructor, 
-                date=date,
-            ).exclude(pk=pk if 'pk' in locals() else None)
-            
-            for appt in instructor_appointments:
-                appt_start = datetime.combine(appt.date, appt.start_time)
-                appt_end = datetime.combine(appt.date, appt.end_time)
-                new_start = datetime.combine(date, start_time)
-                new_end = datetime.combine(date, end_time)
-                
-                if (new_start < appt_end and new_end > appt_start):
-                    errors.append(f"L'instructeur a déjà un rendez-vous prévu dans cette plage horaire.")
-                    break
-                    
-            # Vérifier les disponibilités de l'étudiant
-            student_appointments = Appointment.objects.filter(
-                student=student, 
-                date=date,
-            ).exclude(pk=pk if 'pk' in locals() else None)
-            
-            for appt in student_appointments:
-                appt_start = datetime.combine(appt.date, appt.start_time)
-                appt_end = datetime.combine(appt.date, appt.end_time)
-                new_start = datetime.combine(date, start_time)
-                new_end = datetime.combine(date, end_time)
-                
-                if (new_start < appt_end and new_end > appt_start):
-                    errors.append(f"L'élève a déjà un rendez-vous prévu dans cette plage horaire.")
-                    break
                     
         except ValueError as e:
             errors.append(f"Erreur de format de date ou d'heure : {str(e)}")
@@ -143,70 +158,170 @@ def appointment_create(request):
             for error in errors:
                 messages.error(request, error)
                 
-            # Récupérer les listes pour le formulaire
-            students = Student.objects.all()
-            instructors = Instructor.objects.all()
-            
             return render(request, 'scheduling/appointment_form.html', {
-                'students': students,
-                'instructors': instructors,
+                **_selected_people(request.POST),
                 'form_data': request.POST
             })
         
-        # Sinon, créer le rendez-vous
-        appointment = Appointment(
-            student=student,
-            instructor=instructor,
-            date=date,
-            start_time=start_time,
-            end_time=end_time,
-            location=location,
-            duration=duration,
-            notes=notes
-        )
-        appointment.save()
-        
-        # Déduire les heures du forfait de l'étudiant
-        student.remaining_hours -= duration
-        student.save()
+        # Sinon, créer le rendez-vous et déduire les heures du forfait dans la
+        # même transaction, puis vérifier les disponibilités de l'instructeur et
+        # de l'élève une fois leurs plannings verrouillés par l'enregistrement
+        try:
+            with transaction.atomic():
+                ledger.debit(student.id, duration, 'booking', f"Rendez-vous du {date:%d/%m/%Y} à {start_time:%H:%M}")
+                appointment = Appointment(
+                    student=student,
+                    instructor=instructor,
+                    date=date,
+                    start_time=start_time,
+                    end_time=end_time,
+                    location=location,
+                    duration=duration,
+                    notes=notes
+                )
+                appointment.save()
+                ensure_no_conflict([appointment])
+        except ledger.InsufficientHours:
+            messages.error(request, "L'élève n'a pas assez d'heures disponibles.")
+            return render(request, 'scheduling/appointment_form.html', {
+                **_selected_people(request.POST),
+                'form_data': request.POST
+            })
+        except SlotTaken as taken:
+            for error in taken.messages():
+                messages.error(request, error)
+            return render(request, 'scheduling/appointment_form.html', {
+                **_selected_people(request.POST),
+                'form_data': request.POST
+            })
         
+        metrics.APPOINTMENTS_BOOKED.inc()
         messages.success(request, "Le rendez-vous a été créé avec succès.")
         return redirect('appointment_detail', pk=appointment.pk)
     
-    # Préparer le formulaire
-    students = Student.objects.all()
-    instructors = Instructor.objects.all()
-    
     # Pré-remplir la date si elle est fournie dans l'URL
     initial_date = request.GET.get('date', None)
     
     # Pré-remplir l'instructeur ou l'étudiant si fourni dans l'URL
-    initial_instructor = request.GET.get('instructor', None)
-    initial_student = request.GET.get('student', None)
-    
     return render(request, 'scheduling/appointment_form.html', {
-        'students': students,
-        'instructors': instructors,
-        'initial_date': initial_date,
-        'initial_instructor': initial_instructor,
-        'initial_student': initial_student
+        **_selected_people(request.GET),
+        'initial_date': initial_date
     })
 
 @login_required
-def appointment_edit(request, pk):
-    appointment = get_object_or_404(Appointment, pk=pk)
+def appointment_series_create(request):
+    role = request.role
     
-    # Vérification des permissions
-    user = request.user
-    if user.user_type not in ['instructor', 'secretary', 'admin']:
-        messages.error(request, "Vous n'avez pas l'autorisation de modifier ce rendez-vous.")
+    if role.is_student and role.student.remaining_hours <= 0:
+        messages.error(request, "Vous n'avez plus d'heures disponibles. Veuillez contacter la secrétaire pour acheter un forfait.")
         return redirect('appointment_list')
-    elif user.user_type == 'instructor' and appointment.instructor.user != user:
+    
+    context = {
+        **_selected_people(request.POST if request.method == 'POST' else request.GET),
+        'frequencies': series.FREQUENCIES,
+        'max_occurrences': series.MAX_OCCURRENCES,
+    }
+    
+    if request.method != 'POST':
+        return render(request, 'scheduling/appointment_series_form.html', context)
+    
+    context['form_data'] = request.POST
+    errors = []
+    
+    try:
+        date = datetime.strptime(request.POST.get('date'), '%Y-%m-%d').date()
+        start_time = datetime.strptime(request.POST.get('start_time'), '%H:%M').time()
+        duration = int(request.POST.get('duration', 2))
+        frequency = request.POST.get('frequency', 'weekly')
+        if frequency not in series.FREQUENCIES:
+            raise ValueError(f"fréquence inconnue « {frequency} »")
+        
+        if date < timezone.now().date():
+            errors.append("La première leçon de la série doit être dans le futur.")
+        
+        if role.is_student:
+            student = role.student
+        else:
+            student = get_object_or_404(Student.objects.select_related('user'), pk=request.POST.get('student'))
+        
+        if role.is_instructor:
+            instructor = role.instructor
+        else:
+            instructor = get_object_or_404(Instructor.objects.select_related('user'), pk=request.POST.get('instructor'))
+        
+        # Nombre de leçons demandé, ou autant que le solde d'heures le permet
+        if duration < 1:
+            errors.append("Une leçon dure au moins une heure.")
+        elif request.POST.get('until_hours_exhausted'):
+            count = min(student.remaining_hours // duration, series.MAX_OCCURRENCES)
+            if count == 0:
+                errors.append(f"L'élève n'a pas assez d'heures disponibles ({student.remaining_hours} heures restantes).")
+        else:
+            count = int(request.POST.get('occurrences', 10))
+            if not 1 <= count <= series.MAX_OCCURRENCES:
+                errors.append(f"Une série compte entre 1 et {series.MAX_OCCURRENCES} leçons.")
+    except (TypeError, ValueError) as e:
+        errors.append(f"Erreur dans les paramètres de la série : {str(e)}")
+    
+    if errors:
+        for error in errors:
+            messages.error(request, error)
+        return render(request, 'scheduling/appointment_series_form.html', context)
+    
+    occurrences = series.plan_series(student, instructor, date, start_time, duration, frequency, count)
+    free_occurrences = [occurrence for occurrence in occurrences if occurrence.is_free]
+    conflict_count = len(occurrences) - len(free_occurrences)
+    
+    # Sans confirmation explicite, une série avec des conflits n'est pas réservée :
+    # le détail par leçon est affiché pour décider
+    if conflict_count and not request.POST.get('skip_conflicts'):
+        messages.error(request, f"{conflict_count} leçon(s) sur {len(occurrences)} sont en conflit avec des rendez-vous existants.")
+        context['occurrences'] = occurrences
+        return render(request, 'scheduling/appointment_series_form.html', context)
+    
+    if not free_occurrences:
+        messages.error(request, "Aucune leçon de la série n'est disponible.")
+        context['occurrences'] = occurrences
+        return render(request, 'scheduling/appointment_series_form.html', context)
+    
+    try:
+        appointments = series.book_series(
+            student, instructor, free_occurrences, duration,
+            request.POST.get('location'), request.POST.get('notes')
+        )
+    except ledger.InsufficientHours:
+        messages.error(request, f"L'élève n'a pas assez d'heures disponibles pour {len(free_occurrences)} leçons de {duration} heure(s).")
+        context['occurrences'] = occurrences
+        return render(request, 'scheduling/appointment_series_form.html', context)
+    except SlotTaken as taken:
+        # Réservé entre-temps par une autre requête : rien n'a été réservé,
+        # afficher le planning à jour
+        messages.error(request, f"{len(taken.conflicts)} leçon(s) viennent d'être réservées par ailleurs, la série n'a pas été créée.")
+        context['occurrences'] = series.plan_series(student, instructor, date, start_time, duration, frequency, count)
+        return render(request, 'scheduling/appointment_series_form.html', context)
+    
+    metrics.APPOINTMENTS_BOOKED.inc(len(appointments))
+    if conflict_count:
+        messages.warning(request, f"{conflict_count} leçon(s) en conflit n'ont pas été réservées.")
+    messages.success(request, f"La série de {len(appointments)} rendez-vous a été créée avec succès.")
+    return redirect('appointment_list')
+
+@role_required(
+    'instructor', 'secretary', 'admin',
+    message="Vous n'avez pas l'autorisation de modifier ce rendez-vous.", redirect_to='appointment_list'
+)
+def appointment_edit(request, pk):
+    appointment = get_object_or_404(Appointment.objects.select_related('student__user', 'instructor__user'), pk=pk)
+    
+    # Un instructeur ne touche qu'à ses propres rendez-vous
+    role = request.role
+    if role.is_instructor and appointment.instructor != role.instructor:
         messages.error(request, "Vous ne pouvez modifier que vos propres rendez-vous.")
         return redirect('appointment_list')
     
-    # Stocker la durée précédente pour ajuster les heures restantes
+    # Stocker la durée et l'élève précédents pour ajuster les heures restantes
     previous_duration = appointment.duration
+    previous_student_id = appointment.student_id
     
     if request.method == 'POST':
         # Récupération des données du formulaire
@@ -219,65 +334,100 @@ def appointment_edit(request, pk):
         notes = request.POST.get('notes')
         
         # Validation similaire à la création
-        # ...
+        errors = []
+        student = get_object_or_404(Student, pk=student_id)
+        instructor = get_object_or_404(Instructor, pk=instructor_id)
         
-        # Mettre à jour le rendez-vous
-        appointment.student = get_object_or_404(Student, pk=student_id)
-        appointment.instructor = get_object_or_404(Instructor, pk=instructor_id)
-        appointment.date = datetime.strptime(date_str, '%Y-%m-%d').date()
-        appointment.start_time = datetime.strptime(start_time_str, '%H:%M').time()
+        try:
+            date = datetime.strptime(date_str, '%Y-%m-%d').date()
+            start_time = datetime.strptime(start_time_str, '%H:%M').time()
+            
+            # Calculer l'heure de fin
+            start_datetime = datetime.combine(date, start_time)
+            end_datetime = start_datetime + timedelta(hours=duration)
+            end_time = end_datetime.time()
+        except (TypeError, ValueError) as e:
+            errors.append(f"Erreur de format de date ou d'heure : {str(e)}")
+        
+        if errors:
+            for error in errors:
+                messages.error(request, error)
+            
+            return render(request, 'scheduling/appointment_form.html', {
+                'appointment': appointment,
+                'selected_student': appointment.student,
+                'selected_instructor': appointment.instructor
+            })
         
-        # Calculer l'heure de fin
-        start_datetime = datetime.combine(appointment.date, appointment.start_time)
-        end_datetime = start_datetime + timedelta(hours=duration)
-        appointment.end_time = end_datetime.time()
+        # Mettre à jour le rendez-vous
+        appointment.student = student
+        appointment.instructor = instructor
+        appointment.date = date
+        appointment.start_time = start_time
+        appointment.end_time = end_time
         
         appointment.location = location
         appointment.duration = duration
         appointment.notes = notes
-        appointment.save()
         
-        # Ajuster les heures restantes de l'étudiant
-        student = appointment.student
-        if duration != previous_duration:
-            adjustment = previous_duration - duration
-            student.remaining_hours += adjustment
-            student.save()
+        # Ajuster les heures restantes dans la même transaction que la mise à
+        # jour, et vérifier les disponibilités (hors rendez-vous modifié) une
+        # fois les plannings verrouillés par l'enregistrement
+        description = f"Rendez-vous du {date:%d/%m/%Y} à {start_time:%H:%M}"
+        try:
+            with transaction.atomic():
+                appointment.save()
+                ensure_no_conflict([appointment])
+                if student.id != previous_student_id:
+                    ledger.credit(previous_student_id, previous_duration, 'booking_change', description)
+                    ledger.debit(student.id, duration, 'booking_change', description)
+                elif duration != previous_duration:
+                    ledger.adjust(student.id, previous_duration - duration, 'booking_change', description)
+        except (ledger.InsufficientHours, SlotTaken) as refused:
+            if isinstance(refused, SlotTaken):
+                for error in refused.messages():
+                    messages.error(request, error)
+            else:
+                messages.error(request, "L'élève n'a pas assez d'heures disponibles.")
+            appointment.refresh_from_db()
+            return render(request, 'scheduling/appointment_form.html', {
+                'appointment': appointment,
+                'selected_student': appointment.student,
+                'selected_instructor': appointment.instructor
+            })
         
         messages.success(request, "Le rendez-vous a été modifié avec succès.")
         return redirect('appointment_detail', pk=appointment.pk)
     
     # Préparer le formulaire pour l'édition
-    students = Student.objects.all()
-    instructors = Instructor.objects.all()
-    
     return render(request, 'scheduling/appointment_form.html', {
         'appointment': appointment,
-        'students': students,
-        'instructors': instructors
+        'selected_student': appointment.student,
+        'selected_instructor': appointment.instructor
     })
 
-@login_required
+@role_required(
+    'instructor', 'secretary', 'admin',
+    message="Vous n'avez pas l'autorisation de supprimer ce rendez-vous.", redirect_to='appointment_list'
+)
 def appointment_delete(request, pk):
-    appointment = get_object_or_404(Appointment, pk=pk)
+    appointment = get_object_or_404(Appointment.objects.select_related('student__user', 'instructor__user'), pk=pk)
     
-    # Vérification des permissions
-    user = request.user
-    if user.user_type not in ['instructor', 'secretary', 'admin']:
-        messages.error(request, "Vous n'avez pas l'autorisation de supprimer ce rendez-vous.")
-        return redirect('appointment_list')
-    elif user.user_type == 'instructor' and appointment.instructor.user != user:
+    # Un instructeur ne touche qu'à ses propres rendez-vous
+    role = request.role
+    if role.is_instructor and appointment.instructor != role.instructor:
         messages.error(request, "Vous ne pouvez supprimer que vos propres rendez-vous.")
         return redirect('appointment_list')
     
     if request.method == 'POST':
-        # Rendre les heures à l'étudiant
-        student = appointment.student
-        student.remaining_hours += appointment.duration
-        student.save()
-        
-        # Supprimer le rendez-vous
-        appointment.delete()
+        # Rendre les heures à l'étudiant et supprimer le rendez-vous
+        with transaction.atomic():
+            ledger.credit(
+                appointment.student_id, appointment.duration, 'cancellation',
+                f"Rendez-vous du {appointment.date:%d/%m/%Y} à {appointment.start_time:%H:%M}"
+            )
+            appointment.delete()
+        metrics.APPOINTMENTS_CANCELLED.inc()
         
         messages.success(request, "Le rendez-vous a été supprimé avec succès.")
         return redirect('appointment_list')
@@ -286,82 +436,194 @@ def appointment_delete(request, pk):
         'appointment': appointment
     })
 
-@login_required
-def calendar_view(request):
-    user = request.user
+@use_replica
+@async_login_required
+async def calendar_view(request):
+    role = request.role
     today = timezone.now().date()
     
+    # Mode d'affichage : semaine (par défaut) ou mois
+    mode = request.GET.get('mode', 'week')
+    if mode not in ('week', 'month'):
+        mode = 'week'
+    
     # Déterminer la période à afficher
     week_str = request.GET.get('week', None)
     if week_str:
         try:
-            week_date = datetime.strptime(week_str, '%Y-%m-%d').date()
-            # S'assurer que c'est un lundi
-            start_of_week = week_date - timedelta(days=week_date.weekday())
+            reference_date = datetime.strptime(week_str, '%Y-%m-%d').date()
         except ValueError:
-            start_of_week = today - timedelta(days=today.weekday())
+            reference_date = today
     else:
-        # Par défaut, utiliser la semaine en cours
-        start_of_week = today - timedelta(days=today.weekday())
+        # Par défaut, utiliser la période en cours
+        reference_date = today
     
-    end_of_week = start_of_week + timedelta(days=6)
-    prev_week = start_of_week - timedelta(days=7)
-    next_week = start_of_week + timedelta(days=7)
+    if mode == 'month':
+        # Grille complète du mois, du lundi de la première semaine au dimanche de la dernière
+        month_start = reference_date.replace(day=1)
+        next_month_start = (month_start + timedelta(days=31)).replace(day=1)
+        month_end = next_month_start - timedelta(days=1)
+        start_date = month_start - timedelta(days=month_start.weekday())
+        end_date = month_end + timedelta(days=6 - month_end.weekday())
+        prev_period = (month_start - timedelta(days=1)).replace(day=1)
+        next_period = next_month_start
+        displayed_month = month_start.month
+    else:
+        # S'assurer que c'est un lundi
+        start_date = reference_date - timedelta(days=reference_date.weekday())
+        end_date = start_date + timedelta(days=6)
+        prev_period = start_date - timedelta(days=7)
+        next_period = start_date + timedelta(days=7)
+        displayed_month = today.month
     
     # Filtrer les rendez-vous en fonction du type d'utilisateur
-    if user.user_type == 'student':
-        appointments = Appointment.objects.filter(
-            student=user.student_profile,
-            date__range=[start_of_week, end_of_week]
-        )
-    elif user.user_type == 'instructor':
-        appointments = Appointment.objects.filter(
-            instructor=user.instructor_profile,
-            date__range=[start_of_week, end_of_week]
-        )
+    appointments = Appointment.objects.filter(date__range=[start_date, end_date])
+    instructor_id = None
+    if role.is_student:
+        appointments = appointments.filter(student=role.student)
+    elif role.is_instructor:
+        appointments = appointments.filter(instructor=role.instructor)
     else:  # secretary or admin
         # Filtre optionnel par instructeur
         instructor_id = request.GET.get('instructor', None)
         if instructor_id:
-            appointments = Appointment.objects.filter(
-                instructor_id=instructor_id,
-                date__range=[start_of_week, end_of_week]
-            )
-        else:
-            appointments = Appointment.objects.filter(
-                date__range=[start_of_week, end_of_week]
-            )
+            appointments = appointments.filter(instructor_id=instructor_id)
     
-    # Préparer les données pour l'affichage du calendrier
-    calendar_days = []
-    for day_offset in range(7):  # Lundi à Dimanche
-        current_date = start_of_week + timedelta(days=day_offset)
-        is_today = current_date == today
-        is_outside_month = current_date.month != today.month
+    async def render_grid():
+        # Une seule requête pour toute la période, avec uniquement les colonnes affichées
+        period_appointments = appointments.select_related(
+            'student__user', 'instructor__user'
+        ).only(
+            'id', 'date', 'start_time', 'end_time', 'location', 'duration',
+            'student__user__first_name', 'student__user__last_name',
+            'instructor__user__first_name', 'instructor__user__last_name',
+        ).order_by('date', 'start_time')
         
-        day_events = []
-        for appointment in appointments.filter(date=current_date):
-            event_type = "student" if user.user_type == 'instructor' else "instructor"
-            day_events.append({
+        # Répartir les rendez-vous par jour en un seul passage
+        event_type = "student" if role.is_instructor else "instructor"
+        events_by_day = defaultdict(list)
+        async for appointment in period_appointments:
+            if not role.is_student:
+                person = appointment.student.user
+            else:
+                person = appointment.instructor.user
+            events_by_day[appointment.date].append({
                 'id': appointment.id,
                 'time': f"{appointment.start_time.strftime('%H:%M')} - {appointment.end_time.strftime('%H:%M')}",
                 'type': event_type,
                 'title': f"{appointment.location} - {appointment.duration}h",
-                'student_name': f"{appointment.student.user.first_name} {appointment.student.user.last_name}" if user.user_type != 'student' else f"{appointment.instructor.user.first_name} {appointment.instructor.user.last_name}"
+                'student_name': f"{person.first_name} {person.last_name}"
             })
         
-        calendar_days.append({
-            'date': current_date,
-            'is_today': is_today,
-            'is_outside_month': is_outside_month,
-            'events': day_events
-        })
+        # Préparer les données pour l'affichage du calendrier
+        calendar_days = []
+        for day_offset in range((end_date - start_date).days + 1):
+            current_date = start_date + timedelta(days=day_offset)
+            calendar_days.append({
+                'date': current_date,
+                'is_today': current_date == today,
+                'is_outside_month': current_date.month != displayed_month,
+                'events': events_by_day.get(current_date, [])
+            })
+        return render_to_string('scheduling/calendar_grid.html', {'calendar_days': calendar_days})
+    
+    # La grille est la même pour tous ceux qui regardent le même périmètre
+    # sur la même période
+    calendar_grid = await fragments.get_fragment(
+        'calendar_grid', fragments.viewer_scope(role, instructor_id),
+        (start_date, end_date, displayed_month, today), render_grid
+    )
     
     return render(request, 'scheduling/calendar.html', {
-        'calendar_days': calendar_days,
-        'start_date': start_of_week,
-        'end_date': end_of_week,
-        'prev_week': prev_week,
-        'next_week': next_week,
+        'calendar_grid': mark_safe(calendar_grid),
+        'mode': mode,
+        'start_date': start_date,
+        'end_date': end_date,
+        'month_date': reference_date.replace(day=1),
+        'prev_week': prev_period,
+        'next_week': next_period,
         'today': today
-    })
\ No newline at end of file
+    })
+
+
+@login_required
+def free_slots(request):
+    """Prochains créneaux libres communs à un instructeur et un élève (JSON)."""
+    role = request.role
+    today = timezone.localdate()
+    
+    try:
+        # Un élève ou un instructeur ne cherche que dans son propre planning
+        if role.is_student:
+            student_id = role.student.id
+        else:
+            student_id = int(request.GET['student'])
+        
+        if role.is_instructor:
+            instructor_id = role.instructor.id
+        else:
+            instructor_id = int(request.GET['instructor'])
+        
+        duration = int(request.GET.get('duration', 2))
+        date_from = datetime.strptime(request.GET['from'], '%Y-%m-%d').date() if request.GET.get('from') else today
+        date_to = datetime.strptime(request.GET['to'], '%Y-%m-%d').date() if request.GET.get('to') else date_from + timedelta(days=30)
+        limit = int(request.GET.get('limit', 5))
+    except (KeyError, ValueError):
+        return JsonResponse({'error': "Paramètres de recherche invalides."}, status=400)
+    
+    if not 1 <= duration <= 8 or not 1 <= limit <= 50 or (date_to - date_from).days > 92:
+        return JsonResponse({'error': "Paramètres de recherche hors limites."}, status=400)
+    
+    slots = find_free_slots(instructor_id, student_id, duration, date_from, date_to, limit=limit)
+    return JsonResponse({
+        'slots': [
+            {
+                'date': slot_date.isoformat(),
+                'start_time': start_time.strftime('%H:%M'),
+                'end_time': end_time.strftime('%H:%M'),
+            }
+            for slot_date, start_time, end_time in slots
+        ]
+    })
+
+
+def ical_feed(request, token, kind):
+    """
+    Flux iCalendar des rendez-vous d'un instructeur ou d'un élève, accessible
+    sans connexion par son URL secrète (abonnement depuis un agenda).
+    """
+    model = Instructor if kind == 'instructor' else Student
+    profile = get_object_or_404(model.objects.select_related('user'), calendar_token=token, user__is_active=True)
+    
+    # Validation conditionnelle sur la date de dernière modification du
+    # planning, portée par le profil : un 304 ne lit pas les rendez-vous
+    last_modified = profile.schedule_updated_at
+    etag = quote_etag(f"{kind}-{profile.pk}-{last_modified:%Y%m%d%H%M%S%f}")
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(last_modified.timestamp()))
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+    
+    if kind == 'instructor':
+        appointments = Appointment.objects.filter(instructor=profile).select_related('student__user')
+        
+        def summary(appointment):
+            return f"Leçon avec {appointment.student.user.first_name} {appointment.student.user.last_name}"
+    else:
+        appointments = Appointment.objects.filter(student=profile).select_related('instructor__user')
+        
+        def summary(appointment):
+            return f"Leçon de conduite avec {appointment.instructor.user.first_name} {appointment.instructor.user.last_name}"
+    
+    name = f"My Driving School - {profile.user.first_name} {profile.user.last_name}"
+    # Générateur du type attendu par le serveur, sinon le flux est chargé en mémoire
+    stream = astream_calendar if serves_async(request) else stream_calendar
+    response = StreamingHttpResponse(
+        stream(name, appointments.order_by('date', 'start_time', 'id'), summary, last_modified),
+        content_type='text/calendar; charset=utf-8'
+    )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified.timestamp())
+    response['Content-Disposition'] = 'inline; filename="rendez-vous.ics"'
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -4,12 +4,27 @@ sleep 5
 
 mkdir -p /app/data/logs
 
+# Répertoire des métriques Prometheus partagé entre les workers, vidé à chaque démarrage
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 echo "Checking project structure..."
 ls -la /app/
 
 python manage.py migrate
 
+# Fichiers statiques versionnés et leurs variantes .gz/.br, dans le volume
+# partagé avec nginx ; les fichiers des versions précédentes restent servis
+python manage.py collectstatic --noinput -v0
+
 python manage.py loaddata initial_data
 
+# loaddata n'appelle pas Purchase.save() ni Appointment.save() : recalculer les
+# agrégats de chiffre d'affaires et l'occupation des instructeurs
+python manage.py rebuild_revenue_rollups
+python manage.py rebuild_occupancy
+
 echo "Starting server..."
 exec "$@"
\ No newline at end of file
@@ -0,0 +1,24 @@
+// Copie les bibliothèques tierces de node_modules vers build/assets/vendor,
+// servies ensuite comme les autres fichiers statiques (empreinte, compression).
+const fs = require('fs');
+const path = require('path');
+
+const modules = path.join(__dirname, '..', 'node_modules');
+const vendor = path.join(__dirname, '..', '..', 'build', 'assets', 'vendor');
+
+const FILES = [
+  ['alpinejs/dist/cdn.min.js', 'alpine.min.js'],
+  ['chart.js/dist/chart.umd.js', 'chart.umd.js'],
+  // all.min.css référence ../webfonts/ : garder la même arborescence
+  ['@fortawesome/fontawesome-free/css/all.min.css', 'fontawesome/css/all.min.css'],
+  ['@fortawesome/fontawesome-free/webfonts', 'fontawesome/webfonts'],
+  ['@fontsource-variable/inter/files/inter-latin-wght-normal.woff2', 'fonts/inter-latin-wght-normal.woff2'],
+  ['@fontsource-variable/montserrat/files/montserrat-latin-wght-normal.woff2', 'fonts/montserrat-latin-wght-normal.woff2'],
+];
+
+fs.rmSync(vendor, { recursive: true, force: true });
+for (const [source, target] of FILES) {
+  const destination = path.join(vendor, target);
+  fs.mkdirSync(path.dirname(destination), { recursive: true });
+  fs.cpSync(path.join(modules, source), destination, { recursive: true });
+}
@@ -0,0 +1,74 @@
+/** @type {import('tailwindcss').Config} */
+module.exports = {
+    // Classes utilisées dans les templates, les widgets de formulaires et le JS :
+    // seules celles-ci sont gardées dans app.css
+    content: [
+        '../app/templates/**/*.html',
+        '../app/**/*.py',
+        '../app/assets/js/**/*.js',
+    ],
+    theme: {
+        extend: {
+            colors: {
+                primary: {
+                    50: '#f0f9ff',
+                    100: '#e0f2fe',
+                    200: '#b9e6fe',
+                    300: '#7dd3fc',
+                    400: '#38bdf8',
+                    500: '#0ea5e9',
+                    600: '#0284c7',
+                    700: '#0369a1',
+                    800: '#075985',
+                    900: '#0c4a6e',
+                    950: '#082f49',
+                },
+                secondary: {
+                    50: '#fff7ed',
+                    100: '#ffedd5',
+                    200: '#fed7aa',
+                    300: '#fdba74',
+                    400: '#fb923c',
+                    500: '#f97316',
+                    600: '#ea580c',
+                    700: '#c2410c',
+                    800: '#9a3412',
+                    900: '#7c2d12',
+                    950: '#431407',
+                },
+            },
+            fontFamily: {
+                sans: ['Inter var', 'ui-sans-serif', 'system-ui', 'sans-serif'],
+                heading: ['Montserrat', 'sans-serif'],
+            },
+            screens: {
+                'xs': '475px', // Ajout d'un breakpoint pour les très petits écrans
+            },
+            animation: {
+                'fade-in': 'fadeIn 0.5s ease-out',
+                'slide-in-right': 'slideInRight 0.5s ease-out',
+                'slide-in-left': 'slideInLeft 0.5s ease-out',
+                'slide-in-up': 'slideInUp 0.5s ease-out',
+            },
+            keyframes: {
+                fadeIn: {
+                    '0%': { opacity: '0' },
+                    '100%': { opacity: '1' },
+                },
+                slideInRight: {
+                    '0%': { transform: 'translateX(100%)', opacity: '0' },
+                    '100%': { transform: 'translateX(0)', opacity: '1' },
+                },
+                slideInLeft: {
+                    '0%': { transform: 'translateX(-100%)', opacity: '0' },
+                    '100%': { transform: 'translateX(0)', opacity: '1' },
+                },
+                slideInUp: {
+                    '0%': { transform: 'translateY(20px)', opacity: '0' },
+                    '100%': { transform: 'translateY(0)', opacity: '1' },
+                },
+            },
+        },
+    },
+    plugins: [],
+};